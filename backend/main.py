@@ -1,33 +1,64 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 import os
 from datetime import datetime
 import json
 
-from services.username_lookup import username_lookup
+from services.username_lookup import username_lookup, iter_username_lookup, iter_bulk_username_lookup
+from services.username_lookup import PLATFORMS, USERNAME_BULK_CONCURRENCY, USERNAME_BULK_PER_PLATFORM, USERNAME_BULK_MAX
 from services.email_scanner import email_scanner, domain_scanner
 from services.ip_lookup import ip_lookup
 from services.whois_lookup import whois_lookup
 from services.exif_extractor import extract_exif
 from services.report_generator import generate_pdf_report
 from services.search_history import SearchHistory
+from services.result_cache import ResultCache
+from services.singleflight import SingleFlight
+from services.http_client import http_clients
+from services.outbound_governor import outbound_governor
+from services.pwned_ranges import pwned_ranges
+from services.password_dictionary import password_dictionary
+from services.breach_index import breach_indexes, sha1_digest, email_digest, BREACH_INDEX_BULK_MAX
+from services.image_metadata import image_metadata_cache
+from services.dns_engine import dns_engine
 # WiFi features removed per user request
 from services.ss7_intelligence import ss7_intelligence_gathering, get_phone_intelligence
 from services.ss7_enhanced import ss7_professional_analysis
 from services.phone_email_intel import gather_email_intelligence, gather_phone_intelligence
-from services.password_analyzer import analyze_password_strength, generate_strong_password
+from services.password_analyzer import analyze_password_strength, analyze_password_batch, generate_strong_password, PASSWORD_BATCH_MAX, PASSWORD_BATCH_MAX_CHARS, PASSWORD_MAX_LENGTH
 from services.social_media_analyzer import analyze_social_profile, bulk_profile_analysis
 from services.network_tools import port_scanner, ssl_certificate_analyzer, dns_enumeration, subdomain_discovery
+from services.network_tools import iter_subdomains, iter_wordlist, wordlist_path, COMMON_SUBDOMAINS, SUBDOMAIN_CONCURRENCY, SUBDOMAIN_MAX_CONCURRENCY
+from services.network_tools import iter_port_scan, parse_ports, SCAN_PORTS, PORT_SCAN_CONCURRENCY, PORT_SCAN_MAX_CONCURRENCY, PORT_SCAN_RATE
+from services.scan_scheduler import ScanScheduler, expand_targets
+from services.job_manager import JobManager
 from services.osint_enhancements import google_dorking, shodan_integration, github_repository_analyzer, email_hunter
 from services.geolocation_advanced import advanced_ip_geolocation, photo_location_extractor, timezone_correlator
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # History appends are flushed in batches by a background writer
+    search_history.start()
+    # Pooled outbound HTTP connections shared by every service
+    await http_clients.start()
+    # Background workers for long-running jobs; unfinished jobs resume here
+    await job_manager.start()
+    yield
+    await job_manager.close()
+    await http_clients.close()
+    search_history.close()
+    await result_cache.close()
+
 app = FastAPI(
     title="THE GOD EYE",
     description="Advanced Multi-Mode Intelligence Platform - OSINT | SS7 | WiFi Security",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -37,11 +68,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache", "Age"],
 )
 
 # Initialize search history
 search_history = SearchHistory()
 
+# Lookup result cache (RESULT_CACHE_BACKEND=memory|sqlite)
+result_cache = ResultCache()
+
+# Concurrent identical lookups share one upstream call
+lookup_flights = SingleFlight()
+
+# Global concurrency and fair sharing for multi-target batch scans
+scan_scheduler = ScanScheduler()
+
+# Long-running lookups submitted through /api/jobs
+job_manager = JobManager()
+
 # Ensure directories exist
 os.makedirs("./reports", exist_ok=True)
 os.makedirs("./uploads", exist_ok=True)
@@ -64,6 +108,82 @@ class ReportRequest(BaseModel):
     data: Dict[str, Any]
     notes: Optional[str] = ""
 
+async def cached_lookup(endpoint: str, params: Dict[str, Any], compute: Callable[[], Awaitable[Dict]],
+                        http_request: Request, response: Response) -> Dict:
+    """Serve a lookup from the result cache, computing and storing it on a miss.
+
+    Sets X-Cache (HIT, MISS or BYPASS) and Age on the response. A request
+    sent with ``Cache-Control: no-cache`` skips the cache read but still
+    refreshes the stored entry. Concurrent misses for the same key are
+    coalesced into a single call to ``compute``.
+    """
+    bypass = "no-cache" in http_request.headers.get("cache-control", "").lower()
+
+    if bypass:
+        result_cache.record_bypass()
+    else:
+        cached = await result_cache.get(endpoint, params)
+        if cached is not None:
+            results, age = cached
+            response.headers["X-Cache"] = "HIT"
+            response.headers["Age"] = str(int(age))
+            return results
+
+    async def compute_and_store() -> Dict:
+        results = await compute()
+        if not (isinstance(results, dict) and results.get("error")):
+            await result_cache.set(endpoint, params, results)
+        return results
+
+    key = result_cache.make_key(endpoint, params)
+    results = await lookup_flights.do(key, compute_and_store, group=endpoint)
+
+    response.headers["X-Cache"] = "BYPASS" if bypass else "MISS"
+    response.headers["Age"] = "0"
+    return results
+
+async def stream_params(http_request: Request) -> Dict:
+    """Parameters of a stream request: the query string for GET, else the JSON body"""
+    if http_request.method == "GET":
+        return dict(http_request.query_params)
+    body = await http_request.body()
+    try:
+        params = json.loads(body) if body else {}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(params, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
+    return params
+
+def bounded_param(params: Dict, name: str, default: Any, maximum: Any, cast: Callable = int) -> Any:
+    """A positive numeric tuning parameter from the client, capped at the server's ``maximum``"""
+    try:
+        value = cast(params.get(name, default))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} must be a number")
+    if not value > 0:
+        raise HTTPException(status_code=400, detail=f"{name} must be positive")
+    return min(value, maximum)
+
+def stream_response(http_request: Request, events: AsyncIterator[Dict]) -> StreamingResponse:
+    """Stream events as Server-Sent Events when the client asks for them, else as NDJSON"""
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        async def sse():
+            seq = 0
+            async for event in events:
+                yield f"id: {seq}\nevent: {event.get('event', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+                seq += 1
+        
+        # Tell reverse proxies not to buffer, or nothing arrives until the end
+        return StreamingResponse(sse(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    
+    async def ndjson():
+        async for event in events:
+            yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -105,19 +225,79 @@ async def root():
 
 # Username Lookup
 @app.post("/api/username-lookup")
-async def lookup_username(request: UsernameRequest):
+async def lookup_username(request: UsernameRequest, http_request: Request, response: Response):
     try:
-        results = await username_lookup(request.username)
+        results = await cached_lookup(
+            "username-lookup", {"username": request.username},
+            lambda: username_lookup(request.username), http_request, response
+        )
         search_history.add_search("username", request.username, results)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Username Lookup (each platform streamed as soon as it answers)
+@app.api_route("/api/username-lookup/stream", methods=["GET", "POST"])
+async def stream_username_lookup(http_request: Request):
+    username = (await stream_params(http_request)).get("username")
+    if not username:
+        raise HTTPException(status_code=400, detail="username is required")
+    
+    async def events():
+        platforms = []
+        async for event in iter_username_lookup(username):
+            if event["event"] == "result":
+                platforms.append({key: value for key, value in event.items() if key != "event"})
+            elif event["event"] == "done":
+                search_history.add_search("username", username, {
+                    "username": username,
+                    "platforms": platforms,
+                    "found_on": event["found_on"],
+                    "statistics": event["statistics"]
+                })
+            yield event
+    
+    return stream_response(http_request, events())
+
+# Bulk Username Sweep (results streamed as each check finishes)
+@app.post("/api/username-lookup/bulk")
+async def bulk_lookup_usernames(request: dict, http_request: Request):
+    usernames = request.get("usernames") or []
+    if not isinstance(usernames, list) or not all(isinstance(u, str) for u in usernames):
+        raise HTTPException(status_code=400, detail="usernames must be a list of strings")
+    if not usernames:
+        raise HTTPException(status_code=400, detail="usernames is required")
+    if len(usernames) > USERNAME_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {USERNAME_BULK_MAX} usernames per sweep")
+    
+    platforms = PLATFORMS.select(request.get("platforms"), request.get("tags"))
+    if not platforms:
+        raise HTTPException(status_code=400, detail="No platforms match the given names or tags")
+    concurrency = bounded_param(request, "concurrency", USERNAME_BULK_CONCURRENCY, USERNAME_BULK_CONCURRENCY)
+    per_platform = bounded_param(request, "per_platform", USERNAME_BULK_PER_PLATFORM, USERNAME_BULK_PER_PLATFORM)
+    
+    async def events():
+        found = {}
+        async for event in iter_bulk_username_lookup(usernames, platforms, concurrency, per_platform):
+            if event["event"] == "username":
+                found[event["username"]] = event["found_on"]
+            elif event["event"] == "done":
+                search_history.add_search("username_bulk", f"{event['usernames']} usernames", {
+                    "found_on": found,
+                    "statistics": event["statistics"]
+                })
+            yield event
+    
+    return stream_response(http_request, events())
+
 # Email Scanner
 @app.post("/api/email-scan")
-async def scan_email(request: EmailRequest):
+async def scan_email(request: EmailRequest, http_request: Request, response: Response):
     try:
-        results = await email_scanner(request.email)
+        results = await cached_lookup(
+            "email-scan", {"email": request.email},
+            lambda: email_scanner(request.email), http_request, response
+        )
         search_history.add_search("email", request.email, results)
         return results
     except Exception as e:
@@ -125,9 +305,12 @@ async def scan_email(request: EmailRequest):
 
 # Domain Scanner
 @app.post("/api/domain-scan")
-async def scan_domain(request: DomainRequest):
+async def scan_domain(request: DomainRequest, http_request: Request, response: Response):
     try:
-        results = await domain_scanner(request.domain)
+        results = await cached_lookup(
+            "domain-scan", {"domain": request.domain},
+            lambda: domain_scanner(request.domain), http_request, response
+        )
         search_history.add_search("domain", request.domain, results)
         return results
     except Exception as e:
@@ -135,9 +318,12 @@ async def scan_domain(request: DomainRequest):
 
 # IP Lookup
 @app.post("/api/ip-lookup")
-async def lookup_ip(request: IPRequest):
+async def lookup_ip(request: IPRequest, http_request: Request, response: Response):
     try:
-        results = await ip_lookup(request.ip)
+        results = await cached_lookup(
+            "ip-lookup", {"ip": request.ip},
+            lambda: ip_lookup(request.ip), http_request, response
+        )
         search_history.add_search("ip", request.ip, results)
         return results
     except Exception as e:
@@ -145,9 +331,12 @@ async def lookup_ip(request: IPRequest):
 
 # WHOIS Lookup
 @app.post("/api/whois-lookup")
-async def lookup_whois(request: DomainRequest):
+async def lookup_whois(request: DomainRequest, http_request: Request, response: Response):
     try:
-        results = await whois_lookup(request.domain)
+        results = await cached_lookup(
+            "whois-lookup", {"domain": request.domain},
+            lambda: whois_lookup(request.domain), http_request, response
+        )
         search_history.add_search("whois", request.domain, results)
         return results
     except Exception as e:
@@ -157,8 +346,8 @@ async def lookup_whois(request: DomainRequest):
 @app.post("/api/exif-extract")
 async def extract_image_exif(file: UploadFile = File(...)):
     try:
-        contents = await file.read()
-        results = await extract_exif(contents, file.filename)
+        # The upload is already spooled to a temp file; parse it in place
+        results = await extract_exif(file.file, file.filename)
         search_history.add_search("exif", file.filename, results)
         return results
     except Exception as e:
@@ -191,11 +380,133 @@ async def download_report(filename: str):
         )
     raise HTTPException(status_code=404, detail="Report not found")
 
+# Background Jobs
+async def run_port_scan_job(params: Dict, emit: Callable[[Dict], None]) -> Dict:
+    target = params["target"]
+    ports = parse_ports(params["ports"]) if params.get("ports") else None
+    results = await port_scanner(
+        target, ports=ports, scan_type=params.get("scan_type", "full"),
+        concurrency=params.get("concurrency", PORT_SCAN_CONCURRENCY), rate=params.get("rate", PORT_SCAN_RATE),
+        on_event=emit
+    )
+    search_history.add_search("port_scan", target, results)
+    return results
+
+async def run_subdomain_job(params: Dict, emit: Callable[[Dict], None]) -> Dict:
+    domain = params["domain"]
+    wordlist = params.get("wordlist")
+    if wordlist:
+        wordlist_path(wordlist)
+    results = await subdomain_discovery(
+        domain, wordlist_name=wordlist, concurrency=params.get("concurrency", SUBDOMAIN_CONCURRENCY), on_event=emit
+    )
+    search_history.add_search("subdomain", domain, results)
+    return results
+
+async def run_bulk_profile_job(params: Dict, emit: Callable[[Dict], None]) -> Dict:
+    profiles = params["profiles"]
+    results = await bulk_profile_analysis(profiles, on_event=emit)
+    search_history.add_search("social_profile_bulk", f"{len(profiles)} profiles", results)
+    return results
+
+job_manager.register("port_scan", run_port_scan_job)
+job_manager.register("subdomain_discovery", run_subdomain_job)
+job_manager.register("bulk_profile_analysis", run_bulk_profile_job)
+
+# Tuning parameters checked at submission: name -> (cast, default, server maximum)
+JOB_LIMITS = {
+    "port_scan": {
+        "concurrency": (int, PORT_SCAN_CONCURRENCY, PORT_SCAN_MAX_CONCURRENCY),
+        "rate": (float, PORT_SCAN_RATE, PORT_SCAN_RATE)
+    },
+    "subdomain_discovery": {"concurrency": (int, SUBDOMAIN_CONCURRENCY, SUBDOMAIN_MAX_CONCURRENCY)}
+}
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: dict):
+    kind = request.get("kind")
+    params = request.get("params") or {}
+    if not isinstance(params, dict):
+        raise HTTPException(status_code=400, detail="params must be an object")
+    for name, (cast, default, maximum) in JOB_LIMITS.get(kind, {}).items():
+        params[name] = bounded_param(params, name, default, maximum, cast)
+    
+    try:
+        return await job_manager.submit(kind, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 50, status: Optional[str] = None):
+    return {"jobs": await job_manager.list(limit, status)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0, since: Optional[int] = None):
+    # wait > 0 long-polls until the job emits past `since` or finishes
+    job = await job_manager.get(job_id, wait=min(wait, 60), since=since)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/results")
+async def get_job_results(job_id: str, since: int = 0, limit: int = 1000):
+    job = await job_manager.get(job_id, with_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    events = await job_manager.events(job_id, since, limit)
+    return {
+        **job,
+        "partial_results": events,
+        "next": since + len(events)
+    }
+
+@app.get("/api/jobs/{job_id}/stream")
+async def stream_job(job_id: str, http_request: Request, since: int = 0):
+    if await job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        cursor = since
+        while True:
+            job = await job_manager.get(job_id, wait=15, since=cursor)
+            for event in await job_manager.events(job_id, cursor):
+                cursor += 1
+                yield event
+            if job is None or job["status"] in ("completed", "failed", "cancelled"):
+                # Drain everything still unread, a page at a time
+                while True:
+                    page = await job_manager.events(job_id, cursor)
+                    if not page:
+                        break
+                    for event in page:
+                        cursor += 1
+                        yield event
+                yield {"event": "job", **(job or {})}
+                break
+    
+    return stream_response(http_request, events())
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 # Search History
 @app.get("/api/search-history")
 async def get_search_history(limit: int = 50):
     return search_history.get_history(limit)
 
+# Get specific search with full results
+@app.get("/api/search-history/{search_id}")
+async def get_search(search_id: str):
+    search = await run_in_threadpool(search_history.get_search_by_id, search_id)
+    if search is None:
+        raise HTTPException(status_code=404, detail="Search not found")
+    return search
+
 # Clear Search History
 @app.delete("/api/search-history")
 async def clear_search_history():
@@ -212,11 +523,14 @@ async def delete_search(search_id: str):
 
 # SS7 Intelligence (Basic)
 @app.post("/api/ss7-intel")
-async def ss7_intel(request: dict):
+async def ss7_intel(request: dict, http_request: Request, response: Response):
     try:
         phone = request.get("phone_number")
         mode = request.get("mode", "info")
-        results = await ss7_intelligence_gathering(phone, mode)
+        results = await cached_lookup(
+            "ss7-intel", {"phone_number": phone, "mode": mode},
+            lambda: ss7_intelligence_gathering(phone, mode), http_request, response
+        )
         search_history.add_search("ss7", phone, results)
         return results
     except Exception as e:
@@ -224,10 +538,13 @@ async def ss7_intel(request: dict):
 
 # SS7 Professional Analysis (Advanced)
 @app.post("/api/ss7-professional")
-async def ss7_professional(request: dict):
+async def ss7_professional(request: dict, http_request: Request, response: Response):
     try:
         phone = request.get("phone_number")
-        results = await ss7_professional_analysis(phone)
+        results = await cached_lookup(
+            "ss7-professional", {"phone_number": phone},
+            lambda: ss7_professional_analysis(phone), http_request, response
+        )
         search_history.add_search("ss7_professional", phone, results)
         return results
     except Exception as e:
@@ -235,10 +552,13 @@ async def ss7_professional(request: dict):
 
 # Phone Intelligence
 @app.post("/api/phone-intel")
-async def phone_intel(request: dict):
+async def phone_intel(request: dict, http_request: Request, response: Response):
     try:
         phone = request.get("phone_number")
-        results = await gather_phone_intelligence(phone)
+        results = await cached_lookup(
+            "phone-intel", {"phone_number": phone},
+            lambda: gather_phone_intelligence(phone), http_request, response
+        )
         search_history.add_search("phone", phone, results)
         return results
     except Exception as e:
@@ -246,10 +566,13 @@ async def phone_intel(request: dict):
 
 # Email Intelligence
 @app.post("/api/email-intel")
-async def email_intel(request: dict):
+async def email_intel(request: dict, http_request: Request, response: Response):
     try:
         email = request.get("email")
-        results = await gather_email_intelligence(email)
+        results = await cached_lookup(
+            "email-intel", {"email": email},
+            lambda: gather_email_intelligence(email), http_request, response
+        )
         search_history.add_search("email_intel", email, results)
         return results
     except Exception as e:
@@ -258,13 +581,82 @@ async def email_intel(request: dict):
 # Password Analyzer
 @app.post("/api/password-analyzer")
 async def analyze_password(request: dict):
+    password = request.get("password")
+    if not isinstance(password, str):
+        raise HTTPException(status_code=400, detail="password must be a string")
+    if len(password) > PASSWORD_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Passwords are limited to {PASSWORD_MAX_LENGTH} characters")
     try:
-        password = request.get("password")
         results = await analyze_password_strength(password)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch Password Analyzer (columnar results, no per-password objects)
+@app.post("/api/password-analyzer/batch")
+async def analyze_password_batch_endpoint(request: dict):
+    passwords = request.get("passwords") or []
+    if not isinstance(passwords, list) or not all(isinstance(p, str) for p in passwords):
+        raise HTTPException(status_code=400, detail="passwords must be a list of strings")
+    if len(passwords) > PASSWORD_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PASSWORD_BATCH_MAX} passwords per batch")
+    if any(len(p) > PASSWORD_MAX_LENGTH for p in passwords):
+        raise HTTPException(status_code=400, detail=f"Passwords are limited to {PASSWORD_MAX_LENGTH} characters")
+    if sum(len(p) for p in passwords) > PASSWORD_BATCH_MAX_CHARS:
+        raise HTTPException(status_code=400, detail=f"At most {PASSWORD_BATCH_MAX_CHARS} characters per batch")
+    breach_check = bool(request.get("breach_check", False))
+    if breach_check and not breach_indexes.passwords.available:
+        raise HTTPException(status_code=503, detail="Password breach index not built")
+    
+    return await run_in_threadpool(analyze_password_batch, passwords, breach_check)
+
+# Bulk Breach Check against the local breach indexes (no network)
+@app.post("/api/breach-check/bulk")
+async def bulk_breach_check(request: dict):
+    passwords = request.get("passwords") or []
+    hashes = request.get("sha1_hashes") or []
+    emails = request.get("emails") or []
+    for name, values in (("passwords", passwords), ("sha1_hashes", hashes), ("emails", emails)):
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise HTTPException(status_code=400, detail=f"{name} must be a list of strings")
+    if len(passwords) + len(hashes) + len(emails) > BREACH_INDEX_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BREACH_INDEX_BULK_MAX} values per check")
+    if (passwords or hashes) and not breach_indexes.passwords.available:
+        raise HTTPException(status_code=503, detail="Password breach index not built")
+    if emails and not breach_indexes.emails.available:
+        raise HTTPException(status_code=503, detail="Email breach index not built")
+    
+    try:
+        password_digests = [sha1_digest(p) for p in passwords] + [bytes.fromhex(h) for h in hashes]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="sha1_hashes must be hex SHA-1 digests")
+    if any(len(d) != 20 for d in password_digests):
+        raise HTTPException(status_code=400, detail="sha1_hashes must be hex SHA-1 digests")
+    
+    def check():
+        password_counts = breach_indexes.passwords.count_many(password_digests) if password_digests else []
+        email_counts = breach_indexes.emails.count_many(email_digest(e) for e in emails) if emails else []
+        return password_counts, email_counts
+    
+    started = datetime.now()
+    password_counts, email_counts = await run_in_threadpool(check)
+    elapsed = (datetime.now() - started).total_seconds()
+    
+    # Results line up with the request lists; plaintext is never echoed back
+    checked = len(password_counts) + len(email_counts)
+    return {
+        "passwords": password_counts[:len(passwords)],
+        "sha1_hashes": password_counts[len(passwords):],
+        "emails": email_counts,
+        "statistics": {
+            "checked": checked,
+            "found": sum(1 for c in password_counts + email_counts if c),
+            "duration_ms": round(elapsed * 1000, 2),
+            "checks_per_second": round(checked / elapsed, 1) if elapsed else None
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
 # Generate Strong Password
 @app.post("/api/generate-password")
 async def generate_password(request: dict):
@@ -278,11 +670,14 @@ async def generate_password(request: dict):
 
 # Social Media Profile Analyzer
 @app.post("/api/social-profile-analyzer")
-async def analyze_social(request: dict):
+async def analyze_social(request: dict, http_request: Request, response: Response):
     try:
         platform = request.get("platform")
         username = request.get("username")
-        results = await analyze_social_profile(platform, username)
+        results = await cached_lookup(
+            "social-profile-analyzer", {"platform": platform, "username": username},
+            lambda: analyze_social_profile(platform, username), http_request, response
+        )
         search_history.add_search("social_profile", f"{platform}/{username}", results)
         return results
     except Exception as e:
@@ -290,23 +685,74 @@ async def analyze_social(request: dict):
 
 # Port Scanner
 @app.post("/api/port-scan")
-async def scan_ports(request: dict):
+async def scan_ports(request: dict, http_request: Request, response: Response):
+    target = request.get("target")
+    scan_type = request.get("scan_type", "common")
+    concurrency = bounded_param(request, "concurrency", PORT_SCAN_CONCURRENCY, PORT_SCAN_MAX_CONCURRENCY)
+    rate = bounded_param(request, "rate", PORT_SCAN_RATE, PORT_SCAN_RATE, float)
+    
     try:
-        target = request.get("target")
-        scan_type = request.get("scan_type", "common")
-        results = await port_scanner(target, scan_type=scan_type)
+        ports = parse_ports(request["ports"]) if request.get("ports") else None
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        results = await cached_lookup(
+            "port-scan", {"target": target, "scan_type": scan_type, "ports": ports},
+            lambda: port_scanner(target, ports=ports, scan_type=scan_type, concurrency=concurrency, rate=rate),
+            http_request, response
+        )
         search_history.add_search("port_scan", target, results)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Port Scanner (open ports streamed while the scan runs)
+@app.api_route("/api/port-scan/stream", methods=["GET", "POST"])
+async def stream_port_scan(http_request: Request):
+    request = await stream_params(http_request)
+    target = request.get("target")
+    scan_type = request.get("scan_type", "common")
+    
+    concurrency = bounded_param(request, "concurrency", PORT_SCAN_CONCURRENCY, PORT_SCAN_MAX_CONCURRENCY)
+    rate = bounded_param(request, "rate", PORT_SCAN_RATE, PORT_SCAN_RATE, float)
+    try:
+        ports = parse_ports(request["ports"]) if request.get("ports") else SCAN_PORTS.get(scan_type, SCAN_PORTS["full"])
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def events():
+        open_ports = []
+        try:
+            async for event in iter_port_scan(target, ports, concurrency, rate):
+                if event["event"] == "open":
+                    open_ports.append({"port": event["port"], "state": "open", "service": event["service"]})
+                elif event["event"] == "done":
+                    search_history.add_search("port_scan", target, {
+                        "target": target,
+                        "scan_type": scan_type,
+                        "open_ports": open_ports,
+                        "summary": {
+                            "total_ports_scanned": event["total_ports_scanned"],
+                            "open_ports_count": len(open_ports)
+                        }
+                    })
+                yield event
+        except OSError:
+            yield {"event": "error", "error": "Unable to resolve hostname"}
+    
+    return stream_response(http_request, events())
+
 # SSL Certificate Analyzer
 @app.post("/api/ssl-analyze")
-async def analyze_ssl(request: dict):
+async def analyze_ssl(request: dict, http_request: Request, response: Response):
     try:
         domain = request.get("domain")
         port = request.get("port", 443)
-        results = await ssl_certificate_analyzer(domain, port)
+        results = await cached_lookup(
+            "ssl-analyze", {"domain": domain, "port": port},
+            lambda: ssl_certificate_analyzer(domain, port), http_request, response
+        )
         search_history.add_search("ssl_analysis", domain, results)
         return results
     except Exception as e:
@@ -314,33 +760,124 @@ async def analyze_ssl(request: dict):
 
 # DNS Enumeration
 @app.post("/api/dns-enum")
-async def enumerate_dns(request: dict):
+async def enumerate_dns(request: dict, http_request: Request, response: Response):
     try:
         domain = request.get("domain")
-        results = await dns_enumeration(domain)
+        results = await cached_lookup(
+            "dns-enum", {"domain": domain},
+            lambda: dns_enumeration(domain), http_request, response
+        )
         search_history.add_search("dns_enum", domain, results)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch scans (progress and per-target results streamed as they finish)
+def batch_scan_response(request: dict, http_request: Request, kind: str,
+                        scan: Callable[[str], Awaitable[Dict]]) -> StreamingResponse:
+    try:
+        targets = expand_targets(request.get("targets") or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def events():
+        results = {}
+        async for event in scan_scheduler.run_batch(kind, targets, scan):
+            if event["event"] == "result":
+                results[event["target"]] = event.get("result", {"error": event.get("error")})
+            elif event["event"] == "done":
+                search_history.add_search(f"{kind}_batch", f"{len(targets)} targets", {
+                    "targets": targets,
+                    "results": results,
+                    "summary": {key: event[key] for key in ("total", "failed", "duration_ms")}
+                })
+            yield event
+    
+    return stream_response(http_request, events())
+
+@app.post("/api/port-scan/batch")
+async def batch_scan_ports(request: dict, http_request: Request):
+    scan_type = request.get("scan_type", "common")
+    rate = bounded_param(request, "rate", PORT_SCAN_RATE, PORT_SCAN_RATE, float)
+    # Split the socket budget across the targets scanned at once
+    per_target = max(8, PORT_SCAN_MAX_CONCURRENCY // scan_scheduler.concurrency)
+    concurrency = bounded_param(request, "concurrency", per_target, per_target)
+    
+    try:
+        ports = parse_ports(request["ports"]) if request.get("ports") else None
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return batch_scan_response(
+        request, http_request, "port_scan",
+        lambda target: port_scanner(target, ports=ports, scan_type=scan_type, concurrency=concurrency, rate=rate)
+    )
+
+@app.post("/api/ssl-analyze/batch")
+async def batch_analyze_ssl(request: dict, http_request: Request):
+    port = request.get("port", 443)
+    return batch_scan_response(request, http_request, "ssl_analysis", lambda target: ssl_certificate_analyzer(target, port))
+
+@app.post("/api/dns-enum/batch")
+async def batch_enumerate_dns(request: dict, http_request: Request):
+    return batch_scan_response(request, http_request, "dns_enum", dns_enumeration)
+
 # Subdomain Discovery
 @app.post("/api/subdomain-discovery")
-async def discover_subdomains(request: dict):
+async def discover_subdomains(request: dict, http_request: Request, response: Response):
+    concurrency = bounded_param(request, "concurrency", SUBDOMAIN_CONCURRENCY, SUBDOMAIN_MAX_CONCURRENCY)
     try:
         domain = request.get("domain")
-        results = await subdomain_discovery(domain)
+        wordlist = request.get("wordlist")
+        results = await cached_lookup(
+            "subdomain-discovery", {"domain": domain, "wordlist": wordlist},
+            lambda: subdomain_discovery(domain, wordlist_name=wordlist, concurrency=concurrency),
+            http_request, response
+        )
         search_history.add_search("subdomain", domain, results)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Subdomain Discovery (streamed while the sweep runs)
+@app.api_route("/api/subdomain-discovery/stream", methods=["GET", "POST"])
+async def stream_subdomains(http_request: Request):
+    request = await stream_params(http_request)
+    domain = request.get("domain")
+    wordlist = request.get("wordlist")
+    
+    concurrency = bounded_param(request, "concurrency", SUBDOMAIN_CONCURRENCY, SUBDOMAIN_MAX_CONCURRENCY)
+    try:
+        words = iter_wordlist(wordlist_path(wordlist)) if wordlist else COMMON_SUBDOMAINS
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def events():
+        found = []
+        async for event in iter_subdomains(domain, words, concurrency):
+            if event["event"] == "found":
+                found.append({"subdomain": event["subdomain"], "ips": event["ips"], "type": event["type"]})
+            elif event["event"] == "done":
+                search_history.add_search("subdomain", domain, {
+                    "domain": domain,
+                    "subdomains_found": found,
+                    "subdomains_count": len(found),
+                    "total_tested": event["total_tested"]
+                })
+            yield event
+    
+    return stream_response(http_request, events())
+
 # Google Dorking
 @app.post("/api/google-dork")
-async def dork_google(request: dict):
+async def dork_google(request: dict, http_request: Request, response: Response):
     try:
         query = request.get("query")
         dork_type = request.get("type", "general")
-        results = await google_dorking(query, dork_type)
+        results = await cached_lookup(
+            "google-dork", {"query": query, "type": dork_type},
+            lambda: google_dorking(query, dork_type), http_request, response
+        )
         search_history.add_search("google_dork", query, results)
         return results
     except Exception as e:
@@ -348,11 +885,14 @@ async def dork_google(request: dict):
 
 # Shodan Integration
 @app.post("/api/shodan-search")
-async def search_shodan(request: dict):
+async def search_shodan(request: dict, http_request: Request, response: Response):
     try:
         query = request.get("query")
         api_key = request.get("api_key")
-        results = await shodan_integration(query, api_key)
+        results = await cached_lookup(
+            "shodan-search", {"query": query, "api_key": api_key},
+            lambda: shodan_integration(query, api_key), http_request, response
+        )
         search_history.add_search("shodan", query, results)
         return results
     except Exception as e:
@@ -360,10 +900,13 @@ async def search_shodan(request: dict):
 
 # GitHub Analyzer
 @app.post("/api/github-analyze")
-async def analyze_github(request: dict):
+async def analyze_github(request: dict, http_request: Request, response: Response):
     try:
         username = request.get("username")
-        results = await github_repository_analyzer(username)
+        results = await cached_lookup(
+            "github-analyze", {"username": username},
+            lambda: github_repository_analyzer(username), http_request, response
+        )
         search_history.add_search("github", username, results)
         return results
     except Exception as e:
@@ -371,10 +914,13 @@ async def analyze_github(request: dict):
 
 # Advanced Geolocation
 @app.post("/api/geo-locate")
-async def geolocate_advanced(request: dict):
+async def geolocate_advanced(request: dict, http_request: Request, response: Response):
     try:
         ip = request.get("ip")
-        results = await advanced_ip_geolocation(ip)
+        results = await cached_lookup(
+            "geo-locate", {"ip": ip},
+            lambda: advanced_ip_geolocation(ip), http_request, response
+        )
         search_history.add_search("geolocation", ip, results)
         return results
     except Exception as e:
@@ -384,13 +930,31 @@ async def geolocate_advanced(request: dict):
 @app.post("/api/photo-location")
 async def extract_photo_location(file: UploadFile = File(...)):
     try:
-        contents = await file.read()
-        results = await photo_location_extractor(contents, file.filename)
+        results = await photo_location_extractor(file.file, file.filename)
         search_history.add_search("photo_location", file.filename, results)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Internal metrics
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "search_history": search_history.stats(),
+        "result_cache": result_cache.stats(),
+        "single_flight": lookup_flights.stats(),
+        "http_clients": http_clients.stats(),
+        "outbound": outbound_governor.stats(),
+        "pwned_ranges": pwned_ranges.stats(),
+        "breach_index": breach_indexes.stats(),
+        "password_dictionary": password_dictionary.stats(),
+        "image_metadata": image_metadata_cache.stats(),
+        "dns": dns_engine.stats(),
+        "scan_scheduler": scan_scheduler.stats(),
+        "jobs": job_manager.stats()
+    }
+
 # Health Check
 @app.get("/api/health")
 async def health_check():
@@ -0,0 +1,361 @@
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BREACH_INDEX_DIR = os.getenv("BREACH_INDEX_DIR", "./data/breach_index")
+BREACH_INDEX_SORT_CHUNK = int(os.getenv("BREACH_INDEX_SORT_CHUNK", "2000000"))
+BREACH_INDEX_BULK_MAX = int(os.getenv("BREACH_INDEX_BULK_MAX", "100000"))
+
+# File layout (little endian):
+#   header   MAGIC, version, prefix bits, record count
+#   buckets  (2**bits + 1) uint64 record offsets, one per digest prefix
+#   records  20-byte SHA-1 digest + uint32 count, sorted by digest
+MAGIC = b"OSBIDX\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+RECORD = struct.Struct("<20sI")
+DIGEST_SIZE = 20
+PREFIX_BITS = 16
+MAX_COUNT = 0xFFFFFFFF
+
+KINDS = ("passwords", "emails")
+
+
+def sha1_digest(value: str) -> bytes:
+    return hashlib.sha1(value.encode("utf-8")).digest()
+
+
+def email_digest(email: str) -> bytes:
+    """Emails are indexed by the SHA-1 of their trimmed, lowercased form"""
+    return sha1_digest(email.strip().lower())
+
+
+def _hex_digest(text: bytes) -> Optional[bytes]:
+    if len(text) != 40:
+        return None
+    try:
+        return bytes.fromhex(text.decode("ascii"))
+    except ValueError:
+        return None
+
+
+def parse_password_line(line: bytes) -> Optional[Tuple[bytes, int]]:
+    """"SHA1[:COUNT]" as published in the Pwned Passwords corpus"""
+    digest_hex, _, count = line.strip().partition(b":")
+    digest = _hex_digest(digest_hex)
+    if digest is None:
+        return None
+    return digest, int(count) if count.strip().isdigit() else 1
+
+
+def parse_email_line(line: bytes) -> Optional[Tuple[bytes, int]]:
+    """"EMAIL[:COUNT]" or an already hashed "SHA1[:COUNT]"; one line per breach otherwise.
+
+    Combo-list lines ("EMAIL:PASSWORD") index the address alone: whatever
+    follows the first colon after the "@" is a count only if it is numeric.
+    """
+    line = line.strip()
+    # Anything after a comma or tab is breach metadata, not part of the address
+    end = min((i for i in (line.find(b","), line.find(b"\t")) if i >= 0), default=len(line))
+    colon = line.find(b":", max(line.find(b"@"), 0), end)
+    value, rest = (line[:end], b"") if colon < 0 else (line[:colon], line[colon + 1:].strip())
+    count = int(rest) if rest.isdigit() else 1
+    value = value.strip()
+    digest = _hex_digest(value)
+    if digest is None:
+        if b"@" not in value:
+            return None
+        digest = email_digest(value.decode("utf-8", "replace"))
+    return digest, count
+
+
+PARSERS = {"passwords": parse_password_line, "emails": parse_email_line}
+
+
+class BreachIndex:
+    """Read side of one index file, memory mapped and opened lazily.
+
+    The bucket table turns the first ``bits`` of a digest into the slice
+    of records sharing that prefix, so a lookup is one table read plus a
+    binary search over a few thousand records at most, all served from
+    the page cache.
+
+    When the importer replaces the file, the new one is mapped and the
+    old map is only dropped, never closed: lookups already running on it
+    keep their reference and finish, and it is unmapped once the last of
+    them lets go.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._map = None
+        self._mtime = None
+        self._rejected = None
+        self.bits = PREFIX_BITS
+        self.records = 0
+        self.metrics = {"lookups": 0, "hits": 0}
+
+    @property
+    def available(self) -> bool:
+        return self._open() is not None
+
+    def count(self, digest: bytes) -> Optional[int]:
+        """Breach count for a 20-byte SHA-1 digest, or None without an index"""
+        index_map = self._open()
+        if index_map is None:
+            return None
+        return self._count(index_map, HEADER.unpack_from(index_map, 0)[2], digest)
+
+    def count_many(self, digests: Iterable[bytes]) -> List[Optional[int]]:
+        digests = list(digests)
+        index_map = self._open()
+        if index_map is None:
+            return [None] * len(digests)
+        # One map for the whole batch, and sorted probes walk the file front
+        # to back, which keeps page faults sequential on a cold index
+        bits = HEADER.unpack_from(index_map, 0)[2]
+        counts = [None] * len(digests)
+        for position in sorted(range(len(digests)), key=digests.__getitem__):
+            counts[position] = self._count(index_map, bits, digests[position])
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._map = self._mtime = None
+
+    def stats(self) -> Dict:
+        index_map = self._open()
+        return {
+            "path": self.path,
+            "available": index_map is not None,
+            "records": self.records,
+            "size_bytes": len(index_map) if index_map is not None else 0,
+            "prefix_bits": self.bits,
+            **self.metrics
+        }
+
+    def _count(self, index_map: mmap.mmap, bits: int, digest: bytes) -> int:
+        self.metrics["lookups"] += 1
+        bucket = int.from_bytes(digest[:4], "big") >> (32 - bits)
+        table = HEADER.size + bucket * 8
+        low, high = struct.unpack_from("<QQ", index_map, table)
+        records = HEADER.size + ((1 << bits) + 1) * 8
+
+        while low < high:
+            middle = (low + high) // 2
+            offset = records + middle * RECORD.size
+            candidate = index_map[offset:offset + DIGEST_SIZE]
+            if candidate < digest:
+                low = middle + 1
+            elif candidate > digest:
+                high = middle
+            else:
+                self.metrics["hits"] += 1
+                return struct.unpack_from("<I", index_map, offset + DIGEST_SIZE)[0]
+        return 0
+
+    def _open(self) -> Optional[mmap.mmap]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._map is not None:
+                self.close()
+            return None
+        index_map = self._map
+        if index_map is not None and mtime == self._mtime:
+            return index_map
+        if mtime == self._rejected:
+            return None
+
+        # First use, or the importer replaced the file since we mapped it
+        with self._lock:
+            if self._map is not None and mtime == self._mtime:
+                return self._map
+            try:
+                with open(self.path, "rb") as f:
+                    index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, bits, records = HEADER.unpack_from(index_map, 0)
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError("bad header")
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Error opening breach index {self.path}: {e}")
+                self._map, self._mtime, self._rejected = None, None, mtime
+                return None
+            self._map, self._mtime, self._rejected = index_map, mtime, None
+            self.bits, self.records = bits, records
+            return index_map
+
+
+class BreachIndexes:
+    """The password and email indexes under one directory"""
+
+    def __init__(self, directory: str = BREACH_INDEX_DIR):
+        self.directory = directory
+        self.passwords = BreachIndex(os.path.join(directory, "passwords.idx"))
+        self.emails = BreachIndex(os.path.join(directory, "emails.idx"))
+
+    def get(self, kind: str) -> BreachIndex:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown breach index {kind}")
+        return getattr(self, kind)
+
+    def password_count(self, password: str) -> Optional[int]:
+        return self.passwords.count(sha1_digest(password))
+
+    def email_count(self, email: str) -> Optional[int]:
+        return self.emails.count(email_digest(email))
+
+    def stats(self) -> Dict:
+        return {"directory": self.directory, **{kind: self.get(kind).stats() for kind in KINDS}}
+
+
+class UnsortedInput(Exception):
+    """Raised by the single-pass writer when the corpus is not sorted by hash"""
+
+
+def _sorted_runs(records: Iterator[Tuple[bytes, int]], chunk: int, directory: str) -> Tuple[List[str], List[bytes]]:
+    """Split records into sorted run files of ``chunk`` records, keeping the last run in memory"""
+    runs, buffer = [], []
+    for record in records:
+        buffer.append(RECORD.pack(*record))
+        if len(buffer) >= chunk:
+            buffer.sort()
+            fd, path = tempfile.mkstemp(dir=directory, suffix=".run")
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"".join(buffer))
+            runs.append(path)
+            buffer = []
+    buffer.sort()
+    return runs, buffer
+
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(RECORD.size * 4096)
+            if not block:
+                return
+            for offset in range(0, len(block), RECORD.size):
+                yield block[offset:offset + RECORD.size]
+
+
+def _parse_corpus(path: str, parse, summary: Dict) -> Iterator[Tuple[bytes, int]]:
+    summary["lines"] = summary["skipped"] = 0
+    with open(path, "rb") as f:
+        for line in f:
+            record = parse(line)
+            if record is None:
+                if line.strip():
+                    summary["skipped"] += 1
+                continue
+            summary["lines"] += 1
+            yield record
+
+
+def build_index(source: str, kind: str = "passwords", directory: str = BREACH_INDEX_DIR,
+                chunk: int = BREACH_INDEX_SORT_CHUNK, bits: int = PREFIX_BITS) -> Dict:
+    """Build ``<directory>/<kind>.idx`` from a local breach corpus.
+
+    Input already sorted by hash (as the Pwned Passwords download is) is
+    written in a single pass. Otherwise the corpus is sorted in chunks of
+    ``chunk`` records and merged, so memory stays bounded whatever its
+    size. Repeated digests are merged by summing their counts.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown breach index {kind}")
+    started = time.time()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}.idx")
+    summary = {"source": os.path.abspath(source), "kind": kind}
+
+    try:
+        summary["records"] = _write_index(_parse_corpus(source, PARSERS[kind], summary), path, bits)
+        summary["sorted_input"], summary["sort_runs"] = True, 0
+    except UnsortedInput:
+        # External merge sort: sorted runs on disk, then one k-way merge
+        runs, tail = _sorted_runs(_parse_corpus(source, PARSERS[kind], summary), chunk, directory)
+        try:
+            merged = heapq.merge(*(_read_run(run) for run in runs), tail)
+            summary["records"] = _write_index(map(RECORD.unpack, merged), path, bits)
+        finally:
+            for run in runs:
+                os.remove(run)
+        summary["sorted_input"], summary["sort_runs"] = False, len(runs) + 1
+
+    summary.update({
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time.time() - started, 1)
+    })
+    with open(os.path.join(directory, f"{kind}.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def _write_index(records: Iterator[Tuple[bytes, int]], path: str, bits: int) -> int:
+    """Write sorted (digest, count) records, raising UnsortedInput on the first one out of order"""
+    buckets = [0] * ((1 << bits) + 1)
+    shift = 32 - bits
+    written = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.seek(HEADER.size + len(buckets) * 8)
+            batch = []
+            pending_digest, pending_count = None, 0
+
+            def emit(digest: bytes, count: int):
+                nonlocal written
+                buckets[(int.from_bytes(digest[:4], "big") >> shift) + 1] += 1
+                batch.append(RECORD.pack(digest, min(count, MAX_COUNT)))
+                written += 1
+
+            for digest, count in records:
+                if digest == pending_digest:
+                    pending_count += count
+                    continue
+                if pending_digest is not None:
+                    if digest < pending_digest:
+                        raise UnsortedInput(path)
+                    emit(pending_digest, pending_count)
+                    if len(batch) >= 65536:
+                        f.write(b"".join(batch))
+                        batch = []
+                pending_digest, pending_count = digest, count
+            if pending_digest is not None:
+                emit(pending_digest, pending_count)
+            f.write(b"".join(batch))
+
+            # Per-bucket counts become cumulative start offsets
+            for bucket in range(1, len(buckets)):
+                buckets[bucket] += buckets[bucket - 1]
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, bits, written))
+            f.write(struct.pack(f"<{len(buckets)}Q", *buckets))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return written
+
+
+breach_indexes = BreachIndexes()
+
+
+if __name__ == "__main__":
+    # python -m services.breach_index passwords|emails <corpus file>
+    if len(sys.argv) != 3 or sys.argv[1] not in KINDS:
+        print("Usage: python -m services.breach_index passwords|emails <corpus file>")
+        sys.exit(1)
+    print(json.dumps(build_index(sys.argv[2], sys.argv[1]), indent=2))
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from dotenv import load_dotenv
+
+from services.singleflight import SingleFlight
+
+load_dotenv()
+
+DNS_NAMESERVERS = [ns.strip() for ns in os.getenv("DNS_NAMESERVERS", "").split(",") if ns.strip()]
+DNS_PORT = int(os.getenv("DNS_PORT", "53"))
+DNS_TIMEOUT = float(os.getenv("DNS_TIMEOUT", "2"))
+DNS_LIFETIME = float(os.getenv("DNS_LIFETIME", "5"))
+DNS_CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "10000"))
+DNS_NEGATIVE_TTL = int(os.getenv("DNS_NEGATIVE_TTL", "60"))
+DNS_MAX_TTL = int(os.getenv("DNS_MAX_TTL", "3600"))
+
+
+class DNSEngine:
+    """Shared async DNS resolver with a TTL-honouring answer cache.
+
+    Answers are cached for the TTL of their RRset (capped at ``max_ttl``);
+    NXDOMAIN and empty answers are cached for ``negative_ttl``. Timeouts
+    and server failures are not cached. Concurrent queries for the same
+    name and type share one upstream request.
+    """
+
+    def __init__(self, nameservers: List[str] = None, port: int = DNS_PORT,
+                 timeout: float = DNS_TIMEOUT, lifetime: float = DNS_LIFETIME,
+                 cache_size: int = DNS_CACHE_SIZE, negative_ttl: int = DNS_NEGATIVE_TTL,
+                 max_ttl: int = DNS_MAX_TTL):
+        nameservers = nameservers if nameservers is not None else DNS_NAMESERVERS
+        self.resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+        if nameservers:
+            self.resolver.nameservers = nameservers
+        self.resolver.port = port
+        self.resolver.timeout = timeout
+        self.resolver.lifetime = lifetime
+        self.cache_size = cache_size
+        self.negative_ttl = negative_ttl
+        self.max_ttl = max_ttl
+        # (name, rdtype) -> (expires_at, rdata list)
+        self.cache: "OrderedDict[Tuple[str, str], Tuple[float, List]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.metrics = {"queries": 0, "cache_hits": 0, "upstream": 0, "failures": 0}
+
+    async def resolve(self, name: str, rdtype: str, lifetime: Optional[float] = None, cache: bool = True) -> List:
+        """Return the rdata for name/rdtype, or [] if it does not exist or fails.
+
+        Pass ``cache=False`` for one-off names (e.g. brute-force candidates)
+        so they neither read nor evict cached answers.
+        """
+        key = (name.rstrip(".").lower(), rdtype.upper())
+        self.metrics["queries"] += 1
+
+        if cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    self.cache.move_to_end(key)
+                    self.metrics["cache_hits"] += 1
+                    return cached[1]
+                del self.cache[key]
+
+        return await self._flights.do(f"{key[0]}/{key[1]}", lambda: self._query(key, lifetime, cache))
+
+    async def resolve_many(self, name: str, rdtypes: List[str], lifetime: Optional[float] = None) -> Dict[str, List]:
+        """Resolve every record type at once"""
+        answers = await asyncio.gather(*(self.resolve(name, rdtype, lifetime) for rdtype in rdtypes))
+        return dict(zip(rdtypes, answers))
+
+    async def resolve_text(self, name: str, rdtypes: List[str], lifetime: Optional[float] = None) -> Dict[str, List[str]]:
+        """Like resolve_many, with each rdata rendered as a string"""
+        answers = await self.resolve_many(name, rdtypes, lifetime)
+        return {rdtype: [str(rdata) for rdata in rdatas] for rdtype, rdatas in answers.items()}
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "nameservers": list(self.resolver.nameservers),
+            "cached_answers": len(self.cache),
+            **self.metrics,
+            "deduplicated": self._flights.deduplicated
+        }
+
+    async def _query(self, key: Tuple[str, str], lifetime: Optional[float], cache: bool = True) -> List:
+        name, rdtype = key
+        self.metrics["upstream"] += 1
+
+        try:
+            answer = await self.resolver.resolve(name, rdtype, lifetime=lifetime)
+            rdatas = list(answer)
+            ttl = min(answer.rrset.ttl, self.max_ttl) if answer.rrset is not None else self.negative_ttl
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            rdatas = []
+            ttl = self.negative_ttl
+        except (dns.exception.DNSException, OSError):
+            self.metrics["failures"] += 1
+            return []
+
+        if cache:
+            self._store(key, rdatas, ttl)
+        return rdatas
+
+    def _store(self, key: Tuple[str, str], rdatas: List, ttl: int):
+        if ttl <= 0:
+            return
+        self.cache[key] = (time.monotonic() + ttl, rdatas)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+dns_engine = DNSEngine()
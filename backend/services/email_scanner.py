@@ -1,10 +1,12 @@
-import aiohttp
 import os
 import re
 from typing import Dict
 from datetime import datetime
 from dotenv import load_dotenv
 
+from services.breach_index import breach_indexes
+from services.http_client import client_session
+
 load_dotenv()
 
 USE_MOCK_DATA = os.getenv("USE_MOCK_DATA", "true").lower() == "true"
@@ -18,6 +20,18 @@ def validate_email(email: str) -> bool:
 async def check_haveibeenpwned(email: str) -> Dict:
     """Check if email appears in known data breaches"""
     
+    # A locally built breach index takes precedence over the API and mock data
+    local_count = breach_indexes.email_count(email)
+    if local_count is not None:
+        return {
+            "breaches_found": local_count > 0,
+            "breach_count": local_count,
+            "breaches": [],
+            "source": "local_index",
+            "risk_score": min(100, local_count * 20),
+            "risk_level": "HIGH" if local_count > 3 else "MEDIUM" if local_count > 0 else "LOW"
+        }
+    
     if not HIBP_API_KEY or USE_MOCK_DATA:
         # Return mock data
         return {
@@ -69,7 +83,7 @@ async def check_haveibeenpwned(email: str) -> Dict:
             'User-Agent': 'OSINT-Tool'
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             # Check breaches
             async with session.get(
                 f"https://haveibeenpwned.com/api/v3/breachedaccount/{email}",
@@ -1,44 +1,31 @@
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
-from typing import Dict
+from typing import BinaryIO, Dict, Optional, Union
 from datetime import datetime
 import io
 
-def convert_to_degrees(value):
-    """Convert GPS coordinates to degrees"""
-    d, m, s = value
-    return d + (m / 60.0) + (s / 3600.0)
+from services.image_metadata import GPSPosition, image_metadata_cache, stream_size
 
-def get_gps_coordinates(gps_info):
-    """Extract GPS coordinates from EXIF data"""
-    try:
-        gps_latitude = gps_info.get('GPSLatitude')
-        gps_latitude_ref = gps_info.get('GPSLatitudeRef')
-        gps_longitude = gps_info.get('GPSLongitude')
-        gps_longitude_ref = gps_info.get('GPSLongitudeRef')
-        
-        if gps_latitude and gps_latitude_ref and gps_longitude and gps_longitude_ref:
-            lat = convert_to_degrees(gps_latitude)
-            if gps_latitude_ref != 'N':
-                lat = -lat
-            
-            lon = convert_to_degrees(gps_longitude)
-            if gps_longitude_ref != 'E':
-                lon = -lon
-            
-            return {
-                'latitude': lat,
-                'longitude': lon,
-                'coordinates': f"{lat}, {lon}",
-                'google_maps_url': f"https://www.google.com/maps?q={lat},{lon}"
-            }
-    except:
-        pass
-    
-    return None
+def get_gps_coordinates(gps: Optional[GPSPosition]) -> Optional[Dict]:
+    """GPS block of the EXIF report for a decoded position"""
+    if gps is None:
+        return None
+    lat, lon = gps.latitude, gps.longitude
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'coordinates': f"{lat}, {lon}",
+        'google_maps_url': f"https://www.google.com/maps?q={lat},{lon}"
+    }
 
-async def extract_exif(image_data: bytes, filename: str) -> Dict:
-    """Extract EXIF metadata from image"""
+async def extract_exif(image_data: Union[bytes, BinaryIO], filename: str) -> Dict:
+    """Extract EXIF metadata from image
+    
+    ``image_data`` may be the raw bytes or a binary stream such as an
+    upload's spooled file. The report is rendered from the shared
+    metadata record, so an image already seen by photo-location is not
+    parsed again.
+    """
+    
+    stream = io.BytesIO(image_data) if isinstance(image_data, bytes) else image_data
     
     result = {
         "filename": filename,
@@ -52,52 +39,39 @@ async def extract_exif(image_data: bytes, filename: str) -> Dict:
     }
     
     try:
-        # Open image
-        image = Image.open(io.BytesIO(image_data))
+        metadata = await image_metadata_cache.load(stream)
         
         # Get basic file info
         result["file_info"] = {
-            "format": image.format,
-            "mode": image.mode,
-            "size": f"{image.size[0]}x{image.size[1]}",
-            "width": image.size[0],
-            "height": image.size[1],
-            "file_size_bytes": len(image_data)
+            "format": metadata.format,
+            "mode": metadata.mode,
+            "size": metadata.size,
+            "width": metadata.width,
+            "height": metadata.height,
+            "file_size_bytes": metadata.file_size
         }
         
-        # Extract EXIF data
-        exif_data = image._getexif()
-        
-        if exif_data:
+        if metadata.has_exif:
             result["exif_found"] = True
             
+            result["gps"] = get_gps_coordinates(metadata.gps)
+            if result["gps"]:
+                result["warnings"].append("⚠️ GPS coordinates found - exact location is exposed!")
+            
             # Process EXIF tags
-            for tag_id, value in exif_data.items():
-                tag = TAGS.get(tag_id, tag_id)
+            for tag, value in metadata.tags.items():
+                # Convert value to string if needed
+                if isinstance(value, bytes):
+                    try:
+                        value = value.decode()
+                    except:
+                        value = str(value)
+                
+                result["metadata"][tag] = value
                 
-                # Handle GPS info separately
-                if tag == "GPSInfo":
-                    gps_data = {}
-                    for gps_tag_id in value:
-                        gps_tag = GPSTAGS.get(gps_tag_id, gps_tag_id)
-                        gps_data[gps_tag] = value[gps_tag_id]
-                    
-                    result["gps"] = get_gps_coordinates(gps_data)
-                    if result["gps"]:
-                        result["warnings"].append("⚠️ GPS coordinates found - exact location is exposed!")
-                else:
-                    # Convert value to string if needed
-                    if isinstance(value, bytes):
-                        try:
-                            value = value.decode()
-                        except:
-                            value = str(value)
-                    
-                    result["metadata"][tag] = value
-                    
-                    # Categorize camera info
-                    if tag in ["Make", "Model", "LensModel", "LensMake"]:
-                        result["camera_info"][tag] = value
+                # Categorize camera info
+                if tag in ["Make", "Model", "LensModel", "LensMake"]:
+                    result["camera_info"][tag] = value
             
             # Check for sensitive data
             if "Make" in result["metadata"] or "Model" in result["metadata"]:
@@ -132,6 +106,6 @@ async def extract_exif(image_data: bytes, filename: str) -> Dict:
             "error": str(e),
             "exif_found": False,
             "file_info": {
-                "file_size_bytes": len(image_data)
+                "file_size_bytes": stream_size(stream)
             }
         }
@@ -1,11 +1,12 @@
 import aiohttp
-from typing import Dict, List
+from typing import BinaryIO, Dict, List, Union
 from datetime import datetime
+import asyncio
 import re
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
 import io
 
+from services.image_metadata import image_metadata_cache
+
 async def advanced_ip_geolocation(ip: str) -> Dict:
     """
     Advanced IP geolocation with mapping data
@@ -108,11 +109,16 @@ async def advanced_ip_geolocation(ip: str) -> Dict:
     return result
 
 
-async def photo_location_extractor(image_data: bytes, filename: str) -> Dict:
+async def photo_location_extractor(image_data: Union[bytes, BinaryIO], filename: str) -> Dict:
     """
     Extract GPS coordinates from photo and provide map visualization
+
+    Rendered from the same cached metadata record as the EXIF extractor,
+    so an image already seen there is not parsed again.
     """
     
+    stream = io.BytesIO(image_data) if isinstance(image_data, bytes) else image_data
+    
     result = {
         "filename": filename,
         "timestamp": datetime.now().isoformat(),
@@ -124,71 +130,55 @@ async def photo_location_extractor(image_data: bytes, filename: str) -> Dict:
     }
     
     try:
-        # Open image
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Extract EXIF data
-        exif_data = image._getexif()
+        metadata = await image_metadata_cache.load(stream)
         
-        if exif_data:
-            # Get GPS info
-            gps_info = {}
-            for tag, value in exif_data.items():
-                tag_name = TAGS.get(tag, tag)
-                if tag_name == "GPSInfo":
-                    for gps_tag in value:
-                        gps_tag_name = GPSTAGS.get(gps_tag, gps_tag)
-                        gps_info[gps_tag_name] = value[gps_tag]
-            
-            if gps_info:
-                # Convert GPS coordinates
-                lat = convert_gps_to_decimal(gps_info.get("GPSLatitude"), gps_info.get("GPSLatitudeRef"))
-                lng = convert_gps_to_decimal(gps_info.get("GPSLongitude"), gps_info.get("GPSLongitudeRef"))
+        if metadata.gps_tags:
+            gps = metadata.gps
+            if gps:
+                lat, lng = gps.latitude, gps.longitude
+                result["gps_data"] = {
+                    "latitude": lat,
+                    "longitude": lng,
+                    "altitude": gps.altitude if gps.altitude is not None else "Unknown",
+                    "timestamp": gps.timestamp if gps.timestamp is not None else "Unknown",
+                    "coordinates_string": f"{lat}, {lng}"
+                }
                 
-                if lat and lng:
-                    result["gps_data"] = {
-                        "latitude": lat,
-                        "longitude": lng,
-                        "altitude": gps_info.get("GPSAltitude", "Unknown"),
-                        "timestamp": gps_info.get("GPSTimeStamp", "Unknown"),
-                        "coordinates_string": f"{lat}, {lng}"
-                    }
-                    
-                    # Reverse geocode to get location name
-                    location_info = await reverse_geocode(lat, lng)
-                    result["location_info"] = location_info
-                    
-                    # Map data
-                    result["map_data"] = {
-                        "center": {"lat": lat, "lng": lng},
-                        "marker": {"lat": lat, "lng": lng},
-                        "zoom": 15,
-                        "google_maps_url": f"https://www.google.com/maps?q={lat},{lng}",
-                        "apple_maps_url": f"http://maps.apple.com/?q={lat},{lng}",
-                        "openstreetmap_url": f"https://www.openstreetmap.org/?mlat={lat}&mlon={lng}&zoom=15"
-                    }
-                    
-                    result["warnings"].append("⚠️ GPS coordinates found - Photo location is exposed!")
-                else:
-                    result["warnings"].append("GPS data present but coordinates couldn't be parsed")
+                # Reverse geocode to get location name
+                location_info = await reverse_geocode(lat, lng)
+                result["location_info"] = location_info
+                
+                # Map data
+                result["map_data"] = {
+                    "center": {"lat": lat, "lng": lng},
+                    "marker": {"lat": lat, "lng": lng},
+                    "zoom": 15,
+                    "google_maps_url": f"https://www.google.com/maps?q={lat},{lng}",
+                    "apple_maps_url": f"http://maps.apple.com/?q={lat},{lng}",
+                    "openstreetmap_url": f"https://www.openstreetmap.org/?mlat={lat}&mlon={lng}&zoom=15"
+                }
+                
+                result["warnings"].append("⚠️ GPS coordinates found - Photo location is exposed!")
             else:
-                result["warnings"].append("✓ No GPS data found in image")
+                result["warnings"].append("GPS data present but coordinates couldn't be parsed")
+        elif metadata.has_exif:
+            result["warnings"].append("✓ No GPS data found in image")
         
         # Photo metadata
         result["photo_metadata"] = {
-            "format": image.format,
-            "size": f"{image.width}x{image.height}",
-            "mode": image.mode,
-            "file_size": len(image_data)
+            "format": metadata.format,
+            "size": metadata.size,
+            "mode": metadata.mode,
+            "file_size": metadata.file_size
         }
         
         # Extract camera info if available
-        if exif_data:
+        if metadata.has_exif:
             result["camera_info"] = {
-                "make": exif_data.get(271, "Unknown"),  # Make
-                "model": exif_data.get(272, "Unknown"),  # Model
-                "datetime": exif_data.get(306, "Unknown"),  # DateTime
-                "software": exif_data.get(305, "Unknown")  # Software
+                "make": metadata.tags.get("Make", "Unknown"),
+                "model": metadata.tags.get("Model", "Unknown"),
+                "datetime": metadata.tags.get("DateTime", "Unknown"),
+                "software": metadata.tags.get("Software", "Unknown")
             }
     
     except Exception as e:
@@ -198,26 +188,6 @@ async def photo_location_extractor(image_data: bytes, filename: str) -> Dict:
     return result
 
 
-def convert_gps_to_decimal(coords, ref):
-    """Convert GPS coordinates to decimal format"""
-    if not coords:
-        return None
-    
-    try:
-        degrees = float(coords[0])
-        minutes = float(coords[1])
-        seconds = float(coords[2])
-        
-        decimal = degrees + (minutes / 60.0) + (seconds / 3600.0)
-        
-        if ref in ['S', 'W']:
-            decimal = -decimal
-        
-        return round(decimal, 6)
-    except:
-        return None
-
-
 async def reverse_geocode(lat: float, lng: float) -> Dict:
     """
     Reverse geocode coordinates to get location information
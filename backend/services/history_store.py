@@ -0,0 +1,440 @@
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (op, search id, entry, full results) as queued for the writer
+Record = Tuple[str, str, Optional[Dict], Any]
+
+
+class BlobStore:
+    """Content-addressed store for full search results.
+
+    Payloads are stored as ``<dir>/<sha256[:2]>/<sha256>.json`` so identical
+    results are written once and can be loaded lazily by digest.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def put(self, payload: Any) -> str:
+        data = json.dumps(payload, separators=(",", ":"), sort_keys=True, default=str).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        return digest
+
+    def get(self, digest: str) -> Optional[Any]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, digest: str):
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, live: set):
+        """Remove blobs no entry references, e.g. left behind by a crash"""
+        if not os.path.isdir(self.directory):
+            return
+
+        for bucket in os.listdir(self.directory):
+            bucket_dir = os.path.join(self.directory, bucket)
+            if not os.path.isdir(bucket_dir):
+                continue
+            for name in os.listdir(bucket_dir):
+                if name[:-len(".json")] not in live:
+                    os.remove(os.path.join(bucket_dir, name))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+
+class HistoryLog:
+    """Append-only JSON-lines log with an id -> offset index.
+
+    Every mutation is a single line appended to the log:
+
+        {"op": "add", "entry": {...}}
+        {"op": "del", "id": "..."}
+
+    so recording a search costs one small write regardless of how many
+    searches are already stored. Superseded records are reclaimed by
+    compaction once they make up a large enough share of the file.
+
+    Entries only carry a ``results_ref`` digest; the full results live in
+    a BlobStore next to the log and are reference counted across entries.
+    """
+
+    def __init__(self, path: str, blob_dir: Optional[str] = None,
+                 compact_min_bytes: int = 1024 * 1024, compact_ratio: float = 0.5):
+        self.path = path
+        self.blobs = BlobStore(blob_dir or os.path.join(os.path.dirname(path) or ".", "history_blobs"))
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_ratio = compact_ratio
+        # id -> (offset, length) of the live "add" record, oldest first
+        self.index: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        # id -> results digest, and how many live entries share each digest
+        self.refs: Dict[str, str] = {}
+        self.refcounts: Counter = Counter()
+        self.live_bytes = 0
+        self.file_size = 0
+        self._handle = None
+
+    def load(self) -> List[Dict]:
+        """Replay the log and return live entries, oldest first"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.index.clear()
+        self.refs.clear()
+        self.refcounts.clear()
+        self.live_bytes = 0
+        entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+        if os.path.exists(self.path):
+            offset = 0
+            with open(self.path, "rb") as f:
+                for line in f:
+                    length = len(line)
+                    if not line.endswith(b"\n"):
+                        # Torn final write from a crash; cut it off so appends stay line-aligned
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Unreadable record; it is dropped at the next compaction
+                        offset += length
+                        continue
+
+                    if record.get("op") == "add":
+                        entry = record["entry"]
+                        self._drop(entry["id"])
+                        entries.pop(entry["id"], None)
+                        entries[entry["id"]] = entry
+                        self.index[entry["id"]] = (offset, length)
+                        self.live_bytes += length
+                    elif record.get("op") == "del":
+                        self._drop(record["id"])
+                        entries.pop(record["id"], None)
+
+                    offset += length
+            if offset < os.path.getsize(self.path):
+                os.truncate(self.path, offset)
+            self.file_size = offset
+
+        # Logs written before results were split out carry them inline
+        inline = [entry for entry in entries.values() if "full_results" in entry]
+        if inline:
+            self._rewrite(list(entries.values()))
+        else:
+            for entry in entries.values():
+                self._retain(entry)
+
+        self.blobs.sweep(set(self.refcounts))
+        return list(entries.values())
+
+    def migrate(self, legacy_file: str) -> bool:
+        """Import a legacy search_history.json (newest first) into an empty log"""
+        if os.path.exists(self.path) or not os.path.exists(legacy_file):
+            return False
+
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"Error migrating history: {e}")
+            return False
+
+        self._rewrite(list(reversed(legacy)))
+        os.replace(legacy_file, legacy_file + ".migrated")
+        return True
+
+    @staticmethod
+    def add_record(entry: Dict, results: Any = None) -> Record:
+        return "add", entry["id"], entry, results
+
+    @staticmethod
+    def delete_record(search_id: str) -> Record:
+        return "del", search_id, None, None
+
+    def write_batch(self, records: List[Record]):
+        """Store results, encode and append records with a single write"""
+        if not records:
+            return
+
+        lines = []
+        offset = self.file_size
+        for op, search_id, entry, results in records:
+            self._drop(search_id)
+            self._release(search_id)
+
+            if op == "add":
+                if results is not None:
+                    entry["results_ref"] = self.blobs.put(results)
+                self._retain(entry)
+                line = _encode({"op": "add", "entry": entry})
+                self.index[search_id] = (offset, len(line))
+                self.live_bytes += len(line)
+            else:
+                line = _encode({"op": "del", "id": search_id})
+
+            lines.append(line)
+            offset += len(line)
+
+        handle = self._open()
+        handle.write(b"".join(lines))
+        handle.flush()
+        self.file_size = offset
+
+    def read(self, search_id: str) -> Optional[Dict]:
+        """Read a single entry straight from the log via the offset index"""
+        location = self.index.get(search_id)
+        if location is None:
+            return None
+
+        offset, length = location
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))["entry"]
+
+    def needs_compaction(self) -> bool:
+        dead_bytes = self.file_size - self.live_bytes
+        return (
+            self.file_size >= self.compact_min_bytes
+            and dead_bytes >= self.file_size * self.compact_ratio
+        )
+
+    def compact(self):
+        """Rewrite the log keeping only live records, copied by offset"""
+        self.close()
+        tmp_path = self.path + ".compact"
+        new_index: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        offset = 0
+
+        with open(tmp_path, "wb") as out:
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as src:
+                    for search_id, (old_offset, length) in self.index.items():
+                        src.seek(old_offset)
+                        out.write(src.read(length))
+                        new_index[search_id] = (offset, length)
+                        offset += length
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp_path, self.path)
+        self.index = new_index
+        self.live_bytes = offset
+        self.file_size = offset
+
+    def clear(self):
+        """Drop every record by truncating the log"""
+        self.close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        open(self.path, "wb").close()
+        self.blobs.clear()
+        self.index.clear()
+        self.refs.clear()
+        self.refcounts.clear()
+        self.live_bytes = 0
+        self.file_size = 0
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _open(self):
+        if self._handle is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._handle = open(self.path, "ab")
+        return self._handle
+
+    def _drop(self, search_id: str):
+        location = self.index.pop(search_id, None)
+        if location is not None:
+            self.live_bytes -= location[1]
+
+    def _retain(self, entry: Dict):
+        digest = entry.get("results_ref")
+        if digest:
+            self.refs[entry["id"]] = digest
+            self.refcounts[digest] += 1
+
+    def _release(self, search_id: str):
+        digest = self.refs.pop(search_id, None)
+        if digest is None:
+            return
+        self.refcounts[digest] -= 1
+        if self.refcounts[digest] <= 0:
+            del self.refcounts[digest]
+            self.blobs.delete(digest)
+
+    def _rewrite(self, entries: List[Dict]):
+        """Replace the log with fresh add records, moving inline results to blobs"""
+        records = []
+        for entry in entries:
+            results = entry.pop("full_results", None)
+            entry.setdefault("results_ref", None)
+            records.append(self.add_record(entry, results))
+
+        self.close()
+        self.index.clear()
+        self.refs.clear()
+        self.refcounts.clear()
+        self.live_bytes = 0
+        self.file_size = 0
+
+        # Build the new log beside the old one so a crash never loses history
+        final_path = self.path
+        self.path = final_path + ".compact"
+        open(self.path, "wb").close()
+        try:
+            self.write_batch(records)
+        finally:
+            self.close()
+            self.path = final_path
+        os.replace(final_path + ".compact", final_path)
+
+
+class HistoryWriter:
+    """Background thread that applies log appends in batches.
+
+    Request handlers only enqueue records. The writer waits up to
+    ``flush_interval`` seconds after the first queued record to collect up
+    to ``max_batch`` records, then encodes and appends them with a single
+    write.
+    """
+
+    _CLEAR = "clear"
+    _STOP = "stop"
+
+    def __init__(self, log: HistoryLog, flush_interval: float = 0.5, max_batch: int = 256,
+                 on_flush: Optional[Callable[[List[Record]], None]] = None):
+        self.log = log
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_flush = on_flush
+        self.queue: "queue.Queue[Tuple[str, List]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.metrics = {
+            "flushes": 0,
+            "records_flushed": 0,
+            "compactions": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, records: List[Record]):
+        self.queue.put(("append", records))
+
+    def submit_clear(self):
+        self.queue.put((self._CLEAR, []))
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the thread"""
+        if self.running:
+            self.queue.put((self._STOP, []))
+            self._thread.join(timeout)
+        self._thread = None
+        self.log.close()
+
+    def stats(self) -> Dict:
+        flushes = self.metrics["flushes"]
+        return {
+            "queue_depth": self.queue.qsize(),
+            "flush_interval": self.flush_interval,
+            "max_batch": self.max_batch,
+            "flushes": flushes,
+            "records_flushed": self.metrics["records_flushed"],
+            "compactions": self.metrics["compactions"],
+            "errors": self.metrics["errors"],
+            "last_flush_ms": round(self.metrics["last_flush_ms"], 3),
+            "max_flush_ms": round(self.metrics["max_flush_ms"], 3),
+            "avg_flush_ms": round(self.metrics["total_flush_ms"] / flushes, 3) if flushes else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            ops = [self.queue.get()]
+            pending = len(ops[0][1])
+            deadline = time.monotonic() + self.flush_interval
+
+            while ops[-1][0] not in (self._CLEAR, self._STOP) and pending < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                ops.append(op)
+                pending += len(op[1])
+
+            self._apply(ops)
+            if ops[-1][0] == self._STOP:
+                return
+
+    def _apply(self, ops: List[Tuple[str, List]]):
+        started = time.perf_counter()
+        batch: List[Record] = []
+        flushed = 0
+
+        try:
+            for kind, records in ops:
+                if kind == self._CLEAR:
+                    batch = []
+                    self.log.clear()
+                else:
+                    batch.extend(records)
+
+            self.log.write_batch(batch)
+            flushed = len(batch)
+            if self.on_flush:
+                self.on_flush(batch)
+            if self.log.needs_compaction():
+                self.log.compact()
+                self.metrics["compactions"] += 1
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"Error saving history: {e}")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.metrics["flushes"] += 1
+        self.metrics["records_flushed"] += flushed
+        self.metrics["last_flush_ms"] = elapsed_ms
+        self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed_ms)
+        self.metrics["total_flush_ms"] += elapsed_ms
+
+
+def _encode(record: Dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode()
@@ -0,0 +1,108 @@
+import os
+import ssl
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+import aiohttp
+from dotenv import load_dotenv
+
+from services.outbound_governor import outbound_governor
+
+load_dotenv()
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+
+class HTTPClientRegistry:
+    """Application-scoped aiohttp sessions sharing one connection pool.
+
+    All sessions use the same TCPConnector, so keep-alive connections, the
+    DNS cache and the TLS context are reused by every service instead of
+    being rebuilt per call. Every request also passes through the outbound
+    governor's per-host rate limits and circuit breakers. Sessions never
+    store cookies: they are shared by every user and lookup, and a cookie
+    set by one target must not change what the next lookup sees. Created
+    and closed by the FastAPI lifespan.
+    """
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = HTTP_DNS_CACHE_TTL, keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+                 timeout: float = HTTP_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        # One context for every connection, so certificates are loaded once
+        self.ssl_context = ssl.create_default_context()
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self.trace_configs = [outbound_governor.trace_config()]
+
+    @property
+    def started(self) -> bool:
+        return self._connector is not None and not self._connector.closed
+
+    async def start(self):
+        if self.started:
+            return
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            ssl=self.ssl_context
+        )
+
+    def get(self, name: str = "default") -> aiohttp.ClientSession:
+        """Return the named session, creating it on the shared connector"""
+        if not self.started:
+            raise RuntimeError("HTTP client registry is not started")
+
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=self._connector,
+                connector_owner=False,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=self.trace_configs
+            )
+            self._sessions[name] = session
+        return session
+
+    async def close(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+    def stats(self) -> Dict:
+        return {
+            "started": self.started,
+            "sessions": len(self._sessions),
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "dns_cache_ttl": self.dns_cache_ttl,
+            "keepalive_timeout": self.keepalive_timeout
+        }
+
+
+http_clients = HTTPClientRegistry()
+
+
+@asynccontextmanager
+async def client_session(name: str = "default") -> AsyncIterator[aiohttp.ClientSession]:
+    """Yield the shared session, or a throwaway one outside the app lifespan"""
+    if http_clients.started:
+        yield http_clients.get(name)
+    else:
+        async with aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar(),
+                                         trace_configs=http_clients.trace_configs) as session:
+            yield session
@@ -0,0 +1,672 @@
+import asyncio
+import hashlib
+import io
+import math
+import os
+import struct
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple, Union
+from PIL.ExifTags import GPSTAGS, TAGS
+from dotenv import load_dotenv
+
+from services.singleflight import SingleFlight
+
+load_dotenv()
+
+IMAGE_METADATA_CACHE_SIZE = int(os.getenv("IMAGE_METADATA_CACHE_SIZE", "256"))
+
+# EXIF pointer tags inside IFD0
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+# Upper bounds that keep a hostile file from making us read or loop forever
+MAX_IFD_ENTRIES = 1024
+MAX_METADATA_BOX = 16 * 1024 * 1024
+MAX_HEIF_ITEMS = 4096
+MAX_HEIF_EXTENTS = 256
+MAX_JPEG_FILL_BYTES = 1024
+SKIP_CHUNK = 64 * 1024
+HASH_CHUNK = 1024 * 1024
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"heim", b"heis", b"hevm", b"hevs", b"mif1", b"msf1", b"avif", b"avis"}
+
+# TIFF field types: (size of one value, struct code)
+TIFF_TYPES = {
+    1: (1, "B"), 2: (1, "s"), 3: (2, "H"), 4: (4, "L"), 5: (8, "LL"), 6: (1, "b"),
+    7: (1, "s"), 8: (2, "h"), 9: (4, "l"), 10: (8, "ll"), 11: (4, "f"), 12: (8, "d"), 13: (4, "L")
+}
+
+
+class MetadataError(ValueError):
+    """The stream is not an image we can read metadata from"""
+
+
+class StreamReader:
+    """Forward reads over a file-like object, counting the bytes consumed.
+
+    Skips seek when the stream supports it and read-and-discard otherwise,
+    so the parsers work the same on uploads, files and pipes.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.bytes_read = 0
+        self.pending = b""
+        try:
+            self.seekable = stream.seekable()
+            self.start = stream.tell() if self.seekable else 0
+        except (AttributeError, OSError):
+            self.seekable, self.start = False, 0
+        self.position = self.start
+
+    def peek(self, size: int) -> bytes:
+        data = self.read(size)
+        self.pending = data + self.pending
+        self.position -= len(data)
+        return data
+
+    def read(self, size: int) -> bytes:
+        data, self.pending = self.pending[:size], self.pending[size:]
+        if len(data) < size:
+            more = self.stream.read(size - len(data))
+            self.bytes_read += len(more)
+            data += more
+        self.position += len(data)
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise MetadataError("Unexpected end of image data")
+        return data
+
+    def skip(self, size: int):
+        buffered = min(size, len(self.pending))
+        self.pending = self.pending[buffered:]
+        self.position += buffered
+        size -= buffered
+        if size <= 0:
+            return
+        if self.seekable:
+            self.stream.seek(size, os.SEEK_CUR)
+            self.position += size
+            return
+        while size > 0:
+            data = self.read(min(size, SKIP_CHUNK))
+            if not data:
+                raise MetadataError("Unexpected end of image data")
+            size -= len(data)
+
+    def seek_to(self, offset: int):
+        """Move to an absolute offset from where the image starts"""
+        target = self.start + offset
+        if target >= self.position:
+            self.skip(target - self.position)
+        elif self.seekable:
+            self.stream.seek(target)
+            self.pending = b""
+            self.position = target
+        else:
+            raise MetadataError("Metadata lies behind the current position of a non-seekable stream")
+
+
+def _plain(value: Any) -> Any:
+    # Pillow's IFDRational and friends, as plain JSON-friendly numbers
+    if isinstance(value, tuple):
+        return tuple(_plain(v) for v in value)
+    if hasattr(value, "numerator") and hasattr(value, "denominator") and not isinstance(value, int):
+        return float(value.numerator) / value.denominator if value.denominator else None
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _decode_value(field_type: int, count: int, data: bytes, endian: str) -> Any:
+    if field_type == 2:
+        # ASCII: NUL terminated, decoded like Pillow does
+        return data.split(b"\0", 1)[0].decode("latin-1", "replace")
+    if field_type in (1, 7):
+        return data[0] if field_type == 1 and count == 1 else data
+    size, code = TIFF_TYPES[field_type]
+    values = struct.unpack(f"{endian}{code * count}", data)
+    if field_type in (5, 10):
+        values = tuple(n / d if d else None for n, d in zip(values[::2], values[1::2]))
+    values = tuple(_plain(v) for v in values)
+    return values[0] if count == 1 else values
+
+
+def _read_ifd(read_at: Callable[[int, int], bytes], offset: int, endian: str) -> Dict[int, Any]:
+    entries = {}
+    header = read_at(offset, 2)
+    if len(header) != 2:
+        return entries
+    count = min(struct.unpack(f"{endian}H", header)[0], MAX_IFD_ENTRIES)
+    table = read_at(offset + 2, count * 12)
+    for index in range(len(table) // 12):
+        tag, field_type, value_count, value_offset = struct.unpack_from(f"{endian}HHL4s", table, index * 12)
+        if field_type not in TIFF_TYPES or value_count == 0:
+            continue
+        size = TIFF_TYPES[field_type][0] * value_count
+        if size <= 4:
+            data = value_offset[:size]
+        else:
+            data = read_at(struct.unpack(f"{endian}L", value_offset)[0], size)
+            if len(data) != size:
+                continue
+        try:
+            entries[tag] = _decode_value(field_type, value_count, data, endian)
+        except struct.error:
+            continue
+    return entries
+
+
+def parse_tiff(read_at: Callable[[int, int], bytes]) -> Dict[int, Any]:
+    """IFD0 with the EXIF sub-IFD merged in and GPSInfo as its own dict, like Pillow's _getexif()"""
+    header = read_at(0, 8)
+    if header[:4] == b"II*\0":
+        endian = "<"
+    elif header[:4] == b"MM\0*":
+        endian = ">"
+    else:
+        raise MetadataError("Invalid TIFF header in EXIF data")
+    ifd0 = _read_ifd(read_at, struct.unpack(f"{endian}L", header[4:8])[0], endian)
+    merged = dict(ifd0)
+    if isinstance(ifd0.get(EXIF_IFD), int):
+        merged.update(_read_ifd(read_at, ifd0[EXIF_IFD], endian))
+    if isinstance(ifd0.get(GPS_IFD), int):
+        merged[GPS_IFD] = _read_ifd(read_at, ifd0[GPS_IFD], endian)
+    return merged
+
+
+def parse_exif_payload(payload: bytes) -> Dict[int, Any]:
+    if payload.startswith(b"Exif\0\0"):
+        payload = payload[6:]
+    return parse_tiff(lambda offset, size: payload[offset:offset + size])
+
+
+def _jpeg(reader: StreamReader) -> Dict:
+    info = {"format": "JPEG", "width": None, "height": None, "mode": None, "exif": {}}
+    reader.read_exact(2)
+    while True:
+        byte = reader.read(1)
+        if not byte:
+            break
+        # Segments are back to back until SOS, so anything else is not a JPEG we can read
+        if byte != b"\xff":
+            raise MetadataError("Expected a JPEG marker")
+        marker = reader.read_exact(1)[0]
+        fill = 0
+        while marker == 0xFF:
+            fill += 1
+            if fill > MAX_JPEG_FILL_BYTES:
+                raise MetadataError("Too many fill bytes before a JPEG marker")
+            marker = reader.read_exact(1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        # Compressed image data starts at SOS; there is no metadata past it
+        if marker in (0xD9, 0xDA):
+            break
+        length = struct.unpack(">H", reader.read_exact(2))[0] - 2
+        if length < 0:
+            raise MetadataError("Invalid JPEG segment length")
+        if marker == 0xE1 and not info["exif"]:
+            payload = reader.read_exact(length)
+            if payload.startswith(b"Exif\0\0"):
+                info["exif"] = parse_exif_payload(payload)
+        elif marker in JPEG_SOF_MARKERS:
+            frame = reader.read_exact(6)
+            _, info["height"], info["width"], components = struct.unpack(">BHHB", frame)
+            info["mode"] = JPEG_MODES.get(components)
+            # APPn segments precede the frame header, so this is the end of the metadata
+            break
+        else:
+            reader.skip(length)
+    return info
+
+
+def _png(reader: StreamReader) -> Dict:
+    info = {"format": "PNG", "width": None, "height": None, "mode": None, "exif": {}}
+    reader.read_exact(8)
+    while True:
+        header = reader.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">L4s", header)
+        if chunk_type == b"IHDR":
+            ihdr = reader.read_exact(length)
+            info["width"], info["height"], depth, color_type = struct.unpack(">LLBB", ihdr[:10])
+            info["mode"] = "1" if color_type == 0 and depth == 1 else \
+                "I;16" if color_type == 0 and depth == 16 else PNG_MODES.get(color_type)
+            reader.skip(4)
+        elif chunk_type == b"eXIf":
+            info["exif"] = parse_exif_payload(reader.read_exact(length))
+            reader.skip(4)
+        elif chunk_type in (b"IDAT", b"IEND"):
+            # Metadata chunks come before the image data
+            break
+        else:
+            reader.skip(length + 4)
+    return info
+
+
+def _webp(reader: StreamReader) -> Dict:
+    info = {"format": "WEBP", "width": None, "height": None, "mode": "RGB", "exif": {}}
+    reader.read_exact(12)
+    extended = expects_exif = False
+    while True:
+        header = reader.read(8)
+        if len(header) < 8:
+            break
+        fourcc, size = struct.unpack("<4sL", header)
+        padded = size + (size & 1)
+        if fourcc == b"VP8X":
+            data = reader.read_exact(padded)
+            extended, expects_exif = True, bool(data[0] & 0x08)
+            info["mode"] = "RGBA" if data[0] & 0x10 else "RGB"
+            info["width"] = 1 + int.from_bytes(data[4:7], "little")
+            info["height"] = 1 + int.from_bytes(data[7:10], "little")
+            if not expects_exif:
+                break
+        elif fourcc == b"EXIF":
+            info["exif"] = parse_exif_payload(reader.read_exact(size))
+            break
+        elif fourcc == b"VP8 " and not extended:
+            frame = reader.read_exact(10)
+            reader.skip(padded - 10)
+            info["width"] = struct.unpack("<H", frame[6:8])[0] & 0x3FFF
+            info["height"] = struct.unpack("<H", frame[8:10])[0] & 0x3FFF
+            break
+        elif fourcc == b"VP8L" and not extended:
+            bits = struct.unpack("<L", reader.read_exact(5)[1:5])[0]
+            reader.skip(padded - 5)
+            info["width"] = (bits & 0x3FFF) + 1
+            info["height"] = ((bits >> 14) & 0x3FFF) + 1
+            info["mode"] = "RGBA" if (bits >> 28) & 1 else "RGB"
+            break
+        else:
+            # Image data of an extended file sits between VP8X and EXIF
+            reader.skip(padded)
+    return info
+
+
+def _boxes(data: bytes, start: int = 0, end: int = None) -> Dict[bytes, list]:
+    """Child boxes of an in-memory ISOBMFF box payload, by type"""
+    boxes: Dict[bytes, list] = {}
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">L4s", data, offset)
+        header = 8
+        if size == 1:
+            size, header = struct.unpack_from(">Q", data, offset + 8)[0], 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            break
+        boxes.setdefault(box_type, []).append((offset + header, min(offset + size, end)))
+        offset += size
+    return boxes
+
+
+def _uint(data: bytes, offset: int, size: int, end: int) -> Tuple[int, int]:
+    """Big-endian unsigned field at ``offset``, which must end by ``end``"""
+    if offset + size > end:
+        raise MetadataError("Truncated HEIF metadata box")
+    return (int.from_bytes(data[offset:offset + size], "big") if size else 0), offset + size
+
+
+def _count(value: int, limit: int) -> int:
+    if value > limit:
+        raise MetadataError("Too many entries in HEIF metadata box")
+    return value
+
+
+def _heif_meta(meta: bytes) -> Dict:
+    """Primary item size and Exif item extents from a HEIF 'meta' box payload"""
+    children = _boxes(meta, 4)
+    primary = None
+    if b"pitm" in children:
+        start, _ = children[b"pitm"][0]
+        primary = struct.unpack_from(">H" if meta[start] == 0 else ">L", meta, start + 4)[0]
+
+    exif_items = set()
+    if b"iinf" in children:
+        start, end = children[b"iinf"][0]
+        version = meta[start]
+        entries_offset = start + (6 if version == 0 else 8)
+        for entry_start, entry_end in _boxes(meta, entries_offset, end).get(b"infe", []):
+            entry_version = meta[entry_start] if entry_start < entry_end else 0
+            if entry_version >= 2:
+                id_size = 2 if entry_version == 2 else 4
+                item_id, offset = _uint(meta, entry_start + 4, id_size, entry_end)
+                if meta[offset + 2:offset + 6] == b"Exif":
+                    exif_items.add(item_id)
+
+    extents = {}
+    if b"iloc" in children:
+        start, end = children[b"iloc"][0]
+        if start + 6 > end:
+            raise MetadataError("Truncated HEIF metadata box")
+        version = meta[start]
+        offset_size, length_size = meta[start + 4] >> 4, meta[start + 4] & 0xF
+        base_offset_size, index_size = meta[start + 5] >> 4, meta[start + 5] & 0xF if version in (1, 2) else 0
+        count, offset = _uint(meta, start + 6, 2 if version < 2 else 4, end)
+        for _ in range(_count(count, MAX_HEIF_ITEMS)):
+            item_id, offset = _uint(meta, offset, 2 if version < 2 else 4, end)
+            method = 0
+            if version in (1, 2):
+                method, offset = _uint(meta, offset, 2, end)
+                method &= 0xF
+            _, offset = _uint(meta, offset, 2, end)
+            base, offset = _uint(meta, offset, base_offset_size, end)
+            extent_count, offset = _uint(meta, offset, 2, end)
+            item_extents = []
+            for _ in range(_count(extent_count, MAX_HEIF_EXTENTS)):
+                if index_size:
+                    _, offset = _uint(meta, offset, index_size, end)
+                extent_offset, offset = _uint(meta, offset, offset_size, end)
+                extent_length, offset = _uint(meta, offset, length_size, end)
+                item_extents.append((base + extent_offset, extent_length))
+            if item_id in exif_items:
+                extents[item_id] = (method, item_extents)
+
+    width = height = None
+    if b"iprp" in children:
+        start, end = children[b"iprp"][0]
+        iprp = _boxes(meta, start, end)
+        properties = []
+        if b"ipco" in iprp:
+            ipco_start, ipco_end = iprp[b"ipco"][0]
+            offset = ipco_start
+            while offset + 8 <= ipco_end:
+                size, box_type = struct.unpack_from(">L4s", meta, offset)
+                if size < 8:
+                    break
+                properties.append((box_type, offset + 8))
+                offset += size
+        sizes = [struct.unpack_from(">LL", meta, at + 4) for box_type, at in properties if box_type == b"ispe"]
+        # The primary item's own ispe, else the largest one (grid tiles are smaller)
+        for ipma_start, ipma_end in iprp.get(b"ipma", []):
+            if ipma_start + 4 > ipma_end:
+                raise MetadataError("Truncated HEIF metadata box")
+            version, flags = meta[ipma_start], int.from_bytes(meta[ipma_start + 1:ipma_start + 4], "big")
+            count, offset = _uint(meta, ipma_start + 4, 4, ipma_end)
+            for _ in range(_count(count, MAX_HEIF_ITEMS)):
+                item_id, offset = _uint(meta, offset, 2 if version < 1 else 4, ipma_end)
+                associations, offset = _uint(meta, offset, 1, ipma_end)
+                for _ in range(associations):
+                    index, offset = _uint(meta, offset, 2 if flags & 1 else 1, ipma_end)
+                    index &= 0x7FFF if flags & 1 else 0x7F
+                    if item_id == primary and 0 < index <= len(properties) and properties[index - 1][0] == b"ispe":
+                        width, height = struct.unpack_from(">LL", meta, properties[index - 1][1] + 4)
+        if width is None and sizes:
+            width, height = max(sizes, key=lambda size: size[0] * size[1])
+
+    idat = children.get(b"idat", [None])[0]
+    return {"width": width, "height": height, "exif_extents": extents, "idat": idat}
+
+
+def _heif(reader: StreamReader) -> Dict:
+    info = {"format": "HEIF", "width": None, "height": None, "mode": "RGB", "exif": {}}
+    meta = None
+    while meta is None:
+        header = reader.read(8)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack(">L4s", header)
+        header_size = 8
+        if size == 1:
+            size, header_size = struct.unpack(">Q", reader.read_exact(8))[0], 16
+        if box_type == b"ftyp":
+            brand = reader.read_exact(size - header_size)[:4]
+            if brand in (b"avif", b"avis"):
+                info["format"] = "AVIF"
+        elif box_type == b"meta":
+            if size == 0 or size > MAX_METADATA_BOX:
+                raise MetadataError("HEIF metadata box too large")
+            meta = reader.read_exact(size - header_size)
+        elif size == 0:
+            break
+        else:
+            reader.skip(size - header_size)
+    if meta is None:
+        return info
+
+    parsed = _heif_meta(meta)
+    info["width"], info["height"] = parsed["width"], parsed["height"]
+    for method, extents in parsed["exif_extents"].values():
+        if method == 1 and parsed["idat"]:
+            idat_start, _ = parsed["idat"]
+            payload = b"".join(meta[idat_start + offset:idat_start + offset + length] for offset, length in extents)
+        elif method == 0:
+            chunks = []
+            for offset, length in sorted(extents):
+                reader.seek_to(offset)
+                chunks.append(reader.read_exact(length))
+            payload = b"".join(chunks)
+        else:
+            continue
+        # Exif items start with the offset of the TIFF header
+        tiff_offset = struct.unpack(">L", payload[:4])[0]
+        info["exif"] = parse_exif_payload(payload[4 + tiff_offset:])
+        break
+    return info
+
+
+def _pillow(stream: BinaryIO, reader: StreamReader) -> Dict:
+    # Other formats (TIFF, GIF, BMP, ...): Pillow's open only parses headers
+    from PIL import Image
+    stream.seek(reader.start)
+    image = Image.open(stream)
+    exif = image.getexif()
+    merged = {tag: _plain(value) for tag, value in exif.items()}
+    if EXIF_IFD in exif:
+        merged.update({tag: _plain(value) for tag, value in exif.get_ifd(EXIF_IFD).items()})
+    if GPS_IFD in exif:
+        merged[GPS_IFD] = {tag: _plain(value) for tag, value in exif.get_ifd(GPS_IFD).items()}
+    return {"format": image.format, "width": image.width, "height": image.height, "mode": image.mode, "exif": merged}
+
+
+def stream_size(stream: BinaryIO) -> Optional[int]:
+    """Total size of a seekable stream, leaving its position unchanged"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def read_image_metadata(stream: BinaryIO) -> Dict:
+    """Format, dimensions and EXIF of an image, read from a stream.
+
+    JPEG, PNG, WebP and HEIF/AVIF are parsed directly: only the segments,
+    chunks or boxes that carry metadata are read, everything else is
+    skipped, and parsing stops where the metadata ends. Pixel data is
+    never decoded. Other formats fall back to Pillow's header parser,
+    which needs a seekable stream.
+    """
+    reader = StreamReader(stream)
+    head = reader.peek(12)
+
+    if head[:3] == b"\xff\xd8\xff":
+        info = _jpeg(reader)
+    elif head[:8] == b"\x89PNG\r\n\x1a\n":
+        info = _png(reader)
+    elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        info = _webp(reader)
+    elif head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS:
+        info = _heif(reader)
+    elif reader.seekable:
+        info = _pillow(stream, reader)
+    else:
+        raise MetadataError("Unsupported image format")
+
+    info["bytes_read"] = reader.bytes_read
+    return info
+
+
+def gps_to_decimal(coords: Any, ref: Any = None) -> Optional[float]:
+    """Degrees/minutes/seconds as signed decimal degrees, negative for S and W"""
+    try:
+        degrees, minutes, seconds = (float(part) for part in coords[:3])
+    except (TypeError, ValueError):
+        return None
+    decimal = degrees + minutes / 60.0 + seconds / 3600.0
+    if not math.isfinite(decimal):
+        return None
+    return round(-decimal if ref in ("S", "W") else decimal, 6)
+
+
+class GPSPosition:
+    """Where a photo was taken, decoded from its GPSInfo tags"""
+
+    __slots__ = ("latitude", "longitude", "altitude", "timestamp")
+
+    def __init__(self, latitude: float, longitude: float, altitude: Optional[float] = None, timestamp: Any = None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_tags(cls, gps_tags: Dict[str, Any]) -> Optional["GPSPosition"]:
+        latitude = gps_to_decimal(gps_tags.get("GPSLatitude"), gps_tags.get("GPSLatitudeRef"))
+        longitude = gps_to_decimal(gps_tags.get("GPSLongitude"), gps_tags.get("GPSLongitudeRef"))
+        if latitude is None or longitude is None:
+            return None
+        altitude = gps_tags.get("GPSAltitude")
+        if not isinstance(altitude, (int, float)):
+            altitude = None
+        elif gps_tags.get("GPSAltitudeRef") in (1, b"\x01"):
+            # Reference 1 means below sea level
+            altitude = -altitude
+        return cls(latitude, longitude, altitude, gps_tags.get("GPSTimeStamp"))
+
+
+class ImageMetadata:
+    """Everything the image endpoints report about an upload, parsed once.
+
+    ``tags`` holds the EXIF tags by name (GPSInfo excluded), ``gps_tags``
+    the GPSInfo tags by name and ``gps`` the decoded position, if any.
+    Records are shared between requests through the cache and must be
+    treated as read only.
+    """
+
+    __slots__ = ("content_hash", "format", "width", "height", "mode", "file_size",
+                 "tags", "gps_tags", "gps", "bytes_read")
+
+    def __init__(self, content_hash: Optional[str], info: Dict, file_size: Optional[int]):
+        self.content_hash = content_hash
+        self.format = info["format"]
+        self.width = info["width"]
+        self.height = info["height"]
+        self.mode = info["mode"]
+        self.file_size = file_size
+        self.bytes_read = info["bytes_read"]
+        self.tags: Dict[Any, Any] = {}
+        self.gps_tags: Dict[Any, Any] = {}
+        for tag_id, value in info["exif"].items():
+            if tag_id == GPS_IFD and isinstance(value, dict):
+                self.gps_tags = {GPSTAGS.get(gps_tag, gps_tag): gps_value for gps_tag, gps_value in value.items()}
+            else:
+                self.tags[TAGS.get(tag_id, tag_id)] = value
+        self.gps = GPSPosition.from_tags(self.gps_tags) if self.gps_tags else None
+
+    @property
+    def has_exif(self) -> bool:
+        return bool(self.tags or self.gps_tags)
+
+    @property
+    def size(self) -> str:
+        return f"{self.width}x{self.height}"
+
+
+def fingerprint(stream: BinaryIO) -> Tuple[Optional[str], Optional[int]]:
+    """SHA-256 and size of a seekable stream's contents, leaving its position unchanged.
+
+    Reads the stream once, sequentially and in fixed-size chunks, so memory
+    stays flat however large the upload is. Non-seekable streams cannot be
+    rewound for the parse afterwards and get no fingerprint.
+    """
+    try:
+        if not stream.seekable():
+            return None, None
+        start = stream.tell()
+    except (AttributeError, OSError):
+        return None, None
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(HASH_CHUNK)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(start)
+    return digest.hexdigest(), size
+
+
+class ImageMetadataCache:
+    """Parsed image metadata, keyed by a hash of the image content.
+
+    The EXIF and photo-location endpoints both render from the same
+    ImageMetadata record, so the same photo uploaded to both (or uploaded
+    twice) is parsed once. Concurrent uploads of one image share a single
+    parse, and the most recently used ``size`` records stay in memory.
+    """
+
+    def __init__(self, size: int = IMAGE_METADATA_CACHE_SIZE):
+        self.size = size
+        self.entries: "OrderedDict[str, ImageMetadata]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.metrics = {"hits": 0, "parses": 0, "uncached": 0, "errors": 0}
+
+    async def load(self, image_data: Union[bytes, BinaryIO]) -> ImageMetadata:
+        """The metadata record of an image given as bytes or a binary stream"""
+        stream = io.BytesIO(image_data) if isinstance(image_data, (bytes, bytearray)) else image_data
+        content_hash, file_size = await asyncio.to_thread(fingerprint, stream)
+        if content_hash is None:
+            self.metrics["uncached"] += 1
+            return await self._parse(stream, None, None)
+
+        record = self.entries.get(content_hash)
+        if record is not None:
+            self.entries.move_to_end(content_hash)
+            self.metrics["hits"] += 1
+            return record
+        return await self._flights.do(content_hash, lambda: self._parse(stream, content_hash, file_size))
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.size,
+            "entries": len(self.entries),
+            "coalesced": self._flights.deduplicated,
+            **self.metrics
+        }
+
+    async def _parse(self, stream: BinaryIO, content_hash: Optional[str], file_size: Optional[int]) -> ImageMetadata:
+        self.metrics["parses"] += 1
+        try:
+            info = await asyncio.to_thread(read_image_metadata, stream)
+        except Exception:
+            self.metrics["errors"] += 1
+            raise
+        record = ImageMetadata(content_hash, info, file_size if file_size is not None else stream_size(stream))
+        if content_hash is not None and self.size > 0:
+            self.entries[content_hash] = record
+            self.entries.move_to_end(content_hash)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return record
+
+
+image_metadata_cache = ImageMetadataCache()
@@ -1,9 +1,10 @@
-import aiohttp
 import os
 from typing import Dict
 from datetime import datetime
 from dotenv import load_dotenv
 
+from services.http_client import client_session
+
 load_dotenv()
 
 USE_MOCK_DATA = os.getenv("USE_MOCK_DATA", "true").lower() == "true"
@@ -62,7 +63,7 @@ async def get_ip_geolocation(ip: str) -> Dict:
         if IPINFO_API_KEY:
             url += f"?token={IPINFO_API_KEY}"
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             async with session.get(url) as response:
                 if response.status == 200:
                     data = await response.json()
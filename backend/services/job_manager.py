@@ -0,0 +1,420 @@
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "./data/jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_FLUSH_INTERVAL = float(os.getenv("JOB_FLUSH_INTERVAL", "1.0"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 86400)))
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+# handler(params, emit) -> final result; emit() records a partial result
+JobHandler = Callable[[Dict, Callable[[Dict], None]], Awaitable[Any]]
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+class JobStore:
+    """SQLite-backed job table plus the partial results each job emitted"""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " events INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " result TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, seq))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def create(self, kind: str, params: Dict) -> Dict:
+        job_id = secrets.token_hex(8)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, _dumps(params), time.time())
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, params, status, created_at, started_at, finished_at, attempts, events, error, result"
+                " FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row, with_result) if row else None
+
+    def list(self, limit: int = 50, status: str = None) -> List[Dict]:
+        query = ("SELECT id, kind, params, status, created_at, started_at, finished_at, attempts, events, error, NULL"
+                 " FROM jobs")
+        args: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            args = (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC LIMIT ?", args + (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def update(self, job_id: str, if_status: str = None, **fields) -> bool:
+        """Set ``fields``; with ``if_status``, only while the job is in that status"""
+        if "result" in fields:
+            fields["result"] = _dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        query, args = f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+        if if_status is not None:
+            query, args = query + " AND status = ?", args + (if_status,)
+        with self._lock:
+            updated = self._conn.execute(query, args).rowcount > 0
+            self._conn.commit()
+        return updated
+
+    def start(self, job_id: str) -> bool:
+        """Mark a queued job running, discarding partial results of an interrupted attempt
+
+        False if the job is no longer queued, e.g. it was cancelled meanwhile.
+        """
+        with self._lock:
+            started = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, events = 0"
+                " WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+            ).rowcount > 0
+            if started:
+                self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+        return started
+
+    def add_events(self, job_id: str, first_seq: int, events: List[Dict]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, payload) VALUES (?, ?, ?)",
+                [(job_id, first_seq + offset, _dumps(event)) for offset, event in enumerate(events)]
+            )
+            self._conn.execute("UPDATE jobs SET events = MAX(events, ?) WHERE id = ?", (first_seq + len(events), job_id))
+            self._conn.commit()
+
+    def events(self, job_id: str, since: int = 0, limit: int = 1000) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, since, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def requeue_unfinished(self) -> List[str]:
+        """Put jobs interrupted by a restart back in the queue, oldest first"""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def prune(self, older_than: float) -> int:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?", (*FINISHED_STATES, older_than)
+            ).fetchall()
+            for (job_id,) in rows:
+                self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+                self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._conn.commit()
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _job(row, with_result: bool = False) -> Dict:
+        job = {
+            "job_id": row[0],
+            "kind": row[1],
+            "params": json.loads(row[2]),
+            "status": row[3],
+            "created_at": row[4],
+            "started_at": row[5],
+            "finished_at": row[6],
+            "attempts": row[7],
+            "events": row[8],
+            "error": row[9]
+        }
+        if with_result:
+            job["result"] = json.loads(row[10]) if row[10] else None
+        return job
+
+
+class LiveJob:
+    """In-memory state of a running job: buffered events and a change signal"""
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.flushed = 0
+        self.task: Optional[asyncio.Future] = None
+        self.cancel_requested = False
+        self.changed = asyncio.Event()
+
+    def emit(self, event: Dict):
+        self.events.append(event)
+        self.notify()
+
+    def notify(self):
+        # Wake current waiters; later waiters get a fresh event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class JobManager:
+    """Runs long lookups off the request path.
+
+    Jobs are persisted in a JobStore before they are queued, executed by
+    a fixed pool of worker tasks, and stream partial results through
+    ``emit``. Jobs still queued or running when the process stops are
+    queued again on the next start.
+    """
+
+    def __init__(self, store: JobStore = None, workers: int = JOB_WORKERS,
+                 flush_interval: float = JOB_FLUSH_INTERVAL, retention: int = JOB_RETENTION):
+        self._store = store
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._live: Dict[str, LiveJob] = {}
+        # Signalled whenever a job starts, finishes or is cancelled
+        self._changed: Optional[asyncio.Event] = None
+        self.metrics = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "recovered": 0}
+
+    @property
+    def store(self) -> JobStore:
+        # Opened lazily so importing the app does not touch the disk
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._changed = asyncio.Event()
+        store = self.store
+        await asyncio.to_thread(store.prune, time.time() - self.retention)
+        for job_id in await asyncio.to_thread(store.requeue_unfinished):
+            self._queue.put_nowait(job_id)
+            self.metrics["recovered"] += 1
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    async def submit(self, kind: str, params: Dict) -> Dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job manager is not started")
+
+        job = await asyncio.to_thread(self.store.create, kind, params)
+        self.metrics["submitted"] += 1
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    async def get(self, job_id: str, wait: float = 0, since: int = None, with_result: bool = False) -> Optional[Dict]:
+        """Return the job; with ``wait``, long-poll until it changes.
+
+        The job counts as changed once it has more than ``since`` partial
+        results (any new result if ``since`` is None), changes status or
+        finishes.
+        """
+        job = await self._load(job_id, with_result)
+        if job is None or wait <= 0:
+            return job
+
+        deadline = time.monotonic() + wait
+        status = job["status"]
+        since = job["events"] if since is None else since
+        while job["status"] == status and job["events"] <= since and status not in FINISHED_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            live = self._live.get(job_id)
+            signal = live.changed if live is not None else self._changed
+            try:
+                await asyncio.wait_for(signal.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            job = await self._load(job_id, with_result)
+        return job
+
+    async def _load(self, job_id: str, with_result: bool = False) -> Optional[Dict]:
+        job = await asyncio.to_thread(self.store.get, job_id, with_result)
+        live = self._live.get(job_id)
+        if job is not None and live is not None:
+            job["events"] = len(live.events)
+        return job
+
+    async def list(self, limit: int = 50, status: str = None) -> List[Dict]:
+        jobs = await asyncio.to_thread(self.store.list, limit, status)
+        for job in jobs:
+            live = self._live.get(job["job_id"])
+            if live is not None:
+                job["events"] = len(live.events)
+        return jobs
+
+    async def events(self, job_id: str, since: int = 0, limit: int = 1000) -> List[Dict]:
+        live = self._live.get(job_id)
+        if live is not None:
+            return live.events[since:since + limit]
+        return await asyncio.to_thread(self.store.events, job_id, since, limit)
+
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return job
+
+        # Still queued: the worker's start then finds it cancelled and skips it
+        if await asyncio.to_thread(self.store.update, job_id, if_status="queued",
+                                   status="cancelled", finished_at=time.time()):
+            self.metrics["cancelled"] += 1
+            self._notify()
+            return await asyncio.to_thread(self.store.get, job_id)
+
+        live = self._live.get(job_id)
+        if live is not None:
+            live.cancel_requested = True
+            if live.task is not None:
+                live.task.cancel()
+            # Give the worker a moment to record the cancellation
+            return await self.get(job_id, wait=5)
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._live),
+            "kinds": sorted(self.handlers),
+            **self.metrics
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            if job_id in self._live:
+                continue
+            # Registered before the first await, so a cancel that finds the job
+            # no longer queued always finds it here
+            live = self._live[job_id] = LiveJob()
+            try:
+                await self._run(job_id, live)
+            finally:
+                self._live.pop(job_id, None)
+
+    async def _run(self, job_id: str, live: LiveJob):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        # Cancelled (or pruned) while it waited in the queue
+        if job is None or job["status"] != "queued":
+            return
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            if await asyncio.to_thread(self.store.update, job_id, if_status="queued", status="failed",
+                                       error=f"Unknown job kind: {job['kind']}", finished_at=time.time()):
+                self.metrics["failed"] += 1
+            return
+
+        # Cancelled between the read above and here
+        if not await asyncio.to_thread(self.store.start, job_id):
+            return
+        self._notify()
+        live.task = asyncio.ensure_future(handler(job["params"], live.emit))
+        if live.cancel_requested:
+            live.task.cancel()
+        flusher = asyncio.ensure_future(self._flush_periodically(job_id, live))
+
+        fields: Dict[str, Any] = {}
+        try:
+            fields = {"status": "completed", "result": await live.task}
+        except asyncio.CancelledError:
+            if not live.cancel_requested:
+                # Shutting down: leave the job to be re-run on the next start
+                flusher.cancel()
+                live.task.cancel()
+                self._live.pop(job_id, None)
+                self.store.update(job_id, status="queued")
+                raise
+            fields = {"status": "cancelled"}
+        except Exception as e:
+            fields = {"status": "failed", "error": str(e)}
+        finally:
+            flusher.cancel()
+
+        fields["finished_at"] = time.time()
+        try:
+            await asyncio.to_thread(self._flush, job_id, live)
+            await asyncio.to_thread(self.store.update, job_id, **fields)
+        except Exception as e:
+            print(f"Error saving job {job_id}: {e}")
+        self.metrics[fields["status"]] += 1
+        self._live.pop(job_id, None)
+        live.notify()
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _flush_periodically(self, job_id: str, live: LiveJob):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self._flush, job_id, live)
+            except Exception as e:
+                print(f"Error saving job events: {e}")
+
+    def _flush(self, job_id: str, live: LiveJob):
+        count = len(live.events)
+        if count > live.flushed:
+            self.store.add_events(job_id, live.flushed, live.events[live.flushed:count])
+            live.flushed = count
@@ -1,17 +1,238 @@
 import socket
 import ssl
 import asyncio
-import dns.resolver
 import aiohttp
-from typing import Dict, List
+import os
+import secrets
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Set
 from datetime import datetime
 import subprocess
 import platform
+from dotenv import load_dotenv
 
-async def port_scanner(target: str, ports: List[int] = None, scan_type: str = "common") -> Dict:
+from services.dns_engine import dns_engine
+
+load_dotenv()
+
+WORDLIST_DIR = os.getenv("WORDLIST_DIR", "./wordlists")
+SUBDOMAIN_CONCURRENCY = int(os.getenv("SUBDOMAIN_CONCURRENCY", "200"))
+SUBDOMAIN_MAX_CONCURRENCY = int(os.getenv("SUBDOMAIN_MAX_CONCURRENCY", "1000"))
+SUBDOMAIN_TIMEOUT = float(os.getenv("SUBDOMAIN_TIMEOUT", "2"))
+PORT_SCAN_CONCURRENCY = int(os.getenv("PORT_SCAN_CONCURRENCY", "200"))
+PORT_SCAN_MAX_CONCURRENCY = int(os.getenv("PORT_SCAN_MAX_CONCURRENCY", "1000"))
+PORT_SCAN_RATE = float(os.getenv("PORT_SCAN_RATE", "1000"))
+PORT_SCAN_TIMEOUT = float(os.getenv("PORT_SCAN_TIMEOUT", "1.0"))
+PORT_SCAN_MIN_TIMEOUT = float(os.getenv("PORT_SCAN_MIN_TIMEOUT", "0.2"))
+PORT_SCAN_BANNER_TIMEOUT = float(os.getenv("PORT_SCAN_BANNER_TIMEOUT", "0.5"))
+
+DNS_RECORD_TYPES = ['A', 'AAAA', 'MX', 'NS', 'TXT', 'CNAME', 'SOA']
+
+# Ports probed for each scan type when no explicit list is given
+SCAN_PORTS = {
+    "quick": [21, 22, 23, 25, 80, 443, 3306, 3389, 8080],
+    "common": [
+        20, 21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 445, 993, 995,
+        1723, 3306, 3389, 5900, 8080, 8443
+    ],
+    "full": list(range(1, 1025))
+}
+
+# Ports that only answer after a request is sent
+HTTP_PORTS = {80, 443, 8000, 8080, 8443}
+
+
+def parse_ports(spec) -> List[int]:
+    """Parse a port list such as [22, 80] or "22,80,8000-8100" """
+    if isinstance(spec, str):
+        ports = []
+        for part in spec.split(","):
+            part = part.strip()
+            if "-" in part:
+                low, high = part.split("-", 1)
+                ports.extend(range(int(low), int(high) + 1))
+            elif part:
+                ports.append(int(part))
+    else:
+        ports = [int(port) for port in spec]
+    
+    if not ports or any(port < 1 or port > 65535 for port in ports):
+        raise ValueError("Ports must be between 1 and 65535")
+    return sorted(set(ports))
+
+
+class AdaptiveTimeout:
+    """Connect timeout derived from observed RTTs (RFC 6298 style).
+
+    Starts at ``initial``; once RTTs are observed it converges on
+    srtt + 4 * rttvar, kept between ``minimum`` and ``initial``.
+    """
+
+    def __init__(self, initial: float = PORT_SCAN_TIMEOUT, minimum: float = PORT_SCAN_MIN_TIMEOUT):
+        self.initial = initial
+        self.minimum = minimum
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+
+    @property
+    def value(self) -> float:
+        if self.srtt is None:
+            return self.initial
+        return max(self.minimum, min(self.initial, self.srtt + 4 * self.rttvar))
+
+    def observe(self, rtt: float):
+        self.samples += 1
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+
+class RateLimiter:
+    """Spaces out connection attempts to at most ``rate`` per second"""
+
+    def __init__(self, rate: float):
+        if not rate > 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def probe_port(ip: str, port: int, timeout: float) -> Dict:
+    """Try one TCP connect and classify the port as open, closed or filtered"""
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        return {"port": port, "state": "closed", "rtt": time.perf_counter() - started}
+    except (asyncio.TimeoutError, OSError):
+        return {"port": port, "state": "filtered", "rtt": None}
+    
+    rtt = time.perf_counter() - started
+    banner = ""
+    try:
+        # Many services greet first; HTTP only answers a request
+        try:
+            banner = (await asyncio.wait_for(reader.read(1024), PORT_SCAN_BANNER_TIMEOUT)).decode('utf-8', errors='ignore')
+        except asyncio.TimeoutError:
+            if port in HTTP_PORTS:
+                writer.write(f"HEAD / HTTP/1.0\r\nHost: {ip}\r\n\r\n".encode())
+                await writer.drain()
+                banner = (await asyncio.wait_for(reader.read(1024), PORT_SCAN_BANNER_TIMEOUT)).decode('utf-8', errors='ignore')
+    except (asyncio.TimeoutError, OSError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    
+    return {"port": port, "state": "open", "rtt": rtt, "banner": banner[:200]}
+
+
+async def resolve_target(target: str) -> str:
+    """Resolve a hostname to an IPv4 address without blocking the loop"""
+    infos = await asyncio.get_running_loop().getaddrinfo(target, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+    return infos[0][4][0]
+
+
+async def iter_port_scan(target: str, ports: Iterable[int], concurrency: int = PORT_SCAN_CONCURRENCY,
+                         rate: float = PORT_SCAN_RATE) -> AsyncIterator[Dict]:
+    """Scan ports with bounded concurrency, yielding open ports as they are found.
+
+    Yields a "resolved" event, an "open" event per open port, then a
+    "done" event with the closed/filtered ports and timing statistics.
+    ``rate`` caps connection attempts per second against the host, and
+    the connect timeout adapts to the RTTs seen so far. PORT_SCAN_RATE and
+    PORT_SCAN_MAX_CONCURRENCY are ceilings for both.
+    """
+    started = time.perf_counter()
+    ip = await resolve_target(target)
+    yield {"event": "resolved", "target": target, "ip": ip}
+    
+    ports = list(ports)
+    concurrency = max(1, min(int(concurrency), PORT_SCAN_MAX_CONCURRENCY, len(ports) or 1))
+    timeout = AdaptiveTimeout()
+    limiter = RateLimiter(min(float(rate), PORT_SCAN_RATE))
+    pending = iter(ports)
+    found = asyncio.Queue(maxsize=concurrency * 2)
+    closed, filtered = [], []
+    
+    async def worker():
+        for port in pending:
+            await limiter.acquire()
+            probe = await probe_port(ip, port, timeout.value)
+            if probe["rtt"] is not None:
+                timeout.observe(probe["rtt"])
+            
+            if probe["state"] == "open":
+                await found.put({
+                    "event": "open",
+                    "port": port,
+                    "state": "open",
+                    "service": get_service_name(port),
+                    "banner": probe["banner"],
+                    "rtt_ms": round(probe["rtt"] * 1000, 2)
+                })
+            elif probe["state"] == "closed":
+                closed.append(port)
+            else:
+                filtered.append(port)
+    
+    async def run_workers():
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await found.put(None)
+    
+    runner = asyncio.ensure_future(run_workers())
+    open_count = 0
+    try:
+        while True:
+            event = await found.get()
+            if event is None:
+                break
+            open_count += 1
+            yield event
+        await runner
+    finally:
+        runner.cancel()
+    
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "done",
+        "total_ports_scanned": len(ports),
+        "open_ports_count": open_count,
+        "closed_ports": sorted(closed),
+        "filtered_ports": sorted(filtered),
+        "concurrency": concurrency,
+        "final_timeout_ms": round(timeout.value * 1000, 2),
+        "rtt_samples": timeout.samples,
+        "duration_ms": round(elapsed * 1000, 2),
+        "ports_per_second": round(len(ports) / elapsed, 1) if elapsed else None
+    }
+
+
+async def port_scanner(target: str, ports: List[int] = None, scan_type: str = "common",
+                       concurrency: int = PORT_SCAN_CONCURRENCY, rate: float = PORT_SCAN_RATE,
+                       on_event: Callable[[Dict], None] = None) -> Dict:
     """
     Port scanner - FOR AUTHORIZED NETWORKS ONLY
     WARNING: Unauthorized port scanning is ILLEGAL
+    ``on_event`` is called with each scan event as it happens.
     """
     
     result = {
@@ -27,56 +248,37 @@ async def port_scanner(target: str, ports: List[int] = None, scan_type: str = "c
     
     # Common ports if not specified
     if ports is None:
-        if scan_type == "quick":
-            ports = [21, 22, 23, 25, 80, 443, 3306, 3389, 8080]
-        elif scan_type == "common":
-            ports = [
-                20, 21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 445, 993, 995,
-                1723, 3306, 3389, 5900, 8080, 8443
-            ]
-        else:  # full scan
-            ports = range(1, 1025)
+        ports = SCAN_PORTS.get(scan_type, SCAN_PORTS["full"])
     
-    # Resolve hostname to IP
     try:
-        ip = socket.gethostbyname(target)
-        result["resolved_ip"] = ip
-    except socket.gaierror:
-        result["error"] = "Unable to resolve hostname"
-        return result
-    
-    # Scan ports
-    for port in ports:
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            connection_result = sock.connect_ex((ip, port))
-            
-            if connection_result == 0:
-                # Port is open
-                service = get_service_name(port)
+        async for event in iter_port_scan(target, ports, concurrency, rate):
+            if on_event is not None:
+                on_event(event)
+            if event["event"] == "resolved":
+                result["resolved_ip"] = event["ip"]
+            elif event["event"] == "open":
                 result["open_ports"].append({
-                    "port": port,
+                    "port": event["port"],
                     "state": "open",
-                    "service": service
+                    "service": event["service"]
                 })
-                
-                # Try to get banner
-                try:
-                    sock.send(b'GET / HTTP/1.1\r\nHost: {}\r\n\r\n'.format(target).encode())
-                    banner = sock.recv(1024).decode('utf-8', errors='ignore')
-                    result["service_detection"][port] = {
-                        "service": service,
-                        "banner": banner[:200]  # First 200 chars
+                if event["banner"]:
+                    result["service_detection"][event["port"]] = {
+                        "service": event["service"],
+                        "banner": event["banner"]
                     }
-                except:
-                    pass
-            else:
-                result["closed_ports"].append(port)
-            
-            sock.close()
-        except socket.error:
-            result["filtered_ports"].append(port)
+            elif event["event"] == "done":
+                result["closed_ports"] = event["closed_ports"]
+                result["filtered_ports"] = event["filtered_ports"]
+                result["statistics"] = {
+                    key: event[key]
+                    for key in ("concurrency", "final_timeout_ms", "rtt_samples", "duration_ms", "ports_per_second")
+                }
+    except socket.gaierror:
+        result["error"] = "Unable to resolve hostname"
+        return result
+    
+    result["open_ports"].sort(key=lambda entry: entry["port"])
     
     # Summary
     result["summary"] = {
@@ -103,6 +305,12 @@ def get_service_name(port: int) -> str:
 
 async def ssl_certificate_analyzer(domain: str, port: int = 443) -> Dict:
     """Analyze SSL/TLS certificate"""
+    # The handshake uses blocking sockets, so keep it off the event loop
+    return await asyncio.to_thread(analyze_certificate, domain, port)
+
+
+def analyze_certificate(domain: str, port: int = 443) -> Dict:
+    """Blocking TLS handshake and certificate checks"""
     
     result = {
         "domain": domain,
@@ -195,62 +403,21 @@ async def dns_enumeration(domain: str) -> Dict:
     }
     
     try:
-        resolver = dns.resolver.Resolver()
-        
-        # A Records
-        try:
-            a_records = resolver.resolve(domain, 'A')
-            result["dns_records"]["A"] = [str(r) for r in a_records]
-        except:
-            result["dns_records"]["A"] = []
-        
-        # AAAA Records (IPv6)
-        try:
-            aaaa_records = resolver.resolve(domain, 'AAAA')
-            result["dns_records"]["AAAA"] = [str(r) for r in aaaa_records]
-        except:
-            result["dns_records"]["AAAA"] = []
-        
-        # MX Records
-        try:
-            mx_records = resolver.resolve(domain, 'MX')
-            result["dns_records"]["MX"] = [f"{r.preference} {r.exchange}" for r in mx_records]
-            result["mail_servers"] = [str(r.exchange) for r in mx_records]
-        except:
-            result["dns_records"]["MX"] = []
-        
-        # NS Records
-        try:
-            ns_records = resolver.resolve(domain, 'NS')
-            result["dns_records"]["NS"] = [str(r) for r in ns_records]
-            result["nameservers"] = [str(r) for r in ns_records]
-        except:
-            result["dns_records"]["NS"] = []
-        
-        # TXT Records
-        try:
-            txt_records = resolver.resolve(domain, 'TXT')
-            result["dns_records"]["TXT"] = [str(r) for r in txt_records]
-        except:
-            result["dns_records"]["TXT"] = []
+        # Every record type, DNSKEY included, is queried at once
+        records = await dns_engine.resolve_many(domain, DNS_RECORD_TYPES + ['DNSKEY'])
         
-        # CNAME Records
-        try:
-            cname_records = resolver.resolve(domain, 'CNAME')
-            result["dns_records"]["CNAME"] = [str(r) for r in cname_records]
-        except:
-            result["dns_records"]["CNAME"] = []
+        for record_type in DNS_RECORD_TYPES:
+            if record_type == 'MX':
+                result["dns_records"]["MX"] = [f"{r.preference} {r.exchange}" for r in records["MX"]]
+            else:
+                result["dns_records"][record_type] = [str(r) for r in records[record_type]]
         
-        # SOA Record
-        try:
-            soa_record = resolver.resolve(domain, 'SOA')
-            result["dns_records"]["SOA"] = [str(r) for r in soa_record]
-        except:
-            result["dns_records"]["SOA"] = []
+        result["mail_servers"] = [str(r.exchange) for r in records["MX"]]
+        result["nameservers"] = list(result["dns_records"]["NS"])
         
         # DNS Security checks
         result["dns_security"] = {
-            "dnssec_enabled": check_dnssec(domain),
+            "dnssec_enabled": bool(records["DNSKEY"]),
             "spf_record": check_spf(result["dns_records"].get("TXT", [])),
             "dmarc_record": check_dmarc(result["dns_records"].get("TXT", [])),
             "dkim_configured": "v=DKIM1" in str(result["dns_records"].get("TXT", []))
@@ -262,16 +429,6 @@ async def dns_enumeration(domain: str) -> Dict:
     return result
 
 
-def check_dnssec(domain: str) -> bool:
-    """Check if DNSSEC is enabled"""
-    try:
-        resolver = dns.resolver.Resolver()
-        resolver.resolve(domain, 'DNSKEY')
-        return True
-    except:
-        return False
-
-
 def check_spf(txt_records: List[str]) -> bool:
     """Check for SPF record"""
     return any('v=spf1' in record for record in txt_records)
@@ -282,8 +439,109 @@ def check_dmarc(txt_records: List[str]) -> bool:
     return any('v=DMARC1' in record for record in txt_records)
 
 
-async def subdomain_discovery(domain: str, wordlist: List[str] = None) -> Dict:
-    """Discover subdomains"""
+# Common subdomain list used when no wordlist is given
+COMMON_SUBDOMAINS = [
+    "www", "mail", "ftp", "localhost", "webmail", "smtp", "pop", "ns1", "ns2",
+    "webdisk", "ns", "cpanel", "whm", "autodiscover", "autoconfig", "m", "imap",
+    "test", "ns3", "blog", "dev", "admin", "mysql", "api", "cdn", "portal",
+    "staging", "app", "beta", "vpn", "git", "shop", "store", "mobile"
+]
+
+
+def wordlist_path(name: str) -> str:
+    """Resolve a wordlist name to a file inside WORDLIST_DIR"""
+    path = os.path.join(WORDLIST_DIR, os.path.basename(name))
+    if not os.path.isfile(path):
+        raise ValueError(f"Unknown wordlist: {name}")
+    return path
+
+
+def iter_wordlist(path: str) -> Iterator[str]:
+    """Stream candidate labels from a wordlist file one line at a time"""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            word = line.strip().lower()
+            if word and not word.startswith("#"):
+                yield word
+
+
+async def detect_wildcard(domain: str, probes: int = 3) -> Set[str]:
+    """Return the IPs random labels resolve to; empty if there is no wildcard"""
+    labels = [secrets.token_hex(8) for _ in range(probes)]
+    answers = await asyncio.gather(*(
+        dns_engine.resolve(f"{label}.{domain}", 'A', lifetime=SUBDOMAIN_TIMEOUT, cache=False)
+        for label in labels
+    ))
+    return {str(r) for rdatas in answers for r in rdatas}
+
+
+async def iter_subdomains(domain: str, words: Iterable[str], concurrency: int = SUBDOMAIN_CONCURRENCY) -> AsyncIterator[Dict]:
+    """Brute-force subdomains, yielding events as soon as they happen.
+
+    A fixed pool of ``concurrency`` workers pulls labels from ``words``
+    (which may be a lazily read file), so at most that many queries are in
+    flight and the wordlist is never held in memory. Yields a "wildcard"
+    event first, a "found" event per subdomain, then a final "done" event
+    with the sweep statistics.
+    """
+    started = time.perf_counter()
+    concurrency = max(1, min(int(concurrency), SUBDOMAIN_MAX_CONCURRENCY))
+    wildcard_ips = await detect_wildcard(domain)
+    yield {"event": "wildcard", "detected": bool(wildcard_ips), "ips": sorted(wildcard_ips)}
+
+    labels = iter(words)
+    found = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"tested": 0, "found": 0, "wildcard_filtered": 0}
+
+    async def worker():
+        for label in labels:
+            full_domain = f"{label}.{domain}"
+            answers = await dns_engine.resolve(full_domain, 'A', lifetime=SUBDOMAIN_TIMEOUT, cache=False)
+            stats["tested"] += 1
+            if not answers:
+                continue
+
+            ips = [str(r) for r in answers]
+            if wildcard_ips and set(ips) <= wildcard_ips:
+                stats["wildcard_filtered"] += 1
+                continue
+
+            stats["found"] += 1
+            await found.put({"event": "found", "subdomain": full_domain, "ips": ips, "type": "A"})
+
+    async def run_workers():
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await found.put(None)
+
+    runner = asyncio.ensure_future(run_workers())
+    try:
+        while True:
+            event = await found.get()
+            if event is None:
+                break
+            yield event
+        await runner
+    finally:
+        runner.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "done",
+        "total_tested": stats["tested"],
+        "subdomains_count": stats["found"],
+        "wildcard_filtered": stats["wildcard_filtered"],
+        "concurrency": concurrency,
+        "duration_ms": round(elapsed * 1000, 2),
+        "queries_per_second": round(stats["tested"] / elapsed, 1) if elapsed else None
+    }
+
+
+async def subdomain_discovery(domain: str, wordlist: Iterable[str] = None, wordlist_name: str = None,
+                              concurrency: int = SUBDOMAIN_CONCURRENCY,
+                              on_event: Callable[[Dict], None] = None) -> Dict:
+    """Discover subdomains; ``on_event`` is called with each sweep event"""
     
     result = {
         "domain": domain,
@@ -293,33 +551,34 @@ async def subdomain_discovery(domain: str, wordlist: List[str] = None) -> Dict:
         "method": "DNS brute force"
     }
     
-    # Common subdomain list if not provided
-    if wordlist is None:
-        wordlist = [
-            "www", "mail", "ftp", "localhost", "webmail", "smtp", "pop", "ns1", "ns2",
-            "webdisk", "ns", "cpanel", "whm", "autodiscover", "autoconfig", "m", "imap",
-            "test", "ns3", "blog", "dev", "admin", "mysql", "api", "cdn", "portal",
-            "staging", "app", "beta", "vpn", "git", "shop", "store", "mobile"
-        ]
-    
-    resolver = dns.resolver.Resolver()
-    resolver.timeout = 1
-    resolver.lifetime = 1
-    
-    for subdomain in wordlist:
-        full_domain = f"{subdomain}.{domain}"
+    # Named wordlists are streamed from WORDLIST_DIR
+    if wordlist_name:
         try:
-            answers = resolver.resolve(full_domain, 'A')
-            ips = [str(r) for r in answers]
+            wordlist = iter_wordlist(wordlist_path(wordlist_name))
+        except ValueError as e:
+            result["error"] = str(e)
+            return result
+        result["wordlist"] = os.path.basename(wordlist_name)
+    elif wordlist is None:
+        wordlist = COMMON_SUBDOMAINS
+    
+    async for event in iter_subdomains(domain, wordlist, concurrency):
+        if on_event is not None:
+            on_event(event)
+        if event["event"] == "found":
             result["subdomains_found"].append({
-                "subdomain": full_domain,
-                "ips": ips,
-                "type": "A"
+                "subdomain": event["subdomain"],
+                "ips": event["ips"],
+                "type": event["type"]
             })
-        except:
-            pass
-        
-        result["total_tested"] += 1
+        elif event["event"] == "wildcard":
+            result["wildcard"] = {"detected": event["detected"], "ips": event["ips"]}
+        elif event["event"] == "done":
+            result["total_tested"] = event["total_tested"]
+            result["statistics"] = {
+                key: event[key]
+                for key in ("wildcard_filtered", "concurrency", "duration_ms", "queries_per_second")
+            }
     
     result["subdomains_count"] = len(result["subdomains_found"])
     
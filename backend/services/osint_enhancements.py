@@ -1,9 +1,10 @@
-import aiohttp
 import asyncio
 from typing import Dict, List
 from datetime import datetime
 import base64
 
+from services.http_client import client_session
+
 async def google_dorking(query: str, dork_type: str = "general") -> Dict:
     """
     Google Dorking automation - Advanced search operators
@@ -184,7 +185,7 @@ async def shodan_integration(query: str, api_key: str = None) -> Dict:
     else:
         # Real API call
         try:
-            async with aiohttp.ClientSession() as session:
+            async with client_session() as session:
                 url = f"https://api.shodan.io/shodan/host/search?key={api_key}&query={query}"
                 async with session.get(url) as response:
                     if response.status == 200:
@@ -225,7 +226,7 @@ async def github_repository_analyzer(username: str, repo: str = None) -> Dict:
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             # Get user info
             async with session.get(f"https://api.github.com/users/{username}") as response:
                 if response.status == 200:
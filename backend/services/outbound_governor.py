@@ -0,0 +1,330 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from typing import Dict, Optional
+import aiohttp
+from yarl import URL
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def parse_host_rates(spec: str) -> Dict[str, float]:
+    """Parse OUTBOUND_HOST_RATES, e.g. "api.github.com=1,api.pwnedpasswords.com=50" """
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            host, rate = item.split("=", 1)
+            rates[host.strip().lower()] = float(rate)
+    return rates
+
+
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "10"))
+OUTBOUND_BURST = int(os.getenv("OUTBOUND_BURST", "20"))
+OUTBOUND_HOST_RATES = parse_host_rates(os.getenv("OUTBOUND_HOST_RATES", ""))
+OUTBOUND_MAX_WAIT = float(os.getenv("OUTBOUND_MAX_WAIT", "10"))
+OUTBOUND_MAX_RETRY_AFTER = float(os.getenv("OUTBOUND_MAX_RETRY_AFTER", "300"))
+OUTBOUND_MAX_HOSTS = int(os.getenv("OUTBOUND_MAX_HOSTS", "2000"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Responses that mean "slow down" rather than "broken"
+THROTTLE_STATUSES = {429, 503}
+
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised instead of sending a request to a host that keeps failing"""
+
+
+class RateLimitedError(aiohttp.ClientError):
+    """Raised when a host's rate limit would delay a request past the wait budget"""
+
+
+# Failures that are ours, not the host's: they never count towards its breaker
+BLAMELESS_ERRORS = (CircuitOpenError, RateLimitedError, asyncio.CancelledError,
+                    aiohttp.TooManyRedirects, aiohttp.InvalidURL)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket whose rate backs off on throttling and recovers on success"""
+
+    def __init__(self, rate: float, burst: int):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def throttled(self, retry_after: Optional[float]):
+        # Multiplicative decrease; Retry-After also pauses the host outright
+        self.rate = max(self.base_rate / 16, self.rate / 2)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after a cooldown"""
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self.trial_in_flight = False
+        if self.state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give back a half-open trial whose outcome will never be known"""
+        self.trial_in_flight = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+class HostState:
+    def __init__(self, rate: float, burst: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.metrics = {
+            "requests": 0,
+            "throttled": 0,
+            "failures": 0,
+            "rejected": 0,
+            "rate_limited": 0,
+            "retry_after_honoured": 0,
+            "waited_ms": 0.0
+        }
+        self.last_status = None
+
+
+class OutboundGovernor:
+    """Per-host rate limiting and circuit breaking for every outbound request.
+
+    Hooked into aiohttp sessions through ``trace_config()``: each request
+    first passes the host's breaker and token bucket (waiting at most
+    ``max_wait``), and its outcome feeds back into both. 429/503 halve the
+    host's rate and honour Retry-After; errors and other 5xx responses
+    count towards opening the breaker. Every redirect hop is governed and
+    recorded like a request of its own.
+    """
+
+    def __init__(self, rate: float = OUTBOUND_RATE, burst: int = OUTBOUND_BURST,
+                 host_rates: Dict[str, float] = None, max_wait: float = OUTBOUND_MAX_WAIT,
+                 max_hosts: int = OUTBOUND_MAX_HOSTS):
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = host_rates if host_rates is not None else OUTBOUND_HOST_RATES
+        self.max_wait = max_wait
+        self.max_hosts = max_hosts
+        self.hosts: "OrderedDict[str, HostState]" = OrderedDict()
+
+    def host(self, name: str) -> HostState:
+        state = self.hosts.get(name)
+        if state is None:
+            state = HostState(self.host_rates.get(name, self.rate), self.burst)
+            self.hosts[name] = state
+            if len(self.hosts) > self.max_hosts:
+                self._evict()
+        else:
+            self.hosts.move_to_end(name)
+        return state
+
+    async def acquire(self, name: str):
+        state = self.host(name)
+        if not state.breaker.allow():
+            state.metrics["rejected"] += 1
+            raise CircuitOpenError(f"Circuit open for {name}, retry in {state.breaker.retry_in():.0f}s")
+
+        wait = state.bucket.reserve()
+        if wait > self.max_wait:
+            state.bucket.refund()
+            state.metrics["rate_limited"] += 1
+            # Give back the half-open trial, it never went out
+            state.breaker.release_trial()
+            raise RateLimitedError(f"Rate limit for {name} would delay the request by {wait:.1f}s")
+        if wait > 0:
+            state.metrics["waited_ms"] += wait * 1000
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # The caller went away before the request was sent
+                state.bucket.refund()
+                state.breaker.release_trial()
+                raise
+        state.metrics["requests"] += 1
+
+    def record_response(self, name: str, status: int, headers=None):
+        state = self.host(name)
+        state.last_status = status
+        if status in THROTTLE_STATUSES:
+            retry_after = parse_retry_after(headers.get("Retry-After") if headers else None)
+            if retry_after is not None:
+                retry_after = min(retry_after, OUTBOUND_MAX_RETRY_AFTER)
+                state.metrics["retry_after_honoured"] += 1
+            state.metrics["throttled"] += 1
+            state.bucket.throttled(retry_after)
+            # Throttling is not a fault; leave the breaker as it is
+            state.breaker.release_trial()
+        elif status >= 500:
+            state.metrics["failures"] += 1
+            state.breaker.failure()
+        else:
+            state.bucket.succeeded()
+            state.breaker.success()
+
+    def record_failure(self, name: str):
+        state = self.host(name)
+        state.metrics["failures"] += 1
+        state.breaker.failure()
+
+    def release(self, name: str):
+        """A request that went out but whose outcome says nothing about the host"""
+        state = self.hosts.get(name)
+        if state is not None:
+            state.breaker.release_trial()
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx: SimpleNamespace(hosts=set()))
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_redirect.append(self._on_request_redirect)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_request_exception.append(self._on_request_exception)
+        return trace_config
+
+    def stats(self, top: int = 50) -> Dict:
+        """Busiest-throttled hosts first, then those with open breakers"""
+        ranked = sorted(
+            self.hosts.items(),
+            key=lambda item: (item[1].metrics["throttled"] + item[1].metrics["rejected"], item[1].metrics["failures"]),
+            reverse=True
+        )
+        return {
+            "hosts_tracked": len(self.hosts),
+            "open_circuits": [name for name, state in self.hosts.items() if state.breaker.state != "closed"],
+            "default_rate": self.rate,
+            "burst": self.burst,
+            "hosts": {
+                name: {
+                    "breaker": state.breaker.state,
+                    "consecutive_failures": state.breaker.failures,
+                    "rate": round(state.bucket.rate, 3),
+                    "paused_for": round(max(0.0, state.bucket.paused_until - time.monotonic()), 1),
+                    "last_status": state.last_status,
+                    **{key: round(value, 1) if isinstance(value, float) else value
+                       for key, value in state.metrics.items()}
+                }
+                for name, state in ranked[:top]
+            }
+        }
+
+    async def _on_request_start(self, session, context, params):
+        host = params.url.host
+        await self.acquire(host)
+        # Only requests that actually went out count towards the breaker
+        context.hosts.add(host)
+
+    async def _on_request_end(self, session, context, params):
+        host = params.url.host
+        if host in context.hosts:
+            context.hosts.discard(host)
+            self.record_response(host, params.response.status, params.response.headers)
+
+    async def _on_request_redirect(self, session, context, params):
+        # aiohttp only fires on_request_start once, so each hop is closed out
+        # here and the next one has to pass its own host's breaker and bucket
+        await self._on_request_end(session, context, params)
+        location = params.response.headers.get("Location") or params.response.headers.get("URI")
+        if location is None:
+            return
+        try:
+            target = URL(location)
+            # Relative and scheme-relative locations resolve as aiohttp does
+            if not target.scheme:
+                target = params.url.join(target)
+        except ValueError:
+            return
+        if target.scheme in ("http", "https") and target.host:
+            await self.acquire(target.host)
+            context.hosts.add(target.host)
+
+    async def _on_request_exception(self, session, context, params):
+        # Our own rejections, redirects we refused to follow and callers going
+        # away say nothing about the host, but a trial they held is given back
+        for host in context.hosts:
+            if isinstance(params.exception, BLAMELESS_ERRORS):
+                self.release(host)
+            else:
+                self.record_failure(host)
+        context.hosts.clear()
+
+    def _evict(self):
+        # Drop the least recently used host that is not mid-incident
+        for name, state in self.hosts.items():
+            if state.breaker.state == "closed" and state.bucket.rate >= state.bucket.base_rate:
+                del self.hosts[name]
+                return
+        self.hosts.popitem(last=False)
+
+
+outbound_governor = OutboundGovernor()
@@ -1,137 +1,172 @@
+import os
 import re
 import hashlib
-import aiohttp
-from typing import Dict, List
+import math
+import string
+from typing import Dict, List, Tuple
 from datetime import datetime
+from dotenv import load_dotenv
 
-# Common weak passwords list (top 100)
-COMMON_PASSWORDS = [
-    "123456", "password", "123456789", "12345678", "12345", "1234567", "password1",
-    "123123", "1234567890", "000000", "abc123", "qwerty", "iloveyou", "admin",
-    "welcome", "monkey", "login", "starwars", "dragon", "master", "hello", "freedom",
-    "whatever", "qazwsx", "trustno1", "654321", "jordan23", "harley", "password123",
-    "123321", "qwertyuiop", "superman", "123qwe", "princess", "batman", "solo"
-]
+from services.breach_index import breach_indexes, sha1_digest
+from services.password_dictionary import COMMON_PASSWORDS, password_dictionary
+from services.password_estimator import estimate_password
+from services.pwned_ranges import pwned_ranges
 
-async def analyze_password_strength(password: str) -> Dict:
-    """Comprehensive password strength analysis"""
-    
-    result = {
-        "password_length": len(password),
-        "timestamp": datetime.now().isoformat(),
-        "strength_score": 0,
-        "strength_level": "",
-        "characteristics": {},
-        "vulnerabilities": [],
-        "recommendations": [],
-        "entropy": 0,
-        "crack_time_estimates": {},
-        "breach_check": {}
-    }
-    
-    # Character type analysis
-    has_lowercase = bool(re.search(r'[a-z]', password))
-    has_uppercase = bool(re.search(r'[A-Z]', password))
-    has_digits = bool(re.search(r'\d', password))
-    has_special = bool(re.search(r'[!@#$%^&*()_+\-=\[\]{};:\'",.<>?/\\|`~]', password))
-    
-    result["characteristics"] = {
-        "has_lowercase": has_lowercase,
-        "has_uppercase": has_uppercase,
-        "has_digits": has_digits,
-        "has_special_chars": has_special,
-        "length": len(password),
-        "unique_chars": len(set(password)),
-        "repeated_chars": len(password) - len(set(password))
+load_dotenv()
+
+PASSWORD_BATCH_MAX = int(os.getenv("PASSWORD_BATCH_MAX", "10000"))
+PASSWORD_MAX_LENGTH = int(os.getenv("PASSWORD_MAX_LENGTH", "256"))
+# Total characters per batch, which bounds the estimator work a batch can ask for
+PASSWORD_BATCH_MAX_CHARS = int(os.getenv("PASSWORD_BATCH_MAX_CHARS", "50000"))
+
+# Character class bits, looked up once per distinct character
+LOWERCASE, UPPERCASE, DIGIT, SPECIAL = 1, 2, 4, 8
+CHAR_CLASSES = {
+    **{c: LOWERCASE for c in string.ascii_lowercase},
+    **{c: UPPERCASE for c in string.ascii_uppercase},
+    **{c: DIGIT for c in string.digits},
+    **{c: SPECIAL for c in "!@#$%^&*()_+-=[]{};:'\",.<>?/\\|`~"}
+}
+
+REPEATED_PATTERN = re.compile(r'(.)\1{2,}')
+SEQUENTIAL_PATTERN = re.compile(r'012|123|234|345|456|567|678|789|890|abc|def|ghi')
+KEYBOARD_PATTERN = re.compile(r'qwer|asdf|zxcv')
+COMMON_WORDS_PATTERN = re.compile(r'password|admin|user|login|welcome|test')
+
+# Attack speeds used for crack time estimates, in guesses per second
+ATTACK_SPEEDS = {
+    "online_attack": 1000,
+    "offline_slow": 1_000_000,
+    "offline_fast": 1_000_000_000,
+    "gpu_cluster": 100_000_000_000
+}
+
+# Highest strength score allowed for each pattern estimate score (0-4),
+# so rule-friendly but guessable passwords like "Password1!" stay weak
+SCORE_CEILINGS = (19, 39, 59, 79, 100)
+
+# Vulnerability flags, in the order they are reported
+VULNERABILITIES = {
+    "common_password": "⚠️ CRITICAL: Password is in common password list",
+    "repeated_chars": "Repeated characters detected",
+    "sequential_chars": "Sequential characters detected",
+    "keyboard_pattern": "Keyboard pattern detected",
+    "common_words": "Contains common words"
+}
+
+
+def classify_characters(password: str) -> Tuple[int, int]:
+    """(character class bitmask, distinct character count) in one pass"""
+    distinct = set(password)
+    mask = 0
+    for char in distinct:
+        # \d also matches non-ASCII decimal digits
+        mask |= CHAR_CLASSES.get(char) or (DIGIT if char.isdecimal() else 0)
+    return mask, len(distinct)
+
+
+def crack_times(guesses: float) -> Dict[str, str]:
+    return {attack: estimate_crack_time(guesses, speed) for attack, speed in ATTACK_SPEEDS.items()}
+
+
+def score_password(password: str) -> Dict:
+    """Everything in the strength analysis except the breach check"""
+    mask, unique_chars = classify_characters(password)
+    length = len(password)
+    lowered = password.lower()
+    dictionary_match = password_dictionary.lookup(lowered)
+    match = dictionary_match["match"] if dictionary_match else None
+    flags = {
+        "common_password": match in ("exact", "l33t"),
+        "repeated_chars": REPEATED_PATTERN.search(password) is not None,
+        "sequential_chars": SEQUENTIAL_PATTERN.search(lowered) is not None,
+        "keyboard_pattern": match == "keyboard_walk" or KEYBOARD_PATTERN.search(lowered) is not None,
+        "common_words": COMMON_WORDS_PATTERN.search(lowered) is not None
     }
     
     # Calculate strength score (0-100)
-    score = 0
-    
-    # Length scoring
-    if len(password) >= 8:
-        score += 20
-    if len(password) >= 12:
-        score += 15
-    if len(password) >= 16:
-        score += 15
-    
-    # Character variety scoring
-    if has_lowercase:
-        score += 10
-    if has_uppercase:
-        score += 10
-    if has_digits:
-        score += 10
-    if has_special:
-        score += 15
+    score = (20 if length >= 8 else 0) + (15 if length >= 12 else 0) + (15 if length >= 16 else 0)
+    score += (10 if mask & LOWERCASE else 0) + (10 if mask & UPPERCASE else 0) + \
+        (10 if mask & DIGIT else 0) + (15 if mask & SPECIAL else 0)
     
     # Penalty for common patterns
-    if password.lower() in COMMON_PASSWORDS:
+    if flags["common_password"]:
         score = max(0, score - 50)
-        result["vulnerabilities"].append("⚠️ CRITICAL: Password is in common password list")
-    
-    if re.search(r'(.)\1{2,}', password):  # Repeated characters
-        score -= 10
-        result["vulnerabilities"].append("Repeated characters detected")
+    score -= 10 * (flags["repeated_chars"] + flags["sequential_chars"] + flags["keyboard_pattern"])
+    score -= 15 * flags["common_words"]
     
-    if re.search(r'(012|123|234|345|456|567|678|789|890|abc|def|ghi)', password.lower()):
-        score -= 10
-        result["vulnerabilities"].append("Sequential characters detected")
-    
-    if re.search(r'(qwer|asdf|zxcv)', password.lower()):
-        score -= 10
-        result["vulnerabilities"].append("Keyboard pattern detected")
-    
-    # Common words check
-    common_words = ['password', 'admin', 'user', 'login', 'welcome', 'test']
-    if any(word in password.lower() for word in common_words):
-        score -= 15
-        result["vulnerabilities"].append("Contains common words")
-    
-    result["strength_score"] = max(0, min(100, score))
-    
-    # Strength level
+    # Entropy and crack times come from the guesses a pattern-aware attacker
+    # needs, not from charset size ** length
+    estimate = estimate_password(password)
+    if password:
+        score = min(score, SCORE_CEILINGS[estimate["score"]])
+    return {
+        "mask": mask,
+        "length": length,
+        "unique_chars": unique_chars,
+        "flags": flags,
+        "dictionary_match": dictionary_match,
+        "score": score,
+        "estimate": estimate,
+        "entropy": round(math.log2(estimate["guesses"]), 2) if password else 0,
+        "crack_time_estimates": crack_times(estimate["guesses"]) if password else {}
+    }
+
+
+def strength_level(score: int) -> str:
     if score >= 80:
-        result["strength_level"] = "VERY STRONG 🟢"
+        return "VERY STRONG 🟢"
     elif score >= 60:
-        result["strength_level"] = "STRONG 🟡"
+        return "STRONG 🟡"
     elif score >= 40:
-        result["strength_level"] = "MODERATE 🟠"
+        return "MODERATE 🟠"
     elif score >= 20:
-        result["strength_level"] = "WEAK 🔴"
-    else:
-        result["strength_level"] = "VERY WEAK 🔴"
-    
-    # Calculate entropy
-    charset_size = 0
-    if has_lowercase:
-        charset_size += 26
-    if has_uppercase:
-        charset_size += 26
-    if has_digits:
-        charset_size += 10
-    if has_special:
-        charset_size += 32
+        return "WEAK 🔴"
+    return "VERY WEAK 🔴"
+
+
+async def analyze_password_strength(password: str, breach_network: bool = True) -> Dict:
+    """Comprehensive password strength analysis
     
-    if charset_size > 0:
-        import math
-        result["entropy"] = round(len(password) * math.log2(charset_size), 2)
+    With ``breach_network=False`` the breach check only consults locally
+    cached or imported ranges.
+    """
+    scored = score_password(password)
+    mask = scored["mask"]
+    has_lowercase = bool(mask & LOWERCASE)
+    has_uppercase = bool(mask & UPPERCASE)
+    has_digits = bool(mask & DIGIT)
+    has_special = bool(mask & SPECIAL)
     
-    # Crack time estimates
-    if charset_size > 0:
-        possible_combinations = charset_size ** len(password)
-        
-        # Assuming different attack speeds
-        result["crack_time_estimates"] = {
-            "online_attack": estimate_crack_time(possible_combinations, 1000),  # 1000 attempts/sec
-            "offline_slow": estimate_crack_time(possible_combinations, 1_000_000),  # 1M/sec
-            "offline_fast": estimate_crack_time(possible_combinations, 1_000_000_000),  # 1B/sec
-            "gpu_cluster": estimate_crack_time(possible_combinations, 100_000_000_000)  # 100B/sec
-        }
+    result = {
+        "password_length": scored["length"],
+        "timestamp": datetime.now().isoformat(),
+        "strength_score": max(0, min(100, scored["score"])),
+        "strength_level": strength_level(scored["score"]),
+        "characteristics": {
+            "has_lowercase": has_lowercase,
+            "has_uppercase": has_uppercase,
+            "has_digits": has_digits,
+            "has_special_chars": has_special,
+            "length": scored["length"],
+            "unique_chars": scored["unique_chars"],
+            "repeated_chars": scored["length"] - scored["unique_chars"]
+        },
+        "vulnerabilities": [message for flag, message in VULNERABILITIES.items() if scored["flags"][flag]],
+        "recommendations": [],
+        "entropy": scored["entropy"],
+        "dictionary_match": scored["dictionary_match"],
+        "pattern_analysis": {
+            "score": scored["estimate"]["score"],
+            "guesses_log10": scored["estimate"]["guesses_log10"],
+            "sequence": scored["estimate"]["sequence"]
+        },
+        "crack_time_estimates": scored["crack_time_estimates"],
+        "breach_check": {}
+    }
     
     # Recommendations
-    if len(password) < 12:
+    if scored["length"] < 12:
         result["recommendations"].append("✓ Use at least 12 characters (16+ recommended)")
     if not has_uppercase:
         result["recommendations"].append("✓ Add uppercase letters (A-Z)")
@@ -141,15 +176,71 @@ async def analyze_password_strength(password: str) -> Dict:
         result["recommendations"].append("✓ Add numbers (0-9)")
     if not has_special:
         result["recommendations"].append("✓ Add special characters (!@#$%^&*)")
-    if password.lower() in COMMON_PASSWORDS:
+    if scored["flags"]["common_password"]:
         result["recommendations"].append("✓ URGENT: Change this password immediately!")
     
     # Breach check (HaveIBeenPwned API)
-    result["breach_check"] = await check_password_breach(password)
+    result["breach_check"] = await check_password_breach(password, network=breach_network)
     
     return result
 
 
+def analyze_password_batch(passwords: List[str], breach_check: bool = False) -> Dict:
+    """Strength analysis of many passwords, returned column by column.
+    
+    Each column lines up with ``passwords``; the passwords themselves are
+    not included, nor are the matched pattern tokens. The breach check,
+    when asked for, only uses the local breach index and never the network.
+    """
+    columns = {
+        "length": [], "strength_score": [], "strength_level": [], "entropy": [],
+        "pattern_score": [], "guesses_log10": [],
+        "unique_chars": [], "has_lowercase": [], "has_uppercase": [], "has_digits": [],
+        "has_special_chars": [], **{flag: [] for flag in VULNERABILITIES}, "dictionary_match": []
+    }
+    crack_times = {attack: [] for attack in ATTACK_SPEEDS}
+    levels = {}
+    
+    for password in passwords:
+        scored = score_password(password)
+        mask, score = scored["mask"], scored["score"]
+        columns["length"].append(scored["length"])
+        columns["strength_score"].append(max(0, min(100, score)))
+        level = strength_level(score)
+        columns["strength_level"].append(level)
+        levels[level] = levels.get(level, 0) + 1
+        columns["entropy"].append(scored["entropy"])
+        columns["pattern_score"].append(scored["estimate"]["score"])
+        columns["guesses_log10"].append(scored["estimate"]["guesses_log10"])
+        columns["unique_chars"].append(scored["unique_chars"])
+        columns["has_lowercase"].append(bool(mask & LOWERCASE))
+        columns["has_uppercase"].append(bool(mask & UPPERCASE))
+        columns["has_digits"].append(bool(mask & DIGIT))
+        columns["has_special_chars"].append(bool(mask & SPECIAL))
+        for flag, value in scored["flags"].items():
+            columns[flag].append(value)
+        columns["dictionary_match"].append(scored["dictionary_match"]["match"] if scored["dictionary_match"] else None)
+        for attack in ATTACK_SPEEDS:
+            crack_times[attack].append(scored["crack_time_estimates"].get(attack))
+    columns["crack_time_estimates"] = crack_times
+    
+    if breach_check:
+        columns["breach_count"] = breach_indexes.passwords.count_many(sha1_digest(p) for p in passwords)
+    
+    scores = columns["strength_score"]
+    return {
+        "count": len(passwords),
+        "columns": columns,
+        "summary": {
+            "strength_levels": levels,
+            "average_score": round(sum(scores) / len(scores), 2) if scores else None,
+            **{flag: sum(columns[flag]) for flag in VULNERABILITIES},
+            "breached": sum(1 for c in columns.get("breach_count", ()) if c)
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 def estimate_crack_time(combinations: int, attempts_per_second: int) -> str:
     """Estimate time to crack password"""
     seconds = combinations / (attempts_per_second * 2)  # Average case
@@ -170,41 +261,16 @@ def estimate_crack_time(combinations: int, attempts_per_second: int) -> str:
         return "Centuries+"
 
 
-async def check_password_breach(password: str) -> Dict:
+async def check_password_breach(password: str, network: bool = True) -> Dict:
     """Check if password appears in known data breaches using HaveIBeenPwned API"""
     
     try:
-        # SHA-1 hash of the password
-        sha1_hash = hashlib.sha1(password.encode()).hexdigest().upper()
-        prefix = sha1_hash[:5]
-        suffix = sha1_hash[5:]
-        
-        # Query HaveIBeenPwned API (k-anonymity model)
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://api.pwnedpasswords.com/range/{prefix}") as response:
-                if response.status == 200:
-                    hashes = await response.text()
-                    
-                    # Check if our hash suffix is in the results
-                    for line in hashes.split('\n'):
-                        if ':' in line:
-                            hash_suffix, count = line.split(':')
-                            if hash_suffix == suffix:
-                                return {
-                                    "found_in_breach": True,
-                                    "breach_count": int(count),
-                                    "severity": "CRITICAL" if int(count) > 100 else "HIGH",
-                                    "message": f"⚠️ This password has been seen {count} times in data breaches!",
-                                    "recommendation": "Change this password immediately!"
-                                }
-                    
-                    return {
-                        "found_in_breach": False,
-                        "breach_count": 0,
-                        "severity": "SAFE",
-                        "message": "✓ Password not found in known breaches",
-                        "recommendation": "Continue using strong, unique passwords"
-                    }
+        # A locally built breach index answers without any network at all
+        count = breach_indexes.password_count(password)
+        if count is None:
+            # SHA-1 hash of the password; only its first 5 characters leave the machine
+            sha1_hash = hashlib.sha1(password.encode()).hexdigest().upper()
+            count = await pwned_ranges.count(sha1_hash, network=network)
     except Exception as e:
         return {
             "found_in_breach": None,
@@ -212,9 +278,27 @@ async def check_password_breach(password: str) -> Dict:
             "message": "Unable to check breach database"
         }
     
+    if count is None:
+        return {
+            "found_in_breach": None,
+            "message": "Unable to check breach database" if network else "Breach range not cached locally; not checked"
+        }
+    
+    if count:
+        return {
+            "found_in_breach": True,
+            "breach_count": count,
+            "severity": "CRITICAL" if count > 100 else "HIGH",
+            "message": f"⚠️ This password has been seen {count} times in data breaches!",
+            "recommendation": "Change this password immediately!"
+        }
+    
     return {
-        "found_in_breach": None,
-        "message": "Unable to check breach database"
+        "found_in_breach": False,
+        "breach_count": 0,
+        "severity": "SAFE",
+        "message": "✓ Password not found in known breaches",
+        "recommendation": "Continue using strong, unique passwords"
     }
 
 
@@ -252,8 +336,9 @@ async def generate_strong_password(length: int = 16, include_special: bool = Tru
     random.shuffle(password)
     password_str = ''.join(password)
     
-    # Analyze the generated password
-    analysis = await analyze_password_strength(password_str)
+    # Analyze the generated password; a fresh random password is not worth
+    # a network round trip, so only locally available ranges are checked
+    analysis = await analyze_password_strength(password_str, breach_network=False)
     
     return {
         "password": password_str,
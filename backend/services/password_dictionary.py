@@ -0,0 +1,325 @@
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PASSWORD_DICTIONARY = os.getenv("PASSWORD_DICTIONARY", "./data/password_dictionary.bin")
+PASSWORD_DICTIONARY_FP_RATE = float(os.getenv("PASSWORD_DICTIONARY_FP_RATE", "0.01"))
+PASSWORD_DICTIONARY_SORT_CHUNK = int(os.getenv("PASSWORD_DICTIONARY_SORT_CHUNK", "1000000"))
+
+# Built-in fallback when no compiled dictionary exists, most common first
+TOP_PASSWORDS = (
+    "123456", "password", "123456789", "12345678", "12345", "1234567", "password1",
+    "123123", "1234567890", "000000", "abc123", "qwerty", "iloveyou", "admin",
+    "welcome", "monkey", "login", "starwars", "dragon", "master", "hello", "freedom",
+    "whatever", "qazwsx", "trustno1", "654321", "jordan23", "harley", "password123",
+    "123321", "qwertyuiop", "superman", "123qwe", "princess", "batman", "solo"
+)
+COMMON_PASSWORDS = frozenset(TOP_PASSWORDS)
+
+# File layout:
+#   header   MAGIC, version, bloom hash count, record count, bloom bits (little endian)
+#   records  8-byte fingerprint, kind, big endian rank; sorted, so record
+#            bytes compare in (fingerprint, kind, rank) order
+#   bloom    bloom filter over the fingerprints
+MAGIC = b"OSPWDICT"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+RECORD = struct.Struct(">8sBI")
+FINGERPRINT_SIZE = 8
+
+# Record kinds; lower kinds win when a fingerprint repeats
+WORD, LEET, KEYBOARD = 0, 1, 2
+KIND_NAMES = {WORD: "exact", LEET: "l33t", KEYBOARD: "keyboard_walk"}
+
+# Each character maps to the letter it is usually standing in for. "1"
+# and "l" are indistinguishable in l33t, so both become "i".
+LEET_TABLE = str.maketrans("4@8391!|l05$7+", "aabegiiiiosstt")
+LEET_MIN_LENGTH = 4
+
+KEYBOARD_ROWS = ("`1234567890-=", "qwertyuiop[]\\", "asdfghjkl;'", "zxcvbnm,./")
+KEYBOARD_WALK_MIN = 4
+
+
+def fingerprint(value: str, kind: int = WORD) -> bytes:
+    # l33t skeletons get their own namespace so they never shadow real words
+    prefix = b"\x01" if kind == LEET else b"\x00"
+    return hashlib.blake2b(prefix + value.encode("utf-8"), digest_size=FINGERPRINT_SIZE).digest()
+
+
+def leet_skeleton(word: str) -> str:
+    return word.lower().translate(LEET_TABLE)
+
+
+def keyboard_walks(min_length: int = KEYBOARD_WALK_MIN) -> List[str]:
+    """Row runs ("qwerty"), column runs ("1qaz2wsx", "zaq1xsw2") and their reverses on a US keyboard"""
+    walks = []
+    for row in KEYBOARD_ROWS:
+        for start in range(len(row)):
+            for end in range(start + min_length, len(row) + 1):
+                walks += [row[start:end], row[start:end][::-1]]
+
+    # Each number key sits above and to the left of its letter column
+    columns = [KEYBOARD_ROWS[0][i + 1] + "".join(row[i] for row in KEYBOARD_ROWS[1:]) for i in range(10)]
+    for start in range(len(columns)):
+        for end in range(start + 1, len(columns) + 1):
+            for down in (columns[start:end], [column[1:] for column in columns[start:end]]):
+                for walk in ("".join(down), "".join(column[::-1] for column in down)):
+                    if len(walk) >= min_length:
+                        walks += [walk, walk[::-1]]
+    return list(dict.fromkeys(walks))
+
+
+def dictionary_entries(words: Iterable[str]) -> Iterator[Tuple[bytes, int, int]]:
+    """(fingerprint, kind, rank) for each word, its l33t skeleton and every keyboard walk"""
+    rank = 0
+    for word in words:
+        word = word.strip().lower()
+        if not word:
+            continue
+        rank += 1
+        yield fingerprint(word), WORD, rank
+        if len(word) >= LEET_MIN_LENGTH:
+            yield fingerprint(leet_skeleton(word), LEET), LEET, rank
+    for walk_rank, walk in enumerate(keyboard_walks(), 1):
+        yield fingerprint(walk), KEYBOARD, walk_rank
+
+
+def bloom_positions(fp: bytes, hashes: int, bits: int) -> Iterator[int]:
+    # Double hashing over the two halves of the fingerprint
+    value = int.from_bytes(fp, "big")
+    first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+    for i in range(hashes):
+        yield (first + i * second) % bits
+
+
+class PasswordDictionary:
+    """Common-password membership backed by a compiled dictionary file.
+
+    The file is memory mapped on first use. A Bloom filter answers most
+    misses without touching the sorted fingerprint table; hits and Bloom
+    false positives go on to a binary search of the table. Without a
+    compiled file the built-in COMMON_PASSWORDS and keyboard walks are
+    used instead, with the same l33t normalisation.
+    """
+
+    def __init__(self, path: str = PASSWORD_DICTIONARY):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file = None
+        self._map = None
+        self._builtin: Dict[bytes, Tuple[int, int]] = {}
+        self.hashes = 0
+        self.records = 0
+        self.bloom_bits = 0
+        self.bloom_offset = 0
+        self.metrics = {"lookups": 0, "bloom_rejects": 0, "hits": 0}
+
+    def lookup(self, password: str) -> Optional[Dict]:
+        """{"match", "rank"} for a common password or a l33t variant of one, else None"""
+        self._load()
+        self.metrics["lookups"] += 1
+        lowered = password.lower()
+        found = self._find(fingerprint(lowered))
+        if found is None and len(lowered) >= LEET_MIN_LENGTH:
+            skeleton = lowered.translate(LEET_TABLE)
+            # Nothing to normalise means nothing new to find
+            if skeleton != lowered:
+                found = self._find(fingerprint(skeleton, LEET))
+        if found is None:
+            return None
+        self.metrics["hits"] += 1
+        kind, rank = found
+        return {"match": KIND_NAMES[kind], "rank": rank}
+
+    def __contains__(self, password: str) -> bool:
+        return self.lookup(password) is not None
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "loaded": self._loaded,
+            "source": "file" if self._map is not None else "builtin" if self._loaded else None,
+            "entries": self.records if self._map is not None else len(self._builtin),
+            "bloom_bits": self.bloom_bits,
+            "bloom_hashes": self.hashes,
+            **self.metrics
+        }
+
+    def _find(self, fp: bytes) -> Optional[Tuple[int, int]]:
+        if self._map is None:
+            return self._builtin.get(fp)
+
+        # Same probes as bloom_positions, inlined for the hot path
+        index_map, bits, offset = self._map, self.bloom_bits, self.bloom_offset
+        value = int.from_bytes(fp, "big")
+        position, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        for _ in range(self.hashes):
+            bit = position % bits
+            if not index_map[offset + (bit >> 3)] & (1 << (bit & 7)):
+                self.metrics["bloom_rejects"] += 1
+                return None
+            position += step
+
+        low, high = 0, self.records
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            candidate = index_map[offset:offset + FINGERPRINT_SIZE]
+            if candidate < fp:
+                low = middle + 1
+            elif candidate > fp:
+                high = middle
+            else:
+                _, kind, rank = RECORD.unpack_from(index_map, offset)
+                return kind, rank
+        return None
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                self._file = open(self.path, "rb")
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, self.hashes, self.records, self.bloom_bits = HEADER.unpack_from(self._map, 0)
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError(f"{self.path} is not a compiled password dictionary")
+                self.bloom_offset = HEADER.size + self.records * RECORD.size
+            else:
+                for fp, kind, rank in dictionary_entries(TOP_PASSWORDS):
+                    if fp not in self._builtin or (kind, rank) < self._builtin[fp]:
+                        self._builtin[fp] = (kind, rank)
+            self._loaded = True
+
+
+def _sorted_runs(entries: Iterator[Tuple[bytes, int, int]], chunk: int, directory: str) -> Tuple[List[str], List[bytes]]:
+    runs, buffer = [], []
+    for entry in entries:
+        buffer.append(RECORD.pack(*entry))
+        if len(buffer) >= chunk:
+            buffer.sort()
+            fd, path = tempfile.mkstemp(dir=directory, suffix=".run")
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"".join(buffer))
+            runs.append(path)
+            buffer = []
+    buffer.sort()
+    return runs, buffer
+
+
+def _read_records(f, start: int = 0, count: int = None) -> Iterator[bytes]:
+    f.seek(start)
+    remaining = count
+    while remaining is None or remaining > 0:
+        block = f.read(RECORD.size * 4096 if remaining is None else RECORD.size * min(4096, remaining))
+        if not block:
+            return
+        for offset in range(0, len(block), RECORD.size):
+            yield block[offset:offset + RECORD.size]
+        if remaining is not None:
+            remaining -= len(block) // RECORD.size
+
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from _read_records(f)
+
+
+def _wordlist(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+
+
+def build_dictionary(wordlists: List[str], path: str = PASSWORD_DICTIONARY,
+                     fp_rate: float = PASSWORD_DICTIONARY_FP_RATE,
+                     chunk: int = PASSWORD_DICTIONARY_SORT_CHUNK) -> Dict:
+    """Compile wordlists (most common first) into a dictionary file.
+
+    A word's rank is the line at which it first appears across the
+    wordlists. Each word is stored with its l33t skeleton and keyboard
+    walks are added, so nothing has to be expanded at query time.
+    Sorting is an external merge sort in chunks of ``chunk`` records.
+    """
+    started = time.time()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    runs, tail = _sorted_runs(dictionary_entries(_wordlist(wordlists)), chunk, directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            # Records first; duplicates keep their best (kind, rank)
+            f.seek(HEADER.size)
+            records, previous, batch = 0, None, []
+            try:
+                for record in heapq.merge(*(_read_run(run) for run in runs), tail):
+                    fp = record[:FINGERPRINT_SIZE]
+                    if fp == previous:
+                        continue
+                    previous = fp
+                    batch.append(record)
+                    records += 1
+                    if len(batch) >= 65536:
+                        f.write(b"".join(batch))
+                        batch = []
+                f.write(b"".join(batch))
+            finally:
+                for run in runs:
+                    os.remove(run)
+
+            # Bloom filter sized for the final record count
+            bits = max(64, math.ceil(-records * math.log(fp_rate) / math.log(2) ** 2))
+            hashes = max(1, round(bits / max(records, 1) * math.log(2)))
+            bloom = bytearray((bits + 7) // 8)
+            for record in _read_records(f, HEADER.size, records):
+                for position in bloom_positions(record[:FINGERPRINT_SIZE], hashes, bits):
+                    bloom[position >> 3] |= 1 << (position & 7)
+            f.seek(HEADER.size + records * RECORD.size)
+            f.write(bloom)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, hashes, records, bits))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    summary = {
+        "wordlists": [os.path.abspath(wordlist) for wordlist in wordlists],
+        "records": records,
+        "bloom_bits": bits,
+        "bloom_hashes": hashes,
+        "size_bytes": os.path.getsize(path),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time.time() - started, 1)
+    }
+    with open(path + ".json", "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+password_dictionary = PasswordDictionary()
+
+
+if __name__ == "__main__":
+    # python -m services.password_dictionary <wordlist> [<wordlist> ...]
+    if len(sys.argv) < 2:
+        print("Usage: python -m services.password_dictionary <wordlist> [<wordlist> ...]")
+        sys.exit(1)
+    print(json.dumps(build_dictionary(sys.argv[1:]), indent=2))
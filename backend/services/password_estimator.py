@@ -0,0 +1,476 @@
+import math
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from services.password_dictionary import password_dictionary
+
+# Guess-count constants, as in zxcvbn
+BRUTEFORCE_CARDINALITY = 10
+MIN_GUESSES_BEFORE_GROWING_SEQUENCE = 10000
+MIN_SUBMATCH_GUESSES_SINGLE_CHAR = 10
+MIN_SUBMATCH_GUESSES_MULTI_CHAR = 50
+MIN_YEAR_SPACE = 20
+REFERENCE_YEAR = datetime.now().year
+DATE_MIN_YEAR, DATE_MAX_YEAR = 1000, 2050
+MAX_SEQUENCE_DELTA = 5
+# Input is truncated before matching, as zxcvbn does; a 24 character prefix
+# with no pattern in it is already far past the top score threshold. Guess
+# counts are capped well inside float range.
+ESTIMATOR_MAX_LENGTH = 24
+MAX_GUESSES = 1e300
+
+# Longest substring looked up in the dictionary; each position costs up to
+# this many lookups
+DICTIONARY_MAX_WORD = 12
+# Characters that stand in for letters; letters themselves never count as substitutions
+LEET_SUBSTITUTES = frozenset("4@8391!|05$7+")
+LEET_LETTERS = frozenset("abegilost")
+
+# Score thresholds on guesses (0 = too guessable ... 4 = very unguessable)
+SCORE_THRESHOLDS = (1e3 + 5, 1e6 + 5, 1e8 + 5, 1e10 + 5)
+
+DATE_SPLITS = {
+    4: ((1, 2), (2, 3)),
+    5: ((1, 3), (2, 3)),
+    6: ((1, 2), (2, 4), (4, 5)),
+    7: ((1, 3), (2, 3), (4, 5), (4, 6)),
+    8: ((2, 4), (4, 6))
+}
+DATE_WITH_SEPARATOR = re.compile(r"^(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})$")
+REPEAT_GREEDY = re.compile(r"(.+)\1+")
+REPEAT_LAZY = re.compile(r"(.+?)\1+")
+REPEAT_LAZY_ANCHORED = re.compile(r"^(.+?)\1+$")
+
+# Keyboard layouts; each key is "unshifted shifted"
+QWERTY = (
+    ("`~", "1!", "2@", "3#", "4$", "5%", "6^", "7&", "8*", "9(", "0)", "-_", "=+"),
+    ("qQ", "wW", "eE", "rR", "tT", "yY", "uU", "iI", "oO", "pP", "[{", "]}", "\\|"),
+    ("aA", "sS", "dD", "fF", "gG", "hH", "jJ", "kK", "lL", ";:", "'\""),
+    ("zZ", "xX", "cC", "vV", "bB", "nN", "mM", ",<", ".>", "/?")
+)
+# Rows below the number row start half a key to the right
+QWERTY_OFFSETS = (0, 1, 1, 1)
+KEYPAD = {
+    (1, 0): "/", (2, 0): "*", (3, 0): "-",
+    (0, 1): "7", (1, 1): "8", (2, 1): "9", (3, 1): "+",
+    (0, 2): "4", (1, 2): "5", (2, 2): "6",
+    (0, 3): "1", (1, 3): "2", (2, 3): "3",
+    (1, 4): "0", (2, 4): "."
+}
+SLANTED_DIRECTIONS = ((-1, 0), (0, -1), (1, -1), (1, 0), (0, 1), (-1, 1))
+ALIGNED_DIRECTIONS = ((-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1))
+
+
+def build_adjacency(keys: Dict[Tuple[int, int], str], directions) -> Dict[str, Tuple[Optional[str], ...]]:
+    """Key -> its neighbouring keys, one slot per direction (None at the edge)"""
+    return {
+        key: tuple(keys.get((x + dx, y + dy)) for dx, dy in directions)
+        for (x, y), key in keys.items()
+    }
+
+
+def _qwerty_keys() -> Dict[Tuple[int, int], str]:
+    return {
+        (x + QWERTY_OFFSETS[y], y): key
+        for y, row in enumerate(QWERTY) for x, key in enumerate(row)
+    }
+
+
+class KeyboardGraph:
+    """An adjacency graph flattened for spatial matching.
+
+    ``neighbours`` maps every character (shifted or not) to a tuple of the
+    neighbouring keys per direction, so following a walk is a dict lookup
+    and a tuple scan.
+    """
+
+    def __init__(self, name: str, adjacency: Dict[str, Tuple[Optional[str], ...]]):
+        self.name = name
+        self.neighbours: Dict[str, Tuple[Optional[str], ...]] = {}
+        self.shifted = frozenset(key[1] for key in adjacency if len(key) > 1)
+        for key, neighbours in adjacency.items():
+            for char in key:
+                self.neighbours[char] = neighbours
+        self.starting_positions = len(adjacency)
+        self.average_degree = sum(
+            sum(1 for n in neighbours if n) for neighbours in adjacency.values()
+        ) / len(adjacency)
+
+    def direction(self, previous: str, current: str) -> Optional[int]:
+        for direction, neighbour in enumerate(self.neighbours.get(previous, ())):
+            if neighbour and current in neighbour:
+                return direction
+        return None
+
+
+# Precomputed once at import
+GRAPHS = (
+    KeyboardGraph("qwerty", build_adjacency(_qwerty_keys(), SLANTED_DIRECTIONS)),
+    KeyboardGraph("keypad", build_adjacency(KEYPAD, ALIGNED_DIRECTIONS))
+)
+
+
+@lru_cache(maxsize=4096)
+def n_choose_k(n: int, k: int) -> int:
+    return math.comb(n, k) if 0 <= k <= n else 0
+
+
+def uppercase_variations(token: str) -> int:
+    if token.islower() or not any(c.isalpha() for c in token):
+        return 1
+    # Capitalised, last letter upper or all upper are the first things tried
+    if (token[0].isupper() and token[1:].islower()) or token.isupper() or \
+            (token[-1].isupper() and token[:-1].islower()):
+        return 2
+    upper = sum(1 for c in token if c.isupper())
+    lower = sum(1 for c in token if c.islower())
+    return sum(n_choose_k(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+
+def l33t_variations(token: str) -> int:
+    substituted = sum(1 for c in token if c in LEET_SUBSTITUTES)
+    plain = sum(1 for c in token.lower() if c in LEET_LETTERS)
+    if not substituted:
+        return 1
+    if not plain:
+        return 2
+    return sum(n_choose_k(substituted + plain, i) for i in range(1, min(substituted, plain) + 1))
+
+
+def dictionary_matches(password: str) -> List[Dict]:
+    matches = []
+    length = len(password)
+    lowered = password.lower()
+    # Repeated substrings ("19911991") are looked up once
+    seen: Dict[str, Optional[Dict]] = {}
+    for i in range(length):
+        for j in range(i + 2, min(length, i + DICTIONARY_MAX_WORD)):
+            word = lowered[i:j + 1]
+            if word not in seen:
+                seen[word] = password_dictionary.lookup(word)
+            found = seen[word]
+            if found is None or found["match"] == "keyboard_walk":
+                continue
+            token = password[i:j + 1]
+            l33t = found["match"] == "l33t"
+            matches.append({
+                "pattern": "dictionary", "i": i, "j": j, "token": token,
+                "rank": found["rank"], "l33t": l33t,
+                "guesses": found["rank"] * uppercase_variations(token) * (l33t_variations(token) if l33t else 1)
+            })
+    return matches
+
+
+def spatial_matches(password: str) -> List[Dict]:
+    matches = []
+    for graph in GRAPHS:
+        i = 0
+        while i < len(password) - 1:
+            j, turns, last_direction = i + 1, 0, None
+            shifted = 1 if password[i] in graph.shifted else 0
+            while j < len(password):
+                direction = graph.direction(password[j - 1], password[j])
+                if direction is None:
+                    break
+                if direction != last_direction:
+                    turns += 1
+                    last_direction = direction
+                if password[j] in graph.shifted:
+                    shifted += 1
+                j += 1
+            # Walks of three keys or more
+            if j - i > 2:
+                matches.append(_spatial_match(graph, password, i, j - 1, turns, shifted))
+            i = j
+    return matches
+
+
+def _spatial_match(graph: KeyboardGraph, password: str, i: int, j: int, turns: int, shifted: int) -> Dict:
+    length = j - i + 1
+    guesses = 0.0
+    for walk_length in range(2, length + 1):
+        for walk_turns in range(1, min(turns, walk_length - 1) + 1):
+            guesses += n_choose_k(walk_length - 1, walk_turns - 1) * graph.starting_positions * \
+                graph.average_degree ** walk_turns
+    unshifted = length - shifted
+    if shifted:
+        guesses *= 2 if not unshifted else sum(n_choose_k(length, k) for k in range(1, min(shifted, unshifted) + 1))
+    return {
+        "pattern": "spatial", "i": i, "j": j, "token": password[i:j + 1],
+        "graph": graph.name, "turns": turns, "shifted_count": shifted, "guesses": guesses
+    }
+
+
+def sequence_matches(password: str) -> List[Dict]:
+    if len(password) < 2:
+        return []
+    matches = []
+
+    def add(i: int, j: int, delta: int):
+        if (j - i > 1 or abs(delta) == 1) and 0 < abs(delta) <= MAX_SEQUENCE_DELTA:
+            token = password[i:j + 1]
+            first = token[0]
+            if first in "aAzZ019":
+                base = 4
+            elif first.isdigit():
+                base = 10
+            else:
+                base = 26
+            matches.append({
+                "pattern": "sequence", "i": i, "j": j, "token": token, "ascending": delta > 0,
+                "guesses": base * len(token) * (1 if delta > 0 else 2)
+            })
+
+    i, last_delta = 0, None
+    for k in range(1, len(password)):
+        delta = ord(password[k]) - ord(password[k - 1])
+        if last_delta is None:
+            last_delta = delta
+        if delta == last_delta:
+            continue
+        add(i, k - 1, last_delta)
+        i, last_delta = k - 1, delta
+    add(i, len(password) - 1, last_delta)
+    return matches
+
+
+def repeat_matches(password: str) -> List[Dict]:
+    matches = []
+    last = 0
+    while last < len(password):
+        greedy = REPEAT_GREEDY.search(password, last)
+        if greedy is None:
+            break
+        lazy = REPEAT_LAZY.search(password, last)
+        if len(greedy.group(0)) > len(lazy.group(0)):
+            # "abcabc" style: the greedy match has the longer repeated unit
+            match = greedy
+            base = REPEAT_LAZY_ANCHORED.match(match.group(0)).group(1)
+        else:
+            match = lazy
+            base = match.group(1)
+        i, j = match.start(), match.end() - 1
+        repeats = len(match.group(0)) // len(base)
+        matches.append({
+            "pattern": "repeat", "i": i, "j": j, "token": match.group(0),
+            "base_token": base, "repeat_count": repeats,
+            "guesses": _base_guesses(base) * repeats
+        })
+        last = j + 1
+    return matches
+
+
+@lru_cache(maxsize=1024)
+def _base_guesses(base: str) -> float:
+    return most_guessable_sequence(base, omnimatch(base))["guesses"]
+
+
+def _two_to_four_digit_year(year: int) -> int:
+    if year > 99:
+        return year
+    return year + 1900 if year > 50 else year + 2000
+
+
+def _day_month(first: int, second: int) -> Optional[Tuple[int, int]]:
+    for day, month in ((first, second), (second, first)):
+        if 1 <= day <= 31 and 1 <= month <= 12:
+            return day, month
+    return None
+
+
+def _date_from_ints(ints: Tuple[int, int, int]) -> Optional[Tuple[int, int, int]]:
+    """(year, month, day) if the three numbers read as a plausible date"""
+    if ints[1] > 31 or ints[1] <= 0:
+        return None
+    over_12 = over_31 = under_1 = 0
+    for value in ints:
+        if 99 < value < DATE_MIN_YEAR or value > DATE_MAX_YEAR:
+            return None
+        over_31 += value > 31
+        over_12 += value > 12
+        under_1 += value <= 0
+    if over_31 >= 2 or over_12 == 3 or under_1 >= 2:
+        return None
+
+    splits = ((ints[2], ints[0], ints[1]), (ints[0], ints[1], ints[2]))
+    for year, first, second in splits:
+        if DATE_MIN_YEAR <= year <= DATE_MAX_YEAR:
+            day_month = _day_month(first, second)
+            return (year, day_month[1], day_month[0]) if day_month else None
+    for year, first, second in splits:
+        day_month = _day_month(first, second)
+        if day_month:
+            return _two_to_four_digit_year(year), day_month[1], day_month[0]
+    return None
+
+
+def _date_guesses(year: int, separator: str) -> int:
+    return max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE) * 365 * (4 if separator else 1)
+
+
+def date_matches(password: str) -> List[Dict]:
+    matches = []
+    length = len(password)
+
+    # Digits only: try every split, keeping the one closest to today
+    for i in range(length - 3):
+        for j in range(i + 3, min(length, i + 8)):
+            token = password[i:j + 1]
+            if not token.isdigit():
+                break
+            candidates = []
+            for first, second in DATE_SPLITS[len(token)]:
+                date = _date_from_ints((int(token[:first]), int(token[first:second]), int(token[second:])))
+                if date:
+                    candidates.append(date)
+            if candidates:
+                year, month, day = min(candidates, key=lambda date: abs(date[0] - REFERENCE_YEAR))
+                matches.append({
+                    "pattern": "date", "i": i, "j": j, "token": token, "separator": "",
+                    "year": year, "month": month, "day": day, "guesses": _date_guesses(year, "")
+                })
+
+    # With separators: "1/1/91", "1991-01-01"
+    for i in range(length - 5):
+        for j in range(i + 5, min(length, i + 10)):
+            token = password[i:j + 1]
+            found = DATE_WITH_SEPARATOR.match(token)
+            if not found:
+                continue
+            date = _date_from_ints((int(found.group(1)), int(found.group(3)), int(found.group(4))))
+            if date:
+                matches.append({
+                    "pattern": "date", "i": i, "j": j, "token": token, "separator": found.group(2),
+                    "year": date[0], "month": date[1], "day": date[2],
+                    "guesses": _date_guesses(date[0], found.group(2))
+                })
+
+    # A date inside a longer date adds nothing; sorted by start and then
+    # longest first, a match is inside another if an earlier one reaches as far
+    matches.sort(key=lambda match: (match["i"], -match["j"]))
+    kept, reach = [], -1
+    for match in matches:
+        if match["j"] > reach:
+            kept.append(match)
+            reach = match["j"]
+    return kept
+
+
+def omnimatch(password: str) -> List[Dict]:
+    return (dictionary_matches(password) + spatial_matches(password) + sequence_matches(password)
+            + repeat_matches(password) + date_matches(password))
+
+
+def _bounded_guesses(match: Dict, password_length: int) -> float:
+    length = match["j"] - match["i"] + 1
+    if length == password_length:
+        minimum = 1
+    elif length == 1:
+        minimum = MIN_SUBMATCH_GUESSES_SINGLE_CHAR
+    else:
+        minimum = MIN_SUBMATCH_GUESSES_MULTI_CHAR
+    return min(max(match["guesses"], minimum), MAX_GUESSES)
+
+
+def _capped_power(base: float, exponent: int) -> float:
+    if exponent * math.log10(base) >= math.log10(MAX_GUESSES):
+        return MAX_GUESSES
+    return float(base) ** exponent
+
+
+def most_guessable_sequence(password: str, matches: List[Dict]) -> Dict:
+    """Minimum-guess cover of the password by matches and brute-force gaps.
+
+    Dynamic programme over (end position, number of matches): the cost of
+    a sequence of l matches is l! * product(guesses) + D^(l - 1), so a
+    few big matches beat many small ones, as in zxcvbn.
+    """
+    n = len(password)
+    if n == 0:
+        return {"guesses": 1, "sequence": []}
+    by_end: List[List[Dict]] = [[] for _ in range(n)]
+    for match in matches:
+        by_end[match["j"]].append(match)
+
+    # best[k][l] = (total guesses, product of guesses, match) for a cover of password[:k + 1] with l matches
+    best: List[Dict[int, Tuple[float, float, Dict]]] = [{} for _ in range(n)]
+
+    # l! and D^(l - 1) for every possible match count l
+    factorials = [float(math.factorial(count)) for count in range(n + 1)]
+    growth = [0.0] + [_capped_power(MIN_GUESSES_BEFORE_GROWING_SEQUENCE, count - 1) for count in range(1, n + 1)]
+
+    def update(match: Dict, count: int):
+        k = match["j"]
+        product = _bounded_guesses(match, n)
+        if count > 1:
+            product = min(product * best[match["i"] - 1][count - 1][1], MAX_GUESSES)
+        total = min(factorials[count] * product + growth[count], MAX_GUESSES)
+        # Skip covers that use more matches for no fewer guesses
+        for other_count, (other_total, _, _) in best[k].items():
+            if other_count <= count and other_total <= total:
+                return
+        best[k][count] = (total, product, match)
+
+    def bruteforce(i: int, j: int) -> Dict:
+        return {"pattern": "bruteforce", "i": i, "j": j, "token": password[i:j + 1],
+                "guesses": _capped_power(BRUTEFORCE_CARDINALITY, j - i + 1)}
+
+    # Ends of covers whose last match is a real one; only those can be
+    # followed by a brute-force segment
+    match_ends: List[int] = []
+    for k in range(n):
+        for match in by_end[k]:
+            if match["i"] > 0:
+                for count in list(best[match["i"] - 1]):
+                    update(match, count + 1)
+            else:
+                update(match, 1)
+        # A brute-force segment from the start, or after the best cover ending earlier
+        update(bruteforce(0, k), 1)
+        for end in match_ends:
+            segment = bruteforce(end + 1, k)
+            for count, (_, _, last) in list(best[end].items()):
+                if last["pattern"] != "bruteforce":
+                    update(segment, count + 1)
+        if any(last["pattern"] != "bruteforce" for _, _, last in best[k].values()):
+            match_ends.append(k)
+
+    # Walk back from the cheapest cover of the whole password
+    count, (guesses, _, _) = min(best[n - 1].items(), key=lambda item: item[1][0])
+    sequence = []
+    k = n - 1
+    while k >= 0:
+        match = best[k][count][2]
+        sequence.append(match)
+        k, count = match["i"] - 1, count - 1
+    sequence.reverse()
+    return {"guesses": guesses, "sequence": sequence}
+
+
+def guesses_to_score(guesses: float) -> int:
+    return sum(1 for threshold in SCORE_THRESHOLDS if guesses >= threshold)
+
+
+def estimate_password(password: str) -> Dict:
+    """Pattern-based guess estimate: how many guesses a smart attacker needs
+
+    Only the first ESTIMATOR_MAX_LENGTH characters are scored, so very long
+    inputs are underestimated rather than slow to estimate.
+    """
+    started = time.perf_counter()
+    scanned = password[:ESTIMATOR_MAX_LENGTH]
+    result = most_guessable_sequence(scanned, omnimatch(scanned))
+    guesses = result["guesses"]
+    return {
+        "guesses": guesses,
+        "guesses_log10": round(math.log10(guesses), 2) if guesses > 0 else 0,
+        "score": guesses_to_score(guesses),
+        "sequence": [
+            {**match, "guesses": round(_bounded_guesses(match, len(scanned)), 2)}
+            for match in result["sequence"]
+        ],
+        "calc_time_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PLATFORM_REGISTRY = os.getenv(
+    "PLATFORM_REGISTRY", os.path.join(os.path.dirname(__file__), "platforms.json")
+)
+PLATFORM_DEFAULT_TIMEOUT = float(os.getenv("PLATFORM_DEFAULT_TIMEOUT", "5"))
+PLATFORM_DEFAULT_METHOD = os.getenv("PLATFORM_DEFAULT_METHOD", "HEAD").upper()
+PLATFORM_MAX_BYTES = int(os.getenv("PLATFORM_MAX_BYTES", str(64 * 1024)))
+
+DETECTION_TYPES = ("status", "body", "redirect")
+
+
+class Platform:
+    """One site from the registry, compiled for fast repeated checks.
+
+    Detection strategies:
+      status   - the profile exists if the response status is in ``found``
+      body     - the status must match, then ``missing_marker`` in the page
+                 means absent and ``found_marker`` (if set) must be present
+      redirect - the profile is absent if the final URL contains
+                 ``missing_url``
+    """
+
+    __slots__ = (
+        "name", "url", "method", "timeout", "max_bytes", "detection", "found_statuses",
+        "found_marker", "missing_marker", "missing_url", "username_pattern", "tags"
+    )
+
+    def __init__(self, entry: Dict, default_timeout: float = PLATFORM_DEFAULT_TIMEOUT):
+        self.name = entry["name"]
+        self.url = entry["url"]
+        if "{}" not in self.url:
+            raise ValueError(f"{self.name}: url needs a {{}} placeholder for the username")
+
+        # HEAD is tried first and falls back to GET if the site rejects it
+        self.method = entry.get("method", PLATFORM_DEFAULT_METHOD).upper()
+        if self.method not in ("GET", "HEAD"):
+            raise ValueError(f"{self.name}: method must be GET or HEAD")
+        self.timeout = float(entry.get("timeout", default_timeout))
+        # Most body bytes read when looking for markers
+        self.max_bytes = int(entry.get("max_bytes", PLATFORM_MAX_BYTES))
+
+        detect = entry.get("detect", {})
+        self.detection = detect.get("type", "status")
+        if self.detection not in DETECTION_TYPES:
+            raise ValueError(f"{self.name}: unknown detection type {self.detection}")
+        self.found_statuses = frozenset(detect.get("found", [200]))
+        # Markers are matched against raw bytes, so pages need not be decoded
+        self.found_marker = detect["found_marker"].encode() if detect.get("found_marker") else None
+        self.missing_marker = detect["missing_marker"].encode() if detect.get("missing_marker") else None
+        self.missing_url = detect.get("missing_url")
+        if self.detection == "body" and not (self.found_marker or self.missing_marker):
+            raise ValueError(f"{self.name}: body detection needs found_marker or missing_marker")
+        if self.detection == "redirect" and not self.missing_url:
+            raise ValueError(f"{self.name}: redirect detection needs missing_url")
+        # Body markers can only be seen with GET
+        if self.detection == "body":
+            self.method = "GET"
+
+        pattern = entry.get("username_pattern")
+        self.username_pattern = re.compile(pattern) if pattern else None
+        self.tags = tuple(entry.get("tags", ()))
+
+    @property
+    def needs_body(self) -> bool:
+        return self.detection == "body"
+
+    def profile_url(self, username: str) -> str:
+        return self.url.format(username)
+
+    def accepts(self, username: str) -> bool:
+        """False when the site cannot have this username, so no request is needed"""
+        return self.username_pattern is None or self.username_pattern.fullmatch(username) is not None
+
+    def exists(self, status: int, final_url: str = "", body: bytes = b"") -> bool:
+        if status not in self.found_statuses:
+            return False
+        if self.detection == "redirect":
+            return self.missing_url not in final_url
+        if self.detection == "body":
+            if self.missing_marker is not None and self.missing_marker in body:
+                return False
+            return self.found_marker is None or self.found_marker in body
+        return True
+
+    def body_decided(self, body: bytes) -> bool:
+        """True once enough of the page has been read to apply the markers"""
+        if self.missing_marker is not None and self.missing_marker in body:
+            return True
+        return self.found_marker is not None and self.found_marker in body
+
+    def __repr__(self) -> str:
+        return f"Platform({self.name!r}, {self.detection})"
+
+
+class PlatformRegistry:
+    """Ordered, name-indexed set of compiled platforms"""
+
+    def __init__(self, platforms: List[Platform], source: str = None):
+        self.platforms = tuple(platforms)
+        self.by_name = {platform.name: platform for platform in self.platforms}
+        if len(self.by_name) != len(self.platforms):
+            raise ValueError("Duplicate platform names in registry")
+        self.source = source
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict], source: str = None) -> "PlatformRegistry":
+        return cls([Platform(entry) for entry in entries if entry.get("enabled", True)], source)
+
+    def __iter__(self) -> Iterator[Platform]:
+        return iter(self.platforms)
+
+    def __len__(self) -> int:
+        return len(self.platforms)
+
+    def get(self, name: str) -> Optional[Platform]:
+        return self.by_name.get(name)
+
+    def select(self, names: List[str] = None, tags: List[str] = None) -> List[Platform]:
+        """Platforms matching any of the given names or tags (all when neither is given)"""
+        if not names and not tags:
+            return list(self.platforms)
+        names = set(names or ())
+        tags = set(tags or ())
+        return [p for p in self.platforms if p.name in names or tags.intersection(p.tags)]
+
+    def order(self) -> Dict[str, int]:
+        return {platform.name: index for index, platform in enumerate(self.platforms)}
+
+
+def load_registry(path: str = PLATFORM_REGISTRY) -> PlatformRegistry:
+    """Load and compile a JSON (or YAML, with PyYAML installed) registry file"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("PyYAML is required for YAML platform registries")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    entries = data["platforms"] if isinstance(data, dict) else data
+    return PlatformRegistry.from_entries(entries, source=path)
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+from dotenv import load_dotenv
+
+from services.http_client import client_session
+from services.singleflight import SingleFlight
+
+load_dotenv()
+
+PWNED_RANGE_URL = os.getenv("PWNED_RANGE_URL", "https://api.pwnedpasswords.com/range/{}")
+PWNED_RANGE_DIR = os.getenv("PWNED_RANGE_DIR", "./data/pwned_ranges")
+PWNED_RANGE_TTL = int(os.getenv("PWNED_RANGE_TTL", str(7 * 86400)))
+PWNED_RANGE_MEMORY = int(os.getenv("PWNED_RANGE_MEMORY", "512"))
+PWNED_OFFLINE = os.getenv("PWNED_OFFLINE", "false").lower() in ("1", "true", "yes")
+
+SUFFIX_LENGTH = 35
+IMPORT_MARKER = "IMPORTED.json"
+
+
+class PwnedRange:
+    """Suffixes of one 5-character prefix, packed for binary search.
+
+    Suffixes are stored back to back as fixed-width ASCII in one bytes
+    object with the counts in a parallel array, which is a fraction of
+    the memory of a dict of strings and still O(log n) to query.
+    """
+
+    __slots__ = ("suffixes", "counts")
+
+    def __init__(self, suffixes: bytes, counts: array):
+        self.suffixes = suffixes
+        self.counts = counts
+
+    @classmethod
+    def parse(cls, body: bytes) -> "PwnedRange":
+        entries = []
+        for line in body.splitlines():
+            suffix, _, count = line.strip().partition(b":")
+            if len(suffix) != SUFFIX_LENGTH or not count:
+                continue
+            count = int(count)
+            # Padding entries (Add-Padding) carry a zero count
+            if count:
+                entries.append((suffix.upper(), count))
+        entries.sort()
+        return cls(b"".join(suffix for suffix, _ in entries), array("I", (count for _, count in entries)))
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def count(self, suffix: str) -> int:
+        target = suffix.upper().encode()
+        low, high = 0, len(self.counts)
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self.suffixes[middle * SUFFIX_LENGTH:(middle + 1) * SUFFIX_LENGTH]
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return self.counts[middle]
+        return 0
+
+
+class PwnedRangeCache:
+    """Pwned Passwords k-anonymity ranges cached in memory and on disk.
+
+    Ranges are looked up in an LRU of parsed ranges, then in
+    ``<directory>/<xx>/<prefix>`` files (fresh for ``ttl`` seconds), then
+    fetched from the API. In offline mode only files imported from a local
+    range dump are used and nothing leaves the machine.
+    """
+
+    def __init__(self, directory: str = PWNED_RANGE_DIR, ttl: int = PWNED_RANGE_TTL,
+                 memory_size: int = PWNED_RANGE_MEMORY, offline: bool = PWNED_OFFLINE):
+        self.directory = directory
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.offline = offline
+        self.memory: "OrderedDict[str, PwnedRange]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "fetches": 0, "stale_served": 0, "misses": 0}
+
+    def path(self, prefix: str) -> str:
+        return os.path.join(self.directory, prefix[:2], prefix)
+
+    async def count(self, sha1_hash: str, network: bool = True) -> Optional[int]:
+        """Breach count for a full SHA-1 hex digest, or None if it cannot be checked"""
+        sha1_hash = sha1_hash.upper()
+        pwned_range = await self.get(sha1_hash[:5], network)
+        return pwned_range.count(sha1_hash[5:]) if pwned_range is not None else None
+
+    async def get(self, prefix: str, network: bool = True) -> Optional[PwnedRange]:
+        prefix = prefix.upper()
+        pwned_range = self.memory.get(prefix)
+        if pwned_range is not None:
+            self.memory.move_to_end(prefix)
+            self.metrics["memory_hits"] += 1
+            return pwned_range
+
+        fetch = network and not self.offline
+        return await self._flights.do(f"{prefix}/{fetch}", lambda: self._load(prefix, fetch))
+
+    @property
+    def has_dump(self) -> bool:
+        return os.path.exists(os.path.join(self.directory, IMPORT_MARKER))
+
+    def clear_memory(self):
+        self.memory.clear()
+
+    def stats(self) -> Dict:
+        marker = os.path.join(self.directory, IMPORT_MARKER)
+        imported = None
+        if os.path.exists(marker):
+            with open(marker, "r") as f:
+                imported = json.load(f)
+        return {
+            "directory": self.directory,
+            "offline": self.offline,
+            "ttl": self.ttl,
+            "ranges_in_memory": len(self.memory),
+            "imported_dump": imported,
+            **self.metrics
+        }
+
+    async def _load(self, prefix: str, fetch: bool) -> Optional[PwnedRange]:
+        cached = await asyncio.to_thread(self._read, prefix)
+        body = None
+        if cached is not None:
+            body, age = cached
+            if self.offline or age < self.ttl:
+                self.metrics["disk_hits"] += 1
+                return self._remember(prefix, body)
+
+        if not fetch:
+            if body is not None:
+                self.metrics["stale_served"] += 1
+                return self._remember(prefix, body)
+            self.metrics["misses"] += 1
+            # With a full dump imported, a missing prefix simply has no hashes
+            return PwnedRange(b"", array("I")) if self.offline and self.has_dump else None
+
+        try:
+            fresh = await self._fetch(prefix)
+        except Exception as e:
+            print(f"Error fetching Pwned Passwords range {prefix}: {e}")
+            fresh = None
+
+        if fresh is None:
+            # Serve a stale copy rather than nothing when the API is down
+            if body is not None:
+                self.metrics["stale_served"] += 1
+                return self._remember(prefix, body)
+            self.metrics["misses"] += 1
+            return None
+
+        self.metrics["fetches"] += 1
+        await asyncio.to_thread(self._write, prefix, fresh)
+        return self._remember(prefix, fresh)
+
+    async def _fetch(self, prefix: str) -> Optional[bytes]:
+        # Padding hides the true size of the response from observers
+        async with client_session() as session:
+            async with session.get(PWNED_RANGE_URL.format(prefix), headers={"Add-Padding": "true"}) as response:
+                if response.status != 200:
+                    return None
+                return await response.read()
+
+    def _remember(self, prefix: str, body: bytes) -> PwnedRange:
+        pwned_range = PwnedRange.parse(body)
+        self.memory[prefix] = pwned_range
+        self.memory.move_to_end(prefix)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+        return pwned_range
+
+    def _read(self, prefix: str) -> Optional[Tuple[bytes, float]]:
+        path = self.path(prefix)
+        try:
+            with open(path, "rb") as f:
+                return f.read(), time.time() - os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _write(self, prefix: str, body: bytes):
+        path = self.path(prefix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+
+def _dump_lines(path: str) -> Iterator[Tuple[str, bytes]]:
+    """(prefix, "SUFFIX:COUNT" line) pairs from a dump file or directory"""
+    if os.path.isdir(path):
+        # One file per prefix, as written by the official downloader
+        for name in sorted(os.listdir(path)):
+            prefix = name.split(".")[0].upper()
+            if len(prefix) != 5:
+                continue
+            with open(os.path.join(path, name), "rb") as f:
+                for line in f:
+                    if b":" in line:
+                        yield prefix, line.strip()
+        return
+
+    # A single file of full "SHA1:COUNT" lines
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) > 40 and line[40:41] == b":":
+                yield line[:5].decode().upper(), line[5:]
+
+
+def import_range_dump(path: str, directory: str = PWNED_RANGE_DIR) -> Dict:
+    """Split a local Pwned Passwords dump into per-prefix range files.
+
+    Accepts a single SHA1:COUNT file (ideally sorted by hash, as
+    published) or a directory of per-prefix files. Unsorted input still
+    works; lines for a prefix seen again are appended to its file.
+    """
+    started = time.time()
+    cache = PwnedRangeCache(directory=directory)
+    written = set()
+    lines = 0
+    current_prefix, buffer = None, []
+
+    def flush():
+        if not buffer:
+            return
+        file_path = cache.path(current_prefix)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        mode = "ab" if current_prefix in written else "wb"
+        with open(file_path, mode) as f:
+            f.write(b"\r\n".join(buffer) + b"\r\n")
+        written.add(current_prefix)
+
+    for prefix, line in _dump_lines(path):
+        if prefix != current_prefix:
+            flush()
+            current_prefix, buffer = prefix, []
+        buffer.append(line)
+        lines += 1
+    flush()
+
+    summary = {
+        "source": os.path.abspath(path),
+        "prefixes": len(written),
+        "hashes": lines,
+        "imported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time.time() - started, 1)
+    }
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, IMPORT_MARKER), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+pwned_ranges = PwnedRangeCache()
+
+
+if __name__ == "__main__":
+    # python -m services.pwned_ranges <dump file or directory>
+    if len(sys.argv) != 2:
+        print("Usage: python -m services.pwned_ranges <dump file or directory>")
+        sys.exit(1)
+    print(json.dumps(import_range_dump(sys.argv[1]), indent=2))
@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "./data/result_cache.db")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_DEFAULT_TTL = int(os.getenv("RESULT_CACHE_DEFAULT_TTL", "600"))
+
+# Seconds a result stays fresh, per endpoint
+ENDPOINT_TTLS = {
+    "username-lookup": 1800,
+    "email-scan": 3600,
+    "domain-scan": 3600,
+    "ip-lookup": 3600,
+    "whois-lookup": 86400,
+    "ss7-intel": 3600,
+    "ss7-professional": 3600,
+    "phone-intel": 3600,
+    "email-intel": 3600,
+    "social-profile-analyzer": 1800,
+    "port-scan": 300,
+    "ssl-analyze": 3600,
+    "dns-enum": 300,
+    "subdomain-discovery": 1800,
+    "google-dork": 86400,
+    "shodan-search": 3600,
+    "github-analyze": 1800,
+    "geo-locate": 3600,
+}
+
+
+def parse_ttls(spec: str) -> Dict[str, int]:
+    """Parse RESULT_CACHE_TTLS, e.g. "whois-lookup=600,dns-enum=60" """
+    ttls = {}
+    for item in spec.split(","):
+        if "=" in item:
+            endpoint, seconds = item.split("=", 1)
+            ttls[endpoint.strip()] = int(seconds)
+    return ttls
+
+
+ENDPOINT_TTLS.update(parse_ttls(os.getenv("RESULT_CACHE_TTLS", "")))
+
+# Inputs that name the same thing whatever their case; every other string
+# (usernames, queries, paths) is case-sensitive and only trimmed
+CASE_INSENSITIVE_PARAMS = frozenset({"domain", "email", "ip", "target"})
+# Secrets are hashed as given, never normalized or kept in the clear
+CREDENTIAL_PARAMS = frozenset({"api_key"})
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache bounded by the total size of stored values"""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # key -> (stored_at, expires_at, value)
+        self.entries: "OrderedDict[str, Tuple[float, float, bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        item = self.entries.get(key)
+        if item is None:
+            return None
+
+        stored_at, expires_at, value = item
+        if expires_at <= time.time():
+            self._remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return stored_at, value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        if len(value) > self.max_bytes:
+            return
+
+        self._remove(key)
+        now = time.time()
+        self.entries[key] = (now, now + ttl, value)
+        self.total_bytes += len(value)
+
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+
+    async def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "memory",
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def _remove(self, key: str):
+        item = self.entries.pop(key, None)
+        if item is not None:
+            self.total_bytes -= len(item[2])
+
+
+class SQLiteCacheBackend:
+    """Local-file cache in SQLite, LRU by last access and bounded by bytes.
+
+    Queries run in a worker thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " value BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self._conn.commit()
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    async def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        if len(value) <= self.max_bytes:
+            await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def _get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, expires_at, size, value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            stored_at, expires_at, size, value = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.total_bytes -= size
+            else:
+                self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        return (stored_at, value) if expires_at > now else None
+
+    def _set(self, key: str, value: bytes, ttl: int):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.total_bytes -= row[0]
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, stored_at, expires_at, accessed_at, size, value)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, now, now + ttl, now, len(value), sqlite3.Binary(value))
+            )
+            self.total_bytes += len(value)
+
+            # Expired rows go first, then least recently used ones
+            if self.total_bytes > self.max_bytes:
+                self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+                self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+            while self.total_bytes > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM cache ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if oldest is None:
+                    break
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (oldest[0],))
+                self.total_bytes -= oldest[1]
+
+            self._conn.commit()
+
+    def _clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self.total_bytes = 0
+
+
+class ResultCache:
+    """Lookup result cache keyed on (endpoint, normalized input)"""
+
+    def __init__(self, backend=None, ttls: Dict[str, int] = None, default_ttl: int = RESULT_CACHE_DEFAULT_TTL):
+        self.backend = backend if backend is not None else create_backend()
+        self.ttls = ttls if ttls is not None else ENDPOINT_TTLS
+        self.default_ttl = default_ttl
+        self.metrics = {"hits": 0, "misses": 0, "bypasses": 0, "stores": 0}
+
+    @staticmethod
+    def normalize(name: str, value: Any) -> Any:
+        if not isinstance(value, str):
+            return value
+        if name in CREDENTIAL_PARAMS:
+            return hashlib.sha256(value.encode()).hexdigest()
+        value = value.strip()
+        return value.lower() if name in CASE_INSENSITIVE_PARAMS else value
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any]) -> str:
+        normalized = {name: ResultCache.normalize(name, value) for name, value in params.items()}
+        payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+        return f"{endpoint}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def ttl_for(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    async def get(self, endpoint: str, params: Dict[str, Any]) -> Optional[Tuple[Any, float]]:
+        """Return (results, age in seconds) for a fresh entry, or None"""
+        try:
+            item = await self.backend.get(self.make_key(endpoint, params))
+        except Exception as e:
+            print(f"Error reading result cache: {e}")
+            item = None
+
+        if item is None:
+            self.metrics["misses"] += 1
+            return None
+
+        stored_at, value = item
+        self.metrics["hits"] += 1
+        return json.loads(value), max(0.0, time.time() - stored_at)
+
+    async def set(self, endpoint: str, params: Dict[str, Any], results: Any):
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            return
+
+        try:
+            value = json.dumps(results, separators=(",", ":"), default=str).encode()
+            await self.backend.set(self.make_key(endpoint, params), value, ttl)
+            self.metrics["stores"] += 1
+        except Exception as e:
+            print(f"Error writing result cache: {e}")
+
+    def record_bypass(self):
+        self.metrics["bypasses"] += 1
+
+    async def clear(self):
+        await self.backend.clear()
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> Dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.backend.stats(),
+            **self.metrics,
+            "hit_ratio": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_backend(name: str = RESULT_CACHE_BACKEND):
+    """Build the backend selected by RESULT_CACHE_BACKEND (memory or sqlite)"""
+    if name == "sqlite":
+        return SQLiteCacheBackend()
+    return MemoryCacheBackend()
@@ -0,0 +1,216 @@
+import asyncio
+import ipaddress
+import os
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Union
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCAN_BATCH_CONCURRENCY = int(os.getenv("SCAN_BATCH_CONCURRENCY", "32"))
+SCAN_BATCH_MAX_TARGETS = int(os.getenv("SCAN_BATCH_MAX_TARGETS", "1024"))
+
+
+def expand_targets(targets: Union[str, List[str]], max_targets: int = SCAN_BATCH_MAX_TARGETS) -> List[str]:
+    """Expand a list of hosts, IPs and CIDR ranges into unique targets.
+
+    Networks contribute their usable host addresses. Raises ValueError
+    for malformed ranges or when the batch exceeds ``max_targets``.
+    """
+    if isinstance(targets, str):
+        targets = targets.replace(",", " ").split()
+
+    expanded: "OrderedDict[str, None]" = OrderedDict()
+    for item in targets:
+        item = str(item).strip()
+        if not item:
+            continue
+
+        if "/" in item:
+            network = ipaddress.ip_network(item, strict=False)
+            if network.num_addresses > max_targets:
+                raise ValueError(f"{item} has more than {max_targets} addresses")
+            hosts = list(network.hosts()) or [network.network_address]
+            for host in hosts:
+                expanded[str(host)] = None
+        else:
+            expanded[item] = None
+
+        if len(expanded) > max_targets:
+            raise ValueError(f"Batch is limited to {max_targets} targets")
+
+    if not expanded:
+        raise ValueError("No targets given")
+    return list(expanded)
+
+
+class ScanScheduler:
+    """Shared slot pool for batch scans.
+
+    At most ``concurrency`` targets are scanned at once across every
+    running batch. When a slot frees up it goes to the next waiting
+    batch in round-robin order, so a 500-host sweep cannot starve a
+    small batch started after it.
+    """
+
+    def __init__(self, concurrency: int = SCAN_BATCH_CONCURRENCY):
+        self.concurrency = concurrency
+        self.active = 0
+        # batch id -> futures waiting for a slot, in round-robin order
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.batches: Dict[str, Dict] = {}
+        self.metrics = {"batches": 0, "targets": 0, "failures": 0}
+
+    async def run_batch(self, kind: str, targets: List[str],
+                        scan: Callable[[str], Awaitable[Any]]) -> AsyncIterator[Dict]:
+        """Run ``scan`` for every target, yielding progress as targets finish.
+
+        Yields a "start" event, a "result" event per target (with its
+        queue wait and scan duration), then a "done" event with timings.
+        """
+        batch_id = secrets.token_hex(8)
+        progress = {
+            "kind": kind,
+            "total": len(targets),
+            "completed": 0,
+            "failed": 0,
+            "running": 0,
+            "started_at": time.time()
+        }
+        self.batches[batch_id] = progress
+        self.metrics["batches"] += 1
+        started = time.perf_counter()
+        pending = iter(targets)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for target in pending:
+                queued = time.perf_counter()
+                await self._acquire(batch_id)
+                progress["running"] += 1
+                began = time.perf_counter()
+                try:
+                    result, error = await scan(target), None
+                except Exception as e:
+                    result, error = None, str(e)
+                finally:
+                    progress["running"] -= 1
+                    self._release()
+                await results.put((target, result, error, began - queued, time.perf_counter() - began))
+
+        async def run_workers():
+            try:
+                await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(targets)) or 1)))
+            finally:
+                await results.put(None)
+
+        yield {"event": "start", "batch_id": batch_id, "kind": kind, "total": len(targets)}
+
+        runner = asyncio.ensure_future(run_workers())
+        durations = {}
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+
+                target, result, error, waited, duration = item
+                progress["completed"] += 1
+                self.metrics["targets"] += 1
+                if error is not None:
+                    progress["failed"] += 1
+                    self.metrics["failures"] += 1
+                durations[target] = duration
+
+                event = {
+                    "event": "result",
+                    "batch_id": batch_id,
+                    "target": target,
+                    "queued_ms": round(waited * 1000, 2),
+                    "duration_ms": round(duration * 1000, 2),
+                    "completed": progress["completed"],
+                    "total": progress["total"]
+                }
+                if error is not None:
+                    event["error"] = error
+                else:
+                    event["result"] = result
+                yield event
+            await runner
+        finally:
+            runner.cancel()
+            self.batches.pop(batch_id, None)
+
+        timings = sorted(durations.values())
+        yield {
+            "event": "done",
+            "batch_id": batch_id,
+            "total": progress["total"],
+            "completed": progress["completed"],
+            "failed": progress["failed"],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "target_timing_ms": {
+                "min": round(timings[0] * 1000, 2) if timings else None,
+                "avg": round(sum(timings) / len(timings) * 1000, 2) if timings else None,
+                "max": round(timings[-1] * 1000, 2) if timings else None
+            },
+            "slowest": [
+                {"target": target, "duration_ms": round(duration * 1000, 2)}
+                for target, duration in sorted(durations.items(), key=lambda item: item[1], reverse=True)[:5]
+            ]
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "active_slots": self.active,
+            "waiting": sum(len(waiters) for waiters in self._waiters.values()),
+            **self.metrics,
+            "running_batches": {batch_id: dict(progress) for batch_id, progress in self.batches.items()}
+        }
+
+    async def _acquire(self, batch_id: str):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(batch_id, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release()
+            else:
+                self._discard(batch_id, future)
+            raise
+
+    def _release(self):
+        """Hand the slot to the next batch in line, or free it"""
+        while self._waiters:
+            batch_id, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(batch_id)
+            else:
+                del self._waiters[batch_id]
+
+            if not future.done():
+                future.set_result(None)
+                return
+
+        self.active -= 1
+
+    def _discard(self, batch_id: str, future: asyncio.Future):
+        waiters = self._waiters.get(batch_id)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[batch_id]
@@ -1,36 +1,87 @@
-import json
 import os
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List
+from itertools import islice
+from typing import Dict, List, Optional
 import uuid
+from dotenv import load_dotenv
+
+from services.history_store import HistoryLog, HistoryWriter
+
+load_dotenv()
+
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5"))
+HISTORY_MAX_BATCH = int(os.getenv("HISTORY_MAX_BATCH", "256"))
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", "100"))
 
 class SearchHistory:
-    def __init__(self, storage_file="./data/search_history.json"):
+    def __init__(self, storage_file="./data/search_history.log", legacy_file="./data/search_history.json",
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL, max_batch: int = HISTORY_MAX_BATCH,
+                 max_entries: int = HISTORY_MAX_ENTRIES):
         self.storage_file = storage_file
-        self.history = []
+        self.legacy_file = legacy_file
+        self.max_entries = max_entries
+        self.log = HistoryLog(storage_file)
+        self.writer = HistoryWriter(self.log, flush_interval=flush_interval, max_batch=max_batch,
+                                    on_flush=self._flushed)
+        # id -> summary entry, oldest first; recency views iterate it in reverse
+        self.history: "OrderedDict[str, Dict]" = OrderedDict()
+        # Full results not yet written to the blob store, by search id
+        self._pending: Dict[str, Dict] = {}
         self._load_history()
     
+    def start(self):
+        """Start the background writer; until then appends are written inline"""
+        self.writer.start()
+    
+    def close(self):
+        """Flush queued appends to disk and stop the background writer"""
+        self.writer.close()
+    
+    def stats(self) -> Dict:
+        """Writer queue depth and flush latency"""
+        return {
+            "entries": len(self.history),
+            "max_entries": self.max_entries,
+            "pending_results": len(self._pending),
+            "writer_running": self.writer.running,
+            **self.writer.stats()
+        }
+    
     def _load_history(self):
-        """Load search history from file"""
+        """Load search history from the append-only log, migrating the legacy JSON file"""
         os.makedirs(os.path.dirname(self.storage_file), exist_ok=True)
         
-        if os.path.exists(self.storage_file):
-            try:
-                with open(self.storage_file, 'r') as f:
-                    self.history = json.load(f)
-            except:
-                self.history = []
-        else:
-            self.history = []
+        try:
+            self.log.migrate(self.legacy_file)
+            self.history = OrderedDict((entry["id"], entry) for entry in self.log.load())
+        except Exception as e:
+            print(f"Error loading history: {e}")
+            self.history = OrderedDict()
+        
+        evicted = self._evict()
+        if evicted:
+            self._append(evicted)
     
-    def _save_history(self):
-        """Save search history to file"""
+    def _append(self, records):
+        """Append records to the log, compacting it once dead records pile up"""
+        if self.writer.running:
+            self.writer.submit(records)
+            return
+        
         try:
-            with open(self.storage_file, 'w') as f:
-                json.dump(self.history, f, indent=2)
+            self.log.write_batch(records)
+            self._flushed(records)
+            if self.log.needs_compaction():
+                self.log.compact()
         except Exception as e:
             print(f"Error saving history: {e}")
     
+    def _flushed(self, records):
+        """Forget full results once the writer has stored them as blobs"""
+        for _, search_id, _, _ in records:
+            self._pending.pop(search_id, None)
+    
     def add_search(self, search_type: str, query: str, results: Dict):
         """Add a search to history"""
         search_entry = {
@@ -39,16 +90,25 @@ class SearchHistory:
             "query": query,
             "timestamp": datetime.now().isoformat(),
             "results_summary": self._summarize_results(search_type, results),
-            "full_results": results
+            # Set by the writer once the full results are stored
+            "results_ref": None
         }
         
-        self.history.insert(0, search_entry)
-        
-        # Keep only last 100 searches
-        if len(self.history) > 100:
-            self.history = self.history[:100]
+        self.history[search_entry["id"]] = search_entry
+        self._pending[search_entry["id"]] = results
+        records = [HistoryLog.add_record(search_entry, results)]
+        records.extend(self._evict())
         
-        self._save_history()
+        self._append(records)
+    
+    def _evict(self) -> List:
+        """Drop the oldest searches beyond max_entries"""
+        records = []
+        while len(self.history) > self.max_entries:
+            search_id, _ = self.history.popitem(last=False)
+            self._pending.pop(search_id, None)
+            records.append(HistoryLog.delete_record(search_id))
+        return records
     
     def _summarize_results(self, search_type: str, results: Dict) -> Dict:
         """Create a summary of search results"""
@@ -81,22 +141,40 @@ class SearchHistory:
         return summary
     
     def get_history(self, limit: int = 50) -> List[Dict]:
-        """Get search history"""
-        return self.history[:limit]
+        """Get search summaries, newest first, without full results"""
+        return list(islice(reversed(self.history.values()), limit))
     
     def clear_history(self):
         """Clear all search history"""
-        self.history = []
-        self._save_history()
+        self.history.clear()
+        self._pending.clear()
+        if self.writer.running:
+            self.writer.submit_clear()
+            return
+        
+        try:
+            self.log.clear()
+        except Exception as e:
+            print(f"Error clearing history: {e}")
     
     def delete_search(self, search_id: str):
         """Delete a specific search from history"""
-        self.history = [s for s in self.history if s["id"] != search_id]
-        self._save_history()
+        if self.history.pop(search_id, None) is not None:
+            self._pending.pop(search_id, None)
+            self._append([HistoryLog.delete_record(search_id)])
     
-    def get_search_by_id(self, search_id: str) -> Dict:
-        """Get a specific search by ID"""
-        for search in self.history:
-            if search["id"] == search_id:
-                return search
-        return None
+    def get_search_by_id(self, search_id: str) -> Optional[Dict]:
+        """Get a specific search by ID, loading its full results lazily"""
+        entry = self.history.get(search_id)
+        if entry is None:
+            return None
+        
+        # The writer stores the blob and sets results_ref before dropping the pending copy
+        results = self._pending.get(search_id)
+        if results is None and entry.get("results_ref"):
+            try:
+                results = self.log.blobs.get(entry["results_ref"])
+            except Exception as e:
+                print(f"Error loading search results: {e}")
+        
+        return {**entry, "full_results": results}
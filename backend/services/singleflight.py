@@ -0,0 +1,51 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it
+    runs await the same task and share its result (or exception). The task
+    is shielded, so one caller disconnecting does not cancel it for the
+    others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+        self.deduplicated_by_group: Counter = Counter()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], group: str = "default") -> Any:
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+            self.deduplicated_by_group[group] += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+            "deduplicated_by_group": dict(self.deduplicated_by_group)
+        }
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
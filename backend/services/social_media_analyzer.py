@@ -1,6 +1,6 @@
 import aiohttp
 import asyncio
-from typing import Dict, List
+from typing import Callable, Dict, List
 from datetime import datetime
 import re
 
@@ -338,7 +338,7 @@ async def analyze_linkedin_profile(username: str) -> Dict:
     }
 
 
-async def bulk_profile_analysis(profiles: List[Dict]) -> Dict:
+async def bulk_profile_analysis(profiles: List[Dict], on_event: Callable[[Dict], None] = None) -> Dict:
     """Analyze multiple profiles and compare"""
     
     results = []
@@ -347,6 +347,8 @@ async def bulk_profile_analysis(profiles: List[Dict]) -> Dict:
         username = profile.get("username")
         analysis = await analyze_social_profile(platform, username)
         results.append(analysis)
+        if on_event is not None:
+            on_event({"event": "profile", "completed": len(results), "total": len(profiles), "analysis": analysis})
     
     return {
         "timestamp": datetime.now().isoformat(),
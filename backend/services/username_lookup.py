@@ -1,49 +1,151 @@
 import aiohttp
 import asyncio
-from typing import Dict, List
+import os
+import time
+from typing import AsyncIterator, Dict, Iterable, List
 from datetime import datetime
+from dotenv import load_dotenv
 
-# Social media platforms to check
-PLATFORMS = {
-    "GitHub": "https://github.com/{}",
-    "Twitter": "https://twitter.com/{}",
-    "Instagram": "https://instagram.com/{}",
-    "Reddit": "https://reddit.com/user/{}",
-    "TikTok": "https://tiktok.com/@{}",
-    "LinkedIn": "https://linkedin.com/in/{}",
-    "Facebook": "https://facebook.com/{}",
-    "Pinterest": "https://pinterest.com/{}",
-    "YouTube": "https://youtube.com/@{}",
-    "Twitch": "https://twitch.tv/{}",
-    "Discord": "https://discord.com/users/{}",
-    "Telegram": "https://t.me/{}",
-    "Medium": "https://medium.com/@{}",
-    "DeviantArt": "https://{}.deviantart.com",
-    "Behance": "https://behance.net/{}",
-    "Dribbble": "https://dribbble.com/{}",
-    "Patreon": "https://patreon.com/{}",
-    "Snapchat": "https://snapchat.com/add/{}",
-    "Steam": "https://steamcommunity.com/id/{}",
-    "Spotify": "https://open.spotify.com/user/{}",
+from services.http_client import client_session
+from services.platform_registry import Platform, load_registry
+
+load_dotenv()
+
+USERNAME_BULK_CONCURRENCY = int(os.getenv("USERNAME_BULK_CONCURRENCY", "100"))
+USERNAME_BULK_PER_PLATFORM = int(os.getenv("USERNAME_BULK_PER_PLATFORM", "4"))
+USERNAME_BULK_MAX = int(os.getenv("USERNAME_BULK_MAX", "10000"))
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 }
 
-async def check_username_on_platform(session: aiohttp.ClientSession, platform: str, url: str, username: str) -> Dict:
+# Sites to check, compiled once from the registry file (PLATFORM_REGISTRY)
+PLATFORMS = load_registry()
+
+# HEAD answers that usually mean "use GET instead", not "no such profile"
+HEAD_FALLBACK_STATUSES = {400, 403, 405, 501}
+
+# Unread body worth downloading after a probe: a finished response hands its
+# keep-alive connection back to the pool, while one released half read makes
+# aiohttp close the connection. Anything larger is dropped with it.
+DRAIN_MAX_BYTES = 16 * 1024
+
+async def read_capped(response: aiohttp.ClientResponse, platform: Platform, limit: int) -> bytes:
+    """Read the body until the markers decide the check or ``limit`` bytes are in"""
+    body = bytearray()
+    if limit <= 0:
+        return bytes(body)
+    async for chunk in response.content.iter_chunked(8192):
+        body += chunk[:limit - len(body)]
+        if len(body) >= limit or platform.body_decided(body):
+            break
+    return bytes(body)
+
+async def drain(response: aiohttp.ClientResponse, limit: int) -> int:
+    """Read the rest of a small body so the connection can be reused; returns the bytes read.
+
+    Bodies with more than ``limit`` bytes left are not downloaded: the
+    response is closed and its connection dropped instead.
+    """
+    drained = 0
+    length = response.content_length
+    if length is not None and "Content-Encoding" not in response.headers \
+            and length - response.content.total_bytes > limit:
+        # Too much still on the wire to be worth reading
+        response.close()
+        return drained
+    try:
+        while not response.content.at_eof():
+            if drained >= limit:
+                response.close()
+                break
+            chunk = await response.content.read(min(8192, limit - drained))
+            if not chunk:
+                break
+            drained += len(chunk)
+    except (asyncio.TimeoutError, aiohttp.ClientError):
+        response.close()
+    return drained
+
+async def probe_platform(session: aiohttp.ClientSession, platform: Platform, url: str) -> Dict:
+    """Fetch just enough of a profile URL to decide whether it exists.
+
+    HEAD first where the platform allows it; otherwise (or if HEAD is
+    refused) a GET whose body is only read for body detection, asking for
+    a byte range and stopping at the platform's ``max_bytes``. That cap is
+    one budget for all attempts together, including what is drained to
+    keep connections reusable.
+    """
+    deadline = time.monotonic() + platform.timeout
+    spent = 0
+    
+    def budget() -> int:
+        return max(0, platform.max_bytes - spent)
+    
+    if platform.method == "HEAD":
+        async with session.head(url, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=platform.timeout),
+                                allow_redirects=True) as response:
+            if response.status not in HEAD_FALLBACK_STATUSES:
+                return {"method": "HEAD", "status": response.status, "final_url": str(response.url),
+                        "body": b"", "bytes_read": 0}
+    
+    headers = HEADERS
+    if platform.needs_body:
+        headers = {**HEADERS, "Range": f"bytes=0-{platform.max_bytes - 1}"}
+    
+    remaining = max(0.1, deadline - time.monotonic())
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=remaining),
+                           allow_redirects=True) as response:
+        if response.status == 416 and "Range" in headers:
+            # Range refused: fall through to a plain streamed GET
+            spent += await drain(response, min(DRAIN_MAX_BYTES, budget()))
+        else:
+            body = await read_capped(response, platform, budget()) if platform.needs_body else b""
+            spent += len(body)
+            spent += await drain(response, min(DRAIN_MAX_BYTES, budget()))
+            # A partial answer to our range request is still a found page
+            status = 200 if response.status == 206 else response.status
+            return {"method": "GET", "status": status, "final_url": str(response.url),
+                    "body": body, "bytes_read": spent}
+    
+    remaining = max(0.1, deadline - time.monotonic())
+    async with session.get(url, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=remaining),
+                           allow_redirects=True) as response:
+        body = await read_capped(response, platform, budget())
+        spent += len(body)
+        spent += await drain(response, min(DRAIN_MAX_BYTES, budget()))
+        return {"method": "GET", "status": response.status, "final_url": str(response.url),
+                "body": body, "bytes_read": spent}
+
+async def check_username_on_platform(session: aiohttp.ClientSession, platform: Platform, username: str) -> Dict:
     """Check if username exists on a specific platform"""
+    formatted_url = platform.profile_url(username)
+    
+    if not platform.accepts(username):
+        return {
+            "platform": platform.name,
+            "url": formatted_url,
+            "exists": False,
+            "status_code": None,
+            "skipped": "Username not valid on this platform",
+            "checked_at": datetime.now().isoformat()
+        }
+    
     try:
-        formatted_url = url.format(username)
-        async with session.get(formatted_url, timeout=aiohttp.ClientTimeout(total=5), allow_redirects=True) as response:
-            exists = response.status == 200
-            return {
-                "platform": platform,
-                "url": formatted_url,
-                "exists": exists,
-                "status_code": response.status,
-                "checked_at": datetime.now().isoformat()
-            }
+        probe = await probe_platform(session, platform, formatted_url)
+        return {
+            "platform": platform.name,
+            "url": formatted_url,
+            "exists": platform.exists(probe["status"], probe["final_url"], probe["body"]),
+            "status_code": probe["status"],
+            "method": probe["method"],
+            "bytes_read": probe["bytes_read"],
+            "checked_at": datetime.now().isoformat()
+        }
     except asyncio.TimeoutError:
         return {
-            "platform": platform,
-            "url": url.format(username),
+            "platform": platform.name,
+            "url": formatted_url,
             "exists": False,
             "status_code": None,
             "error": "Timeout",
@@ -51,14 +153,133 @@ async def check_username_on_platform(session: aiohttp.ClientSession, platform: s
         }
     except Exception as e:
         return {
-            "platform": platform,
-            "url": url.format(username),
+            "platform": platform.name,
+            "url": formatted_url,
             "exists": False,
             "status_code": None,
             "error": str(e),
             "checked_at": datetime.now().isoformat()
         }
 
+async def iter_username_lookup(username: str) -> AsyncIterator[Dict]:
+    """Check every platform at once, yielding each result as it completes.
+
+    Yields a "result" event per platform in completion order, then a
+    "done" event with the statistics and time to first result.
+    """
+    started = time.perf_counter()
+    first_result = None
+    statistics = {"total_checked": 0, "found": 0, "not_found": 0, "errors": 0}
+    found_on = []
+    
+    async with client_session() as session:
+        tasks = [
+            asyncio.ensure_future(check_username_on_platform(session, platform, username))
+            for platform in PLATFORMS
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                if first_result is None:
+                    first_result = time.perf_counter() - started
+                
+                statistics["total_checked"] += 1
+                if result.get("exists"):
+                    found_on.append(result["platform"])
+                    statistics["found"] += 1
+                elif result.get("error"):
+                    statistics["errors"] += 1
+                else:
+                    statistics["not_found"] += 1
+                
+                yield {"event": "result", **result}
+        finally:
+            # The client went away mid-stream: stop the remaining checks
+            for task in tasks:
+                task.cancel()
+    
+    yield {
+        "event": "done",
+        "username": username,
+        "total_platforms": len(PLATFORMS),
+        "found_on": found_on,
+        "statistics": statistics,
+        "first_result_ms": round(first_result * 1000, 2) if first_result is not None else None,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+async def iter_bulk_username_lookup(usernames: Iterable[str], platforms: List[Platform] = None,
+                                    concurrency: int = USERNAME_BULK_CONCURRENCY,
+                                    per_platform: int = USERNAME_BULK_PER_PLATFORM) -> AsyncIterator[Dict]:
+    """Check many usernames across the platforms over one pooled session.
+
+    At most ``concurrency`` checks run at once, and at most ``per_platform``
+    of them against any one site. Checks are interleaved across platforms
+    so no site sees a burst. Yields a "result" event per check, a
+    "username" summary once all of a username's checks are in, and a
+    final "done" event with throughput.
+    """
+    platforms = list(PLATFORMS) if platforms is None else platforms
+    usernames = list(dict.fromkeys(u.strip() for u in usernames if u and u.strip()))
+    started = time.perf_counter()
+    total = len(usernames) * len(platforms)
+    politeness = {platform.name: asyncio.Semaphore(max(1, per_platform)) for platform in platforms}
+    pending = ((username, platform) for username in usernames for platform in platforms)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    remaining = {username: len(platforms) for username in usernames}
+    found_on = {username: [] for username in usernames}
+    statistics = {"total_checked": 0, "found": 0, "not_found": 0, "errors": 0}
+    
+    async def worker(session: aiohttp.ClientSession):
+        for username, platform in pending:
+            async with politeness[platform.name]:
+                result = await check_username_on_platform(session, platform, username)
+            await results.put((username, result))
+    
+    async with client_session() as session:
+        async def run_workers():
+            try:
+                await asyncio.gather(*(worker(session) for _ in range(max(1, min(concurrency, total)))))
+            finally:
+                await results.put(None)
+        
+        runner = asyncio.ensure_future(run_workers())
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                
+                username, result = item
+                statistics["total_checked"] += 1
+                if result.get("exists"):
+                    found_on[username].append(result["platform"])
+                    statistics["found"] += 1
+                elif result.get("error"):
+                    statistics["errors"] += 1
+                else:
+                    statistics["not_found"] += 1
+                yield {"event": "result", "username": username, **result}
+                
+                remaining[username] -= 1
+                if not remaining[username]:
+                    yield {"event": "username", "username": username, "found_on": found_on.pop(username)}
+            await runner
+        finally:
+            runner.cancel()
+    
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "done",
+        "usernames": len(usernames),
+        "platforms": len(platforms),
+        "statistics": statistics,
+        "concurrency": concurrency,
+        "per_platform": per_platform,
+        "duration_ms": round(elapsed * 1000, 2),
+        "checks_per_second": round(statistics["total_checked"] / elapsed, 1) if elapsed else None
+    }
+
 async def username_lookup(username: str) -> Dict:
     """Lookup username across multiple social media platforms"""
     
@@ -68,35 +289,22 @@ async def username_lookup(username: str) -> Dict:
         "total_platforms": len(PLATFORMS),
         "platforms": [],
         "found_on": [],
-        "statistics": {
-            "total_checked": 0,
-            "found": 0,
-            "not_found": 0,
-            "errors": 0
-        }
+        "statistics": {}
     }
     
-    async with aiohttp.ClientSession(headers={
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }) as session:
-        tasks = [
-            check_username_on_platform(session, platform, url, username)
-            for platform, url in PLATFORMS.items()
-        ]
-        
-        platform_results = await asyncio.gather(*tasks)
-        
-        for result in platform_results:
+    async for event in iter_username_lookup(username):
+        if event["event"] == "result":
+            result = dict(event)
+            del result["event"]
             results["platforms"].append(result)
-            results["statistics"]["total_checked"] += 1
-            
-            if result.get("exists"):
-                results["found_on"].append(result["platform"])
-                results["statistics"]["found"] += 1
-            elif result.get("error"):
-                results["statistics"]["errors"] += 1
-            else:
-                results["statistics"]["not_found"] += 1
+        else:
+            results["found_on"] = event["found_on"]
+            results["statistics"] = event["statistics"]
+    
+    # Report platforms in their usual order rather than completion order
+    order = PLATFORMS.order()
+    results["platforms"].sort(key=lambda p: order[p["platform"]])
+    results["found_on"].sort(key=order.get)
     
     # Add mock data for demonstration
     if results["statistics"]["found"] == 0:
@@ -1,25 +1,49 @@
 import whois
-from typing import Dict
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Dict
 from datetime import datetime
-import dns.resolver
+from dotenv import load_dotenv
 
-async def whois_lookup(domain: str) -> Dict:
+from services.dns_engine import dns_engine
+
+load_dotenv()
+
+WHOIS_MAX_WORKERS = int(os.getenv("WHOIS_MAX_WORKERS", "4"))
+WHOIS_DEADLINE = float(os.getenv("WHOIS_DEADLINE", "15"))
+
+RECORD_TYPES = ['A', 'AAAA', 'MX', 'NS', 'TXT', 'CNAME']
+
+# python-whois is blocking; a small pool keeps slow registrars off the event loop
+_whois_executor = ThreadPoolExecutor(max_workers=WHOIS_MAX_WORKERS, thread_name_prefix="whois")
+
+async def _timed(timings: Dict, stage: str, awaitable: Awaitable):
+    """Await and record how long the stage took in milliseconds"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+async def whois_lookup(domain: str, deadline: float = WHOIS_DEADLINE) -> Dict:
     """Perform WHOIS lookup on domain"""
     
+    started = time.perf_counter()
+    timings = {}
+    
     try:
-        # Get WHOIS data
-        w = whois.whois(domain)
-        
-        # Get DNS records
-        dns_records = {}
-        record_types = ['A', 'AAAA', 'MX', 'NS', 'TXT', 'CNAME']
-        
-        for record_type in record_types:
-            try:
-                answers = dns.resolver.resolve(domain, record_type)
-                dns_records[record_type] = [str(rdata) for rdata in answers]
-            except:
-                dns_records[record_type] = []
+        # WHOIS and DNS run side by side under one overall deadline
+        loop = asyncio.get_running_loop()
+        w, dns_records = await asyncio.wait_for(
+            asyncio.gather(
+                _timed(timings, "whois", loop.run_in_executor(_whois_executor, whois.whois, domain)),
+                _timed(timings, "dns", dns_engine.resolve_text(domain, RECORD_TYPES, lifetime=deadline))
+            ),
+            timeout=deadline
+        )
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
         
         # Format dates
         creation_date = w.creation_date
@@ -55,12 +79,16 @@ async def whois_lookup(domain: str) -> Dict:
                 "expires_in_days": (expiration_date - datetime.now()).days if expiration_date else None,
                 "is_active": True,
                 "has_privacy_protection": bool(w.org and "privacy" in str(w.org).lower())
-            }
+            },
+            "timings_ms": timings
         }
         
         return result
         
     except Exception as e:
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        error = f"WHOIS lookup exceeded {deadline}s deadline" if isinstance(e, asyncio.TimeoutError) else str(e)
+        
         # Return mock data if WHOIS fails
         return {
             "domain": domain,
@@ -94,5 +122,6 @@ async def whois_lookup(domain: str) -> Dict:
                 "is_active": True,
                 "has_privacy_protection": True
             },
-            "error": str(e)
+            "timings_ms": timings,
+            "error": error
         }
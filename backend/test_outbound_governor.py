@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from services.outbound_governor import CircuitOpenError, OutboundGovernor
+
+
+def half_open(governor: OutboundGovernor, host: str):
+    """Put a host's breaker where the next request is its half-open trial"""
+    breaker = governor.host(host).breaker
+    breaker.state = "open"
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+
+async def start_server(routes) -> web.AppRunner:
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def server_port(runner: web.AppRunner) -> int:
+    return runner.addresses[0][1]
+
+
+def test_cancelled_acquire_gives_back_trial():
+    async def run():
+        governor = OutboundGovernor(rate=1, burst=1)
+        await governor.acquire("h")
+        half_open(governor, "h")
+
+        # The bucket is empty, so the trial request sleeps and is cancelled there
+        waiter = asyncio.ensure_future(governor.acquire("h"))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+        assert not governor.host("h").breaker.trial_in_flight
+        await governor.acquire("h")
+
+    asyncio.run(run())
+
+
+def test_cancelled_request_gives_back_trial():
+    async def run():
+        async def slow(request):
+            await asyncio.sleep(1)
+            return web.Response(text="late")
+
+        async def fast(request):
+            return web.Response(text="ok")
+
+        runner = await start_server({"/slow": slow, "/fast": fast})
+        governor = OutboundGovernor()
+        base = f"http://127.0.0.1:{server_port(runner)}"
+        try:
+            async with aiohttp.ClientSession(trace_configs=[governor.trace_config()]) as session:
+                half_open(governor, "127.0.0.1")
+
+                async def fetch_slow():
+                    async with session.get(f"{base}/slow") as response:
+                        return await response.text()
+
+                # The caller goes away while the trial request is in flight
+                request = asyncio.ensure_future(fetch_slow())
+                await asyncio.sleep(0.2)
+                request.cancel()
+                try:
+                    await request
+                except asyncio.CancelledError:
+                    pass
+
+                try:
+                    async with session.get(f"{base}/fast") as response:
+                        assert response.status == 200
+                except CircuitOpenError:
+                    raise AssertionError("Breaker stuck half-open after a cancelled trial")
+                assert governor.host("127.0.0.1").breaker.state == "closed"
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_redirect_target_is_governed():
+    async def run():
+        async def hop(request):
+            target = request.query["to"]
+            raise web.HTTPFound(f"http://localhost:{request.url.port}/{target}")
+
+        async def broken(request):
+            return web.Response(status=500)
+
+        async def busy(request):
+            return web.Response(status=503)
+
+        runner = await start_server({"/r": hop, "/broken": broken, "/busy": busy})
+        governor = OutboundGovernor()
+        base = f"http://127.0.0.1:{server_port(runner)}"
+        try:
+            async with aiohttp.ClientSession(trace_configs=[governor.trace_config()]) as session:
+                async with session.get(f"{base}/r?to=busy") as response:
+                    assert response.status == 503
+                assert governor.hosts["localhost"].metrics["throttled"] == 1
+                assert governor.hosts["127.0.0.1"].metrics["throttled"] == 0
+
+                threshold = governor.host("localhost").breaker.threshold
+                for _ in range(threshold):
+                    async with session.get(f"{base}/r?to=broken") as response:
+                        assert response.status == 500
+                assert governor.hosts["localhost"].breaker.state == "open"
+                assert governor.hosts["127.0.0.1"].breaker.state == "closed"
+
+                # The redirect hop itself is now refused at the open breaker
+                try:
+                    async with session.get(f"{base}/r?to=broken"):
+                        pass
+                    raise AssertionError("Redirect to an open circuit was followed")
+                except CircuitOpenError:
+                    pass
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for test in (test_cancelled_acquire_gives_back_trial, test_cancelled_request_gives_back_trial,
+                 test_redirect_target_is_governed):
+        test()
+        print(f"✅ {test.__name__}")